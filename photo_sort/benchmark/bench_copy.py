@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+
+"""Benchmark copying files with several threads, and the cost of verifying copies.
+
+Verified copies are compared with copying and then hashing both the
+original and the copy, which reads the original twice.
+
+Files are created in /dev/shm if it exists, otherwise in the temp folder.
+Pass a folder to copy to as third argument to measure reading copies back
+from disk, tmpfs has no O_DIRECT.
+
+Usage (from the photo_sort folder):
+    python -m benchmark.bench_copy [<files>] [<kilobytes>] [<output folder>]
+"""
+
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+
+import transfer
+
+__author__ = 'marcus'
+
+
+def temp_root():
+    return '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+
+def create_files(directory, count, size):
+    content = os.urandom(size)
+    for index in range(count):
+        with open(os.path.join(directory, 'IMG_%05d.JPG' % index), 'wb') as f:
+            f.write(content)
+
+
+def get_rename_list(input_folder, output_folder):
+    return [{'from': os.path.join(input_folder, name), 'to': os.path.join(output_folder, name)}
+            for name in sorted(os.listdir(input_folder))]
+
+
+def copy_then_hash(source_file, destination_file):
+    transfer.copy(source_file, destination_file)
+
+    for file in [source_file, destination_file]:
+        digest = hashlib.blake2b()
+        with open(file, 'rb') as f:
+            for block in iter(lambda: f.read(transfer.buffer_size), b''):
+                digest.update(block)
+
+    return 'copy then hash'
+
+
+def measure(name, rename_list, workers, copy_function):
+    summary = transfer.TransferSummary()
+    for rename, strategy, size in transfer.copy_files(rename_list, workers, workers, copy_function):
+        summary.add(strategy, size)
+
+    print('%-20s workers=%d %s' % (name, workers, summary))
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    size = int(sys.argv[2]) * 1024 if len(sys.argv) > 2 else 4 * 1024 * 1024
+
+    output_root = sys.argv[3] if len(sys.argv) > 3 else None
+
+    directory = tempfile.mkdtemp(prefix='photo_sort_bench_', dir=temp_root())
+    try:
+        input_folder = os.path.join(directory, 'input')
+        os.makedirs(input_folder)
+        create_files(input_folder, count, size)
+        print('%d files of %d kB' % (count, size // 1024))
+
+        for workers in [1, 2, 4, 8]:
+            for name, copy_function in [('copy', transfer.copy), ('copy then hash', copy_then_hash),
+                                        ('verified', transfer.VerifiedCopy(False)),
+                                        ('verified O_DIRECT', transfer.VerifiedCopy(True))]:
+                output_folder = tempfile.mkdtemp(prefix='photo_sort_bench_', dir=output_root or directory)
+                measure(name, get_rename_list(input_folder, output_folder), workers, copy_function)
+                shutil.rmtree(output_folder)
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
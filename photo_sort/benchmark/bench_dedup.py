@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+
+"""Benchmark finding duplicates among videos copied from two cards.
+
+Compares hashing every file completely with find_duplicates, which only
+hashes files of the same size, and only completely when the first and last
+blocks match too.
+
+Usage (from the photo_sort folder):
+    python -m benchmark.bench_dedup [<files>] [<size in MB>] [<workers>]
+"""
+
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import dedup
+
+__author__ = 'marcus'
+
+
+def hash_all(files, sizes, workers):
+    by_hash = {}
+    duplicates = {}
+
+    for file in files:
+        with open(file, 'rb') as f:
+            digest = hashlib.blake2b(f.read()).digest()
+        if digest in by_hash:
+            duplicates[file] = by_hash[digest]
+        else:
+            by_hash[digest] = file
+
+    return duplicates
+
+
+def measure(name, function, files, sizes, workers):
+    start = time.time()
+    duplicates = function(files, sizes, workers)
+    print('%-15s %8.3f s, %d duplicates' % (name, time.time() - start, len(duplicates)))
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    size = int(float(sys.argv[2]) * 1024 * 1024) if len(sys.argv) > 2 else 16 * 1024 * 1024
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else dedup.hash_workers
+
+    folder = tempfile.mkdtemp(dir='/dev/shm' if os.path.isdir('/dev/shm') else None)
+    try:
+        files = []
+        # Every file on the second card has the same size as one on the first, half have the same content
+        for index in range(count // 2):
+            content = os.urandom(size + index * 16)
+            for card, same in [('canon', True), ('samsung', index % 2 == 0)]:
+                file = os.path.join(folder, '%s_%04d.MOV' % (card, index))
+                with open(file, 'wb') as f:
+                    f.write(content if same else os.urandom(len(content)))
+                files.append(file)
+
+        sizes = [os.path.getsize(file) for file in files]
+        print('%d files of %.1f MB, %d workers' % (count, size / 1e6, workers))
+
+        measure('hash all', hash_all, files, sizes, workers)
+        measure('find_duplicates', dedup.find_duplicates, files, sizes, workers)
+    finally:
+        shutil.rmtree(folder)
+
+
+if __name__ == '__main__':
+    main()
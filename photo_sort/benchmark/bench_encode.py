@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+
+"""Benchmark encoding videos with several concurrent HandBrakeCLI jobs.
+
+Uses the fake HandBrakeCLI, which takes time in proportion to the video size.
+
+Usage (from the photo_sort folder):
+    python -m benchmark.bench_encode [<videos>] [<seconds-per-mb>]
+"""
+
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from benchmark import corpus
+import exiftool
+import photo_sort
+import video
+
+__author__ = 'marcus'
+
+benchmark_dir = os.path.dirname(os.path.abspath(__file__))
+
+
+def create_videos(directory, count):
+    sizes = [random.choice([100, 200, 400, 3000]) * 1000 for _ in range(count)]
+    for index, size in enumerate(sizes):
+        with open(os.path.join(directory, 'MVI_%04d.mov' % index), 'wb') as f:
+            f.write(corpus.mp4_bytes(mdat_size=size))
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 24
+    os.environ['FAKE_HANDBRAKE_MB_LATENCY'] = sys.argv[2] if len(sys.argv) > 2 else '0.1'
+    exiftool.executable = os.path.join(benchmark_dir, 'fake_exiftool.py')
+    video.handbrake_executable = os.path.join(benchmark_dir, 'fake_handbrake.py')
+    random.seed(1)
+
+    for jobs in [1, 2, 4, 8]:
+        directory = tempfile.mkdtemp(prefix='photo_sort_bench_')
+        try:
+            create_videos(directory, count)
+            start = time.time()
+            video.encode_videos(directory, encode_jobs=jobs, cpu_budget=os.cpu_count())
+            print('jobs=%d %8.3f s' % (jobs, time.time() - start))
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+
+"""Benchmark reading large responses in ExifTool.execute.
+
+Compares the buffered reader in exiftool.py with the previous
+implementation that appended every 4096 byte block to a bytes object.
+
+Usage (from the photo_sort folder):
+    python -m benchmark.bench_execute [<megabytes>...]
+"""
+
+import os
+import sys
+import time
+
+import exiftool
+
+__author__ = 'marcus'
+
+fake_exiftool = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fake_exiftool.py')
+
+
+class AppendingExifTool(exiftool.ExifTool):
+    """ExifTool.execute as it was before reading into a preallocated buffer"""
+
+    def execute(self, *params):
+        self._process.stdin.write(b"\n".join(params + (b"-execute\n",)))
+        self._process.stdin.flush()
+        output = b""
+        fd = self._process.stdout.fileno()
+        while not output[-32:].strip().endswith(exiftool.sentinel):
+            output += os.read(fd, 4096)
+        return output.strip()[:-len(exiftool.sentinel)]
+
+
+def measure(name, et, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.time()
+        output = et.execute(b"-j", b"IMG_0001.JPG")
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print('%-12s %8.1f MB %8.3f s %8.1f MB/s' % (name, len(output) / 1e6, best, len(output) / 1e6 / best))
+
+
+def main():
+    sizes = [float(size) for size in sys.argv[1:]] or [1, 4, 16]
+
+    for size in sizes:
+        os.environ['FAKE_EXIFTOOL_RESPONSE_SIZE'] = str(int(size * 1e6))
+
+        with AppendingExifTool(fake_exiftool) as et:
+            measure('appending', et)
+
+        with exiftool.ExifTool(fake_exiftool) as et:
+            measure('buffered', et)
+
+
+if __name__ == '__main__':
+    main()
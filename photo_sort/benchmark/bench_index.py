@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+
+"""Benchmark ordering files sharing few timestamps, like burst shots or cameras without EXIF.
+
+Compares FileIndex with the previous dict keyed on time taken, where every
+collision moved the time one second forward until it was free.
+
+Usage (from the photo_sort folder):
+    python -m benchmark.bench_index [<files>] [<timestamps>]
+"""
+
+import random
+import sys
+import time
+
+import photo_sort
+
+__author__ = 'marcus'
+
+
+def dict_index(files):
+    input_files = {}
+    for file, time_taken in files:
+        while time_taken in input_files:
+            time_taken += 1
+        input_files[time_taken] = file
+    return [input_files[key] for key in sorted(input_files)]
+
+
+def file_index(files):
+    input_files = photo_sort.FileIndex()
+    for file, time_taken in files:
+        input_files.add(file, time_taken)
+    return input_files.sorted_files()
+
+
+def measure(name, function, files):
+    start = time.time()
+    function(files)
+    print('%-10s %8.3f s' % (name, time.time() - start))
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    timestamps = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    random.seed(1)
+
+    # Timestamps an hour apart, so shifted times do not run into the next one
+    files = [('/card/DCIM/IMG_%05d.JPG' % index, 1406896200 + 3600 * random.randrange(timestamps))
+             for index in range(count)]
+    print('%d files, %d timestamps' % (count, timestamps))
+
+    measure('dict', dict_index, files)
+    measure('FileIndex', file_index, files)
+
+
+if __name__ == '__main__':
+    main()
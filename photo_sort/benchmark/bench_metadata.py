@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+
+"""Benchmark EXIF date lookup, per file versus batched, and batched with several workers.
+
+Usage (from the photo_sort folder):
+    python -m benchmark.bench_metadata [<files>] [<latency>] [<file-latency>]
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import exiftool
+import photo_sort
+
+__author__ = 'marcus'
+
+fake_exiftool = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fake_exiftool.py')
+
+
+def create_files(directory, count):
+    for index in range(count):
+        with open(os.path.join(directory, 'IMG_%05d.JPG' % index), 'w'):
+            pass
+
+
+class CountingExifTool(exiftool.ExifTool):
+    round_trips = 0
+
+    def execute(self, *params):
+        CountingExifTool.round_trips += 1
+        return super(CountingExifTool, self).execute(*params)
+
+
+def measure(name, function):
+    CountingExifTool.round_trips = 0
+    start = time.time()
+    function()
+    elapsed = time.time() - start
+    print('%-24s %8d round-trips %8.3f s' % (name, CountingExifTool.round_trips, elapsed))
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    os.environ['FAKE_EXIFTOOL_LATENCY'] = sys.argv[2] if len(sys.argv) > 2 else '0.0005'
+    os.environ['FAKE_EXIFTOOL_FILE_LATENCY'] = sys.argv[3] if len(sys.argv) > 3 else '0.0002'
+    exiftool.executable = fake_exiftool
+    exiftool.ExifTool = CountingExifTool
+
+    directory = tempfile.mkdtemp(prefix='photo_sort_bench_')
+    try:
+        create_files(directory, count)
+        files = sorted(os.path.join(directory, name) for name in os.listdir(directory))
+        print('%d files' % count)
+
+        def per_file():
+            with exiftool.ExifTool() as et:
+                for file in files:
+                    photo_sort.get_time_taken(file, et)
+
+        measure('per file', per_file)
+
+        for chunk_size in [50, 500, 5000]:
+            measure('batched, chunk=%d' % chunk_size,
+                    lambda: photo_sort.get_input_files([directory], chunk_size))
+
+        for workers in [1, 2, 4, 8]:
+            measure('batched, workers=%d' % workers,
+                    lambda: photo_sort.get_input_files([directory], workers=workers))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
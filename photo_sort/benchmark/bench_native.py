@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+
+"""Benchmark reading dates with exif_reader versus exiftool.
+
+Uses exiftool if it is on the path, otherwise the fake exiftool.
+
+Usage (from the photo_sort folder):
+    python -m benchmark.bench_native [<files>]
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from benchmark import corpus
+import exif_reader
+import exiftool
+import photo_sort
+
+__author__ = 'marcus'
+
+fake_exiftool = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fake_exiftool.py')
+
+
+def create_files(directory, count):
+    for index in range(count):
+        date_time = '2014:08:%02d %02d:%02d:00' % (index % 28 + 1, index // 60 % 24, index % 60)
+
+        if index % 10 == 0:
+            name, content = 'MVI_%05d.MP4' % index, corpus.mp4_bytes(1406896200 + index, mdat_size=65536)
+        elif index % 10 == 1:
+            name, content = 'IMG_%05d.HEIC' % index, corpus.heic_bytes(date_time)
+        else:
+            name, content = 'IMG_%05d.JPG' % index, corpus.jpeg_bytes(date_time) + b'\0' * 65536
+
+        with open(os.path.join(directory, name), 'wb') as f:
+            f.write(content)
+
+
+def measure(name, function):
+    start = time.time()
+    function()
+    print('%-10s %8.3f s' % (name, time.time() - start))
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+    if not shutil.which('exiftool'):
+        exiftool.executable = fake_exiftool
+        print('exiftool not found, using %s' % fake_exiftool)
+
+    directory = tempfile.mkdtemp(prefix='photo_sort_bench_')
+    try:
+        create_files(directory, count)
+        print('%d files' % count)
+
+        measure('native', lambda: photo_sort.get_input_files([directory]))
+
+        readers = exif_reader.readers
+        exif_reader.readers = {}
+        try:
+            measure('exiftool', lambda: photo_sort.get_input_files([directory]))
+        finally:
+            exif_reader.readers = readers
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+
+"""Benchmark listing input folders, glob versus scandir.
+
+The glob variant stats every file twice, for the metadata cache key and
+for the modification time, as get_input_files did before using scandir.
+Creates a DCIM like tree of empty files, 1000 per sub folder.
+
+Usage (from the photo_sort folder):
+    python -m benchmark.bench_scan [<files>]
+"""
+
+from glob import glob
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import photo_sort
+
+__author__ = 'marcus'
+
+
+def create_tree(directory, count):
+    for index in range(count):
+        folder = os.path.join(directory, '%03dCANON' % (100 + index // 1000))
+        if index % 1000 == 0:
+            os.makedirs(folder)
+        open(os.path.join(folder, 'IMG_%05d.JPG' % index), 'w').close()
+
+
+def glob_files(directory):
+    files = []
+    for folder in glob(os.path.join(directory, '*')):
+        for file in glob(os.path.join(folder, '*.*')):
+            files.append((file, os.stat(file).st_size, os.path.getmtime(file)))
+    return files
+
+
+def scan_files(directory):
+    files = []
+    for entry in photo_sort.scan_files(directory, recursive=True):
+        stat = entry.stat()
+        files.append((entry.path, stat.st_size, stat.st_mtime))
+    return files
+
+
+def measure(name, function, directory):
+    start = time.time()
+    files = function(directory)
+    print('%-8s %8d files %8.3f s' % (name, len(files), time.time() - start))
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+
+    directory = tempfile.mkdtemp(prefix='photo_sort_bench_')
+    try:
+        create_tree(directory, count)
+
+        for run in range(2):
+            measure('glob', glob_files, directory)
+            measure('scandir', scan_files, directory)
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
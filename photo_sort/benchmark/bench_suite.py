@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+
+"""Time the phases of an import on generated corpora, and compare with earlier runs.
+
+A corpus from corpus.create_corpus is written for each size, and exiftool
+and HandBrakeCLI are replaced with the fake tools in this folder. Results
+are appended to a JSON lines file together with the current git commit,
+and compared with the last earlier run with the same settings.
+
+Run with python -m benchmark.bench_suite from the photo_sort folder.
+
+Usage:
+    bench_suite [<files>...] [options]
+
+Options:
+    --exiftool-latency <seconds>       Time of each fake exiftool call [default: 0.005]
+    --exiftool-file-latency <seconds>  Time per file of each fake exiftool call [default: 0.001]
+    --handbrake-latency <seconds>      Time of each fake encode [default: 0]
+    --encode-jobs <jobs>               Number of videos to encode at the same time [default: 1]
+    --phases <phases>                  Comma separated phases to time
+                                         [default: get_input_files,get_rename_list,PhotoSort,get_preview,copy_files,encode_videos]
+    --results <file>                   File to add results to [default: benchmark/results.jsonl]
+    --no-save                          Only compare, do not add results
+"""
+
+from contextlib import redirect_stdout
+from datetime import datetime
+import json
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+
+from docopt import docopt
+
+from benchmark import corpus
+import exiftool
+import photo_sort
+import video
+
+__author__ = 'marcus'
+
+default_sizes = [1000, 10000, 100000]
+
+benchmark_dir = os.path.dirname(os.path.abspath(__file__))
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=benchmark_dir,
+                                       stderr=subprocess.DEVNULL).decode('ascii').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def temp_root():
+    return '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+
+def run_phases(directory, count, phases, encode_jobs):
+    """Return seconds spent in each phase for a corpus of count files"""
+    input_folder = os.path.join(directory, 'input')
+    output = os.path.join(directory, 'output')
+    os.makedirs(input_folder)
+    os.makedirs(output)
+
+    start = time.time()
+    kinds = corpus.create_corpus(input_folder, count)
+    print('%d files created in %.1f s: %s' % (count, time.time() - start,
+                                      ', '.join('%s=%d' % kind for kind in sorted(kinds.items()))))
+
+    results = {}
+
+    def measure(phase, function, *args, **kwargs):
+        if phase not in phases:
+            return None
+
+        start = time.time()
+        with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+            result = function(*args, **kwargs)
+        results[phase] = time.time() - start
+
+        print('  %-16s %8.3f s' % (phase, results[phase]))
+        return result
+
+    input_files = measure('get_input_files', photo_sort.get_input_files, [input_folder])
+    if input_files is not None:
+        measure('get_rename_list', photo_sort.get_rename_list, '2014', 'Boom', None, None, input_files,
+                os.path.join(output, '2014 - Boom'))
+
+    sorter = photo_sort.PhotoSort([input_folder], output, '2014', 'Boom', None, None, dry_run=False, encode='no',
+                                  metadata_cache=False)
+    if 'PhotoSort' in phases:
+        measure('PhotoSort', photo_sort.PhotoSort, [input_folder], output, '2014', 'Boom', None, None, True, 'no',
+                metadata_cache=False)
+
+    measure('get_preview', sorter.get_preview)
+
+    if 'copy_files' in phases or 'encode_videos' in phases:
+        photo_sort.mkdir(sorter.output_folder)
+        measure('copy_files', sorter.copy_files, sorter.rename_list)
+        if 'copy_files' not in phases:
+            sorter.copy_files(sorter.rename_list)
+
+        measure('encode_videos', video.encode_videos, sorter.output_folder, False, None, 1, encode_jobs)
+
+    return results
+
+
+def find_previous(results_file, settings):
+    """Return the last saved run with the same settings, or None"""
+    previous = None
+
+    if os.path.isfile(results_file):
+        with open(results_file) as results:
+            for line in results:
+                run = json.loads(line)
+                if run['settings'] == settings:
+                    previous = run
+
+    return previous
+
+
+def compare(run, previous):
+    if not previous:
+        print('  No earlier run with the same settings')
+        return
+
+    print('  Compared with %s (%s):' % (previous['commit'], previous['date']))
+    for phase, seconds in run['phases'].items():
+        if phase in previous['phases'] and previous['phases'][phase]:
+            before = previous['phases'][phase]
+            print('  %-16s %8.3f s -> %8.3f s %+7.1f%%' % (phase, before, seconds, (seconds / before - 1) * 100))
+
+
+def main():
+    arguments = docopt(__doc__)
+    sizes = [int(size) for size in arguments['<files>']] or default_sizes
+    phases = arguments['--phases'].split(',')
+    encode_jobs = int(arguments['--encode-jobs'])
+
+    os.environ['FAKE_EXIFTOOL_LATENCY'] = arguments['--exiftool-latency']
+    os.environ['FAKE_EXIFTOOL_FILE_LATENCY'] = arguments['--exiftool-file-latency']
+    os.environ['FAKE_HANDBRAKE_LATENCY'] = arguments['--handbrake-latency']
+    exiftool.executable = os.path.join(benchmark_dir, 'fake_exiftool.py')
+    video.handbrake_executable = os.path.join(benchmark_dir, 'fake_handbrake.py')
+
+    for count in sizes:
+        settings = {
+            'files': count,
+            'exiftool_latency': float(arguments['--exiftool-latency']),
+            'exiftool_file_latency': float(arguments['--exiftool-file-latency']),
+            'handbrake_latency': float(arguments['--handbrake-latency']),
+            'encode_jobs': encode_jobs,
+        }
+
+        directory = tempfile.mkdtemp(prefix='photo_sort_bench_', dir=temp_root())
+        try:
+            phase_results = run_phases(directory, count, phases, encode_jobs)
+        finally:
+            shutil.rmtree(directory)
+
+        run = {
+            'commit': git_commit(),
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'settings': settings,
+            'phases': phase_results,
+        }
+        compare(run, find_previous(arguments['--results'], settings))
+
+        if not arguments['--no-save']:
+            with open(arguments['--results'], 'a') as results:
+                results.write(json.dumps(run) + '\n')
+
+
+if __name__ == '__main__':
+    main()
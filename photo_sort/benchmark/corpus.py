@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+
+"""Build minimal photo and video files for tests and benchmarks.
+
+The files only contain what photo sort reads: the EXIF DateTimeOriginal
+tag, the QuickTime creation date and the video track rotation.
+create_corpus writes a folder of such files, mixed like a real import.
+"""
+
+import math
+import os
+import random
+import struct
+import time
+
+__author__ = 'marcus'
+
+# Seconds between 1904-01-01, the QuickTime epoch, and 1970-01-01
+quicktime_epoch = 2082844800
+
+
+def tiff_bytes(date_time=None, byte_order='<'):
+    """Return TIFF header, IFD0 and an EXIF IFD with DateTimeOriginal if given"""
+    header = (b'II' if byte_order == '<' else b'MM') + struct.pack(byte_order + 'HI', 42, 8)
+
+    if date_time is None:
+        # IFD0 with only an orientation tag
+        return header + struct.pack(byte_order + 'HHHIHHI', 1, 0x0112, 3, 1, 1, 0, 0)
+
+    # IFD0 at 8 with one entry pointing to the EXIF IFD at 26
+    ifd0 = struct.pack(byte_order + 'HHHII', 1, 0x8769, 4, 1, 26) + struct.pack(byte_order + 'I', 0)
+    value = date_time.encode('ascii') + b'\0'
+    # EXIF IFD at 26, value follows at 44
+    exif_ifd = struct.pack(byte_order + 'HHHII', 1, 0x9003, 2, len(value), 44) + struct.pack(byte_order + 'I', 0)
+
+    return header + ifd0 + exif_ifd + value
+
+
+def jpeg_bytes(date_time=None, byte_order='<', exif=True):
+    """Return a JPEG with an APP0 segment and, if exif is set, an EXIF APP1 segment"""
+    app0 = b'JFIF\0\x01\x01\0\0\x01\0\x01\0\0'
+    content = b'\xff\xd8' + b'\xff\xe0' + struct.pack('>H', len(app0) + 2) + app0
+
+    if exif:
+        app1 = b'Exif\0\0' + tiff_bytes(date_time, byte_order)
+        content += b'\xff\xe1' + struct.pack('>H', len(app1) + 2) + app1
+
+    scan = b'\x01\x01\0\x3f\0'
+    return content + b'\xff\xda' + struct.pack('>H', len(scan) + 2) + scan + b'\0' * 64 + b'\xff\xd9'
+
+
+def box(box_type, *payload):
+    content = b''.join(payload)
+    return struct.pack('>I', len(content) + 8) + box_type + content
+
+
+def full_box(box_type, version, *payload):
+    return box(box_type, struct.pack('>I', version << 24), *payload)
+
+
+def matrix(rotation):
+    radians = math.radians(rotation)
+    a, b = int(round(math.cos(radians))) << 16, int(round(math.sin(radians))) << 16
+    return struct.pack('>9i', a, b, 0, -b, a, 0, 0, 0, 1 << 30)
+
+
+def mp4_bytes(creation_time=None, rotation=0, creation_date=None, version=0, mdat_size=1024):
+    """Return an MP4 with mvhd creation time (Unix time), a video track and optionally a Keys creation date
+
+    The moov atom is written after the mdat atom, like most cameras do.
+    """
+    created = creation_time + quicktime_epoch if creation_time else 0
+
+    if version == 1:
+        mvhd = full_box(b'mvhd', 1, struct.pack('>QQIQ', created, created, 1000, 0), b'\0' * 80)
+        tkhd = full_box(b'tkhd', 1, struct.pack('>QQIIQ', created, created, 1, 0, 0), b'\0' * 16, matrix(rotation), b'\0' * 8)
+    else:
+        mvhd = full_box(b'mvhd', 0, struct.pack('>IIII', created, created, 1000, 0), b'\0' * 80)
+        tkhd = full_box(b'tkhd', 0, struct.pack('>IIIII', created, created, 1, 0, 0), b'\0' * 16, matrix(rotation), b'\0' * 8)
+
+    sound = box(b'trak', full_box(b'tkhd', 0, b'\0' * 20, b'\0' * 16, matrix(90), b'\0' * 8),
+                box(b'mdia', full_box(b'hdlr', 0, b'\0' * 4, b'soun', b'\0' * 13)))
+    video = box(b'trak', tkhd, box(b'mdia', full_box(b'hdlr', 0, b'\0' * 4, b'vide', b'\0' * 13)))
+    atoms = [mvhd, sound, video]
+
+    if creation_date:
+        key = b'com.apple.quicktime.creationdate'
+        keys = full_box(b'keys', 0, struct.pack('>I', 1), struct.pack('>I', len(key) + 8), b'mdta', key)
+        ilst = box(b'ilst', box(struct.pack('>I', 1), box(b'data', struct.pack('>II', 1, 0), creation_date.encode('utf-8'))))
+        atoms.append(box(b'meta', full_box(b'hdlr', 0, b'\0' * 4, b'mdta', b'\0' * 13), keys, ilst))
+
+    return box(b'ftyp', b'mp42', b'\0\0\0\0', b'mp42isom') + box(b'mdat', b'\0' * mdat_size) + box(b'moov', *atoms)
+
+
+def heic_bytes(date_time=None):
+    """Return a HEIF container with an Exif item stored after the meta box"""
+    exif = struct.pack('>I', 0) + tiff_bytes(date_time, '>')
+
+    def meta(exif_offset):
+        hdlr = full_box(b'hdlr', 0, b'\0' * 4, b'pict', b'\0' * 13)
+        infe = [full_box(b'infe', 2, struct.pack('>HH', 1, 0), b'hvc1', b'\0'),
+                full_box(b'infe', 2, struct.pack('>HH', 2, 0), b'Exif', b'\0')]
+        iinf = full_box(b'iinf', 0, struct.pack('>H', len(infe)), *infe)
+        # offset_size=4, length_size=4, base_offset_size=0
+        iloc = full_box(b'iloc', 0, struct.pack('>BBH', 0x44, 0, 2),
+                        struct.pack('>HHHII', 1, 0, 1, 0, 0),
+                        struct.pack('>HHHII', 2, 0, 1, exif_offset, len(exif)))
+        return full_box(b'meta', 0, hdlr, iinf, iloc)
+
+    ftyp = box(b'ftyp', b'heic', b'\0\0\0\0', b'mif1heic')
+    exif_offset = len(ftyp) + len(meta(0)) + 8
+    return ftyp + meta(exif_offset) + box(b'mdat', exif)
+
+
+# Share of files of each kind in a corpus
+corpus_mix = [
+    ('exif', 0.55),
+    ('no_exif', 0.10),
+    ('phone', 0.18),
+    ('mpg_thm', 0.05),
+    ('mov', 0.07),
+    ('mts', 0.05),
+]
+
+
+def create_corpus(folder, count, seed=1, start=1406880000, burst=0.1):
+    """Write count files to folder, return number of files of each kind
+
+    Kinds are JPEGs with and without EXIF, phone photos with the time in the
+    file name, MPEG videos with a .thm file holding the EXIF data, QuickTime
+    videos and MTS videos only exiftool can read. A share of files, given by
+    burst, are taken at the same second as the file before.
+    """
+    rng = random.Random(seed)
+    kinds = [kind for kind, share in corpus_mix]
+    weights = [share for kind, share in corpus_mix]
+    counts = dict((kind, 0) for kind in kinds)
+    taken = start
+
+    for index in range(count):
+        if rng.random() >= burst:
+            taken += rng.randint(1, 120)
+
+        kind = rng.choices(kinds, weights)[0]
+        counts[kind] += 1
+        date_time = time.strftime('%Y:%m:%d %H:%M:%S', time.gmtime(taken))
+
+        if kind == 'exif':
+            files = [('IMG_%06d.JPG' % index, jpeg_bytes(date_time))]
+        elif kind == 'no_exif':
+            files = [('SCAN_%06d.jpg' % index, jpeg_bytes(exif=False))]
+        elif kind == 'phone':
+            files = [('IMG_%s_%d.jpg' % (time.strftime('%Y%m%d_%H%M%S', time.gmtime(taken)), index),
+                      jpeg_bytes(exif=False))]
+        elif kind == 'mpg_thm':
+            files = [('MVI_%06d.MPG' % index, b'\0\0\x01\xba' + b'\0' * 1020),
+                     ('MVI_%06d.THM' % index, jpeg_bytes(date_time))]
+        elif kind == 'mov':
+            files = [('MOV_%06d.MOV' % index, mp4_bytes(taken, rotation=rng.choice([0, 90])))]
+        else:
+            files = [('%06d.MTS' % index, b'\x47' + b'\0' * 1023)]
+
+        for name, content in files:
+            file = os.path.join(folder, name)
+            with open(file, 'wb') as f:
+                f.write(content)
+            # Read when there is no date in the file, and by the fake exiftool
+            os.utime(file, (taken, taken))
+
+    return counts
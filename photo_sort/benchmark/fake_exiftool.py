@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Stand-in for exiftool running in -stay_open mode, used by the benchmarks.
+
+Reads arguments from stdin, one per line, and answers every -execute with a
+JSON list containing SourceFile and EXIF:DateTimeOriginal, taken from the
+file modification time. Set FAKE_EXIFTOOL_LATENCY to the number of seconds
+each -execute should take, and FAKE_EXIFTOOL_FILE_LATENCY to the number of
+seconds spent per file, to simulate the cost of a real exiftool call.
+FAKE_EXIFTOOL_RESPONSE_SIZE pads every response to at least that many bytes.
+-TagsFromFile commands report one updated file if both files exist.
+"""
+
+import json
+import os
+import sys
+import time
+
+__author__ = 'marcus'
+
+
+def tags(file):
+    tags = {'SourceFile': file}
+
+    if os.path.isfile(file):
+        tags['EXIF:DateTimeOriginal'] = time.strftime('%Y:%m:%d %H:%M:%S', time.gmtime(os.path.getmtime(file)))
+
+    return tags
+
+
+def main():
+    latency = float(os.environ.get('FAKE_EXIFTOOL_LATENCY', 0))
+    file_latency = float(os.environ.get('FAKE_EXIFTOOL_FILE_LATENCY', 0))
+    response_size = int(os.environ.get('FAKE_EXIFTOOL_RESPONSE_SIZE', 0))
+    params = []
+
+    for line in sys.stdin.buffer:
+        param = os.fsdecode(line.rstrip(b'\n'))
+
+        if param == '-execute':
+            files = [p for p in params if not p.startswith('-')]
+            time.sleep(latency + file_latency * len(files))
+
+            if '-TagsFromFile' in params:
+                if all(os.path.isfile(file) for file in files):
+                    output = '    1 image files updated'
+                else:
+                    output = "    0 image files updated\n    1 files weren't updated due to errors"
+            else:
+                response = [tags(file) for file in files]
+                padding = response_size - len(json.dumps(response))
+                if padding > 0:
+                    response.append({'SourceFile': '', 'Padding': 'x' * padding})
+                output = json.dumps(response)
+
+            sys.stdout.write(output + '\n{ready}\n')
+            sys.stdout.flush()
+            params = []
+        elif param == 'False' and params[-1:] == ['-stay_open']:
+            return
+        else:
+            params.append(param)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Stand-in for HandBrakeCLI, used by the tests and benchmarks.
+
+Copies the -i file to the -o file. Set FAKE_HANDBRAKE_LATENCY to the number
+of seconds each encode should take, and FAKE_HANDBRAKE_MB_LATENCY to the
+number of seconds per megabyte of input. Every command line is appended to
+the file in FAKE_HANDBRAKE_LOG if set.
+"""
+
+import os
+import shutil
+import sys
+import time
+
+__author__ = 'marcus'
+
+
+def main():
+    arguments = sys.argv[1:]
+    input_file = arguments[arguments.index('-i') + 1]
+    output_file = arguments[arguments.index('-o') + 1]
+
+    if os.environ.get('FAKE_HANDBRAKE_LOG'):
+        with open(os.environ['FAKE_HANDBRAKE_LOG'], 'a') as log:
+            log.write(' '.join(arguments) + '\n')
+
+    latency = float(os.environ.get('FAKE_HANDBRAKE_LATENCY', 0))
+    latency += float(os.environ.get('FAKE_HANDBRAKE_MB_LATENCY', 0)) * os.path.getsize(input_file) / 1e6
+    time.sleep(latency)
+
+    shutil.copyfile(input_file, output_file)
+
+
+if __name__ == '__main__':
+    main()
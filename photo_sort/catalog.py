@@ -0,0 +1,145 @@
+"""Catalog of the files imported to an output folder.
+
+The catalog lets a later import to the same folder skip files already
+imported and number new files after the existing ones, with as many
+digits as the files imported first. A file is known if
+a file with the same path, size and modification time was imported, or
+one with the same content, like the same photo on another card. Content
+is compared by size and a hash of the first and last blocks, confirmed
+by a hash of the whole file.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
+import re
+
+import dedup
+from dedup import full_hash, partial_hash
+
+__author__ = 'marcus'
+
+catalog_file_name = '.photo_sort_catalog.json'
+
+
+def get_hashes(file):
+    """Return hash of the first and last blocks and hash of the whole file, None if that is the same"""
+    if os.path.getsize(file) <= 2 * dedup.partial_size:
+        return partial_hash(file).hex(), None
+
+    return partial_hash(file).hex(), full_hash(file).hex()
+
+
+class Catalog(object):
+    def __init__(self, folder):
+        self.path = os.path.join(folder, catalog_file_name)
+        self.entries = []
+        # Size, modification time and time taken of files checked by new_files, until added
+        self._checked = {}
+
+        if os.path.isfile(self.path):
+            with open(self.path) as catalog:
+                self.entries = json.load(catalog)
+
+        self._by_path = dict((entry['from'], entry) for entry in self.entries)
+        # Size and partial hash -> full hashes
+        self._by_content = {}
+        for entry in self.entries:
+            self._add_content(entry)
+        self._sizes = set(entry['size'] for entry in self.entries)
+
+    def _add_content(self, entry):
+        self._by_content.setdefault((entry['size'], entry['hash']), set()).add(entry.get('full_hash'))
+
+    def __len__(self):
+        return len(self.entries)
+
+    def next_index(self):
+        """Return index of the next file, continuing after the files already imported"""
+        return max([entry['index'] for entry in self.entries] + [-1]) + 1
+
+    def index_width(self):
+        """Return number of digits in the numbers of the files imported, None if nothing is imported"""
+        if not self.entries:
+            return None
+
+        entry = self.entries[-1]
+        if entry.get('index_width'):
+            return entry['index_width']
+
+        # Imported before the width was stored
+        return len(re.match(r'\d*', entry['name']).group())
+
+    def contains(self, file, stat):
+        entry = self._by_path.get(os.path.abspath(file))
+        if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+            return True
+
+        if stat.st_size not in self._sizes:
+            return False
+
+        full_hashes = self._by_content.get((stat.st_size, partial_hash(file).hex()))
+        if full_hashes is None:
+            return False
+
+        if stat.st_size <= 2 * dedup.partial_size:
+            # The partial hash was of the whole file
+            return True
+
+        return full_hash(file).hex() in full_hashes
+
+    def new_files(self, input_files):
+        """Return FileIndex of input files not in the catalog"""
+        known = set()
+
+        for index, file in enumerate(input_files.files):
+            stat = os.stat(file)
+
+            if self.contains(file, stat):
+                known.add(file)
+            else:
+                self._checked[file] = (stat.st_size, stat.st_mtime_ns, input_files.times_taken[index])
+
+        return input_files.without(known)
+
+    def add(self, rename_list, first_index, index_width=None):
+        """Add files imported with rename_list, numbered from first_index with index_width digits"""
+        # Moved files are only left at the new name
+        content_files = [rename['from'] if os.path.exists(rename['from']) else rename['to'] for rename in rename_list]
+        with ThreadPoolExecutor(dedup.hash_workers) as executor:
+            hashes = list(executor.map(get_hashes, content_files))
+
+        for index, (rename, content_file, (partial, full)) in enumerate(zip(rename_list, content_files, hashes),
+                                                                        first_index):
+
+            if rename['from'] in self._checked:
+                size, mtime_ns, time_taken = self._checked.pop(rename['from'])
+            else:
+                # Planned by an interrupted import
+                stat = os.stat(content_file)
+                size, mtime_ns, time_taken = stat.st_size, stat.st_mtime_ns, None
+
+            entry = {
+                'from': os.path.abspath(rename['from']),
+                'name': os.path.basename(rename['to']),
+                'index': index,
+                'index_width': index_width,
+                'time_taken': time_taken,
+                'size': size,
+                'mtime_ns': mtime_ns,
+                'hash': partial,
+                'full_hash': full,
+            }
+            self.entries.append(entry)
+            self._by_path[entry['from']] = entry
+            self._add_content(entry)
+            self._sizes.add(size)
+
+    def save(self):
+        """Write the catalog, replacing the previous one only when all is written"""
+        temporary_path = self.path + '.tmp'
+
+        with open(temporary_path, 'w') as catalog:
+            json.dump(self.entries, catalog)
+
+        os.replace(temporary_path, self.path)
@@ -0,0 +1,87 @@
+"""Find input files with the same content.
+
+Files are compared in three steps, each only for files still matching:
+size, a hash of the first and last blocks, and a hash of the whole file.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import mmap
+import os
+
+__author__ = 'marcus'
+
+# Bytes hashed at the start and at the end of a file before hashing all of it
+partial_size = 64 * 1024
+
+# Number of files hashed at the same time
+hash_workers = 4
+
+
+def partial_hash(file):
+    """Return hash of the first and last partial_size bytes of file"""
+    digest = hashlib.blake2b()
+
+    with open(file, 'rb') as f:
+        digest.update(f.read(partial_size))
+
+        size = os.fstat(f.fileno()).st_size
+        if size > partial_size:
+            f.seek(max(partial_size, size - partial_size))
+            digest.update(f.read(partial_size))
+
+    return digest.digest()
+
+
+def full_hash(file):
+    """Return hash of the whole file"""
+    digest = hashlib.blake2b()
+
+    with open(file, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            digest.update(data)
+
+    return digest.digest()
+
+
+def _regroup(executor, groups, key_function):
+    """Split each group of files on key_function, return the new groups with more than one file"""
+    files = [file for group in groups for file in group]
+    keys = dict(zip(files, executor.map(key_function, files)))
+    result = []
+
+    for group in groups:
+        by_key = {}
+        for file in group:
+            by_key.setdefault(keys[file], []).append(file)
+        result.extend(same for same in by_key.values() if len(same) > 1)
+
+    return result
+
+
+def find_duplicates(files, sizes, workers=None):
+    """Return dict mapping each duplicate file to the file with the same content that is kept
+
+    The file earliest in files is kept. Empty files are never duplicates.
+    """
+    by_size = {}
+    for file, size in zip(files, sizes):
+        if size:
+            by_size.setdefault(size, []).append(file)
+
+    groups = [group for group in by_size.values() if len(group) > 1]
+
+    with ThreadPoolExecutor(workers or hash_workers) as executor:
+        groups = _regroup(executor, groups, partial_hash)
+
+        # Small files were hashed completely already
+        small = [group for group in groups if os.path.getsize(group[0]) <= 2 * partial_size]
+        large = [group for group in groups if os.path.getsize(group[0]) > 2 * partial_size]
+        groups = small + _regroup(executor, large, full_hash)
+
+    duplicates = {}
+    for group in groups:
+        for file in group[1:]:
+            duplicates[file] = group[0]
+
+    return duplicates
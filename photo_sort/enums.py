@@ -5,6 +5,7 @@ class Mode(Enum):
     copy = 0
     move = 1
     replace = 2
+    link = 3
 
     def __str__(self):
         return self.name
@@ -9,3 +9,21 @@ class FolderNotEmptyException(Exception):
     def __init__(self, message):
         self.message = message
         super(Exception, self).__init__(message)
+
+
+class UnsupportedFormatException(Exception):
+    pass
+
+
+class ChecksumMismatchException(Exception):
+    pass
+
+
+class CancelledException(Exception):
+    pass
+
+
+class RenameConflictException(Exception):
+    def __init__(self, problems):
+        self.problems = problems
+        super(Exception, self).__init__('\n'.join(problems))
@@ -0,0 +1,364 @@
+"""Read date taken and video rotation directly from JPEG, TIFF, HEIC and QuickTime files.
+
+Only the bytes of the headers are read, by memory mapping the file and
+following segment and atom sizes. Files in other formats, or files that
+can not be parsed, raise UnsupportedFormatException so the caller can fall
+back to exiftool.
+"""
+
+import math
+import mmap
+import struct
+import time
+
+from exceptions import UnsupportedFormatException
+
+__author__ = 'marcus'
+
+# Seconds between 1904-01-01, the QuickTime epoch, and 1970-01-01
+quicktime_epoch = 2082844800
+
+heif_brands = [b'heic', b'heix', b'heim', b'heis', b'mif1', b'msf1', b'avif']
+quicktime_atoms = [b'ftyp', b'moov', b'mdat', b'wide', b'free', b'skip', b'pnot']
+
+
+def _map(file):
+    with open(file, 'rb') as f:
+        try:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty file
+            raise UnsupportedFormatException(file)
+
+
+def _tiff_tag(data, tiff_start, byte_order, ifd_offset, tag):
+    """Return (type, count, value, position of value) of tag in the IFD, or None if missing"""
+    position = tiff_start + ifd_offset
+    (entry_count,) = struct.unpack_from(byte_order + 'H', data, position)
+
+    for index in range(entry_count):
+        entry_tag, entry_type, count, value = struct.unpack_from(byte_order + 'HHII', data, position + 2 + index * 12)
+        if entry_tag == tag:
+            return entry_type, count, value, position + 10 + index * 12
+
+    return None
+
+
+def _tiff_date_time_original(data, tiff_start):
+    byte_order = {b'II': '<', b'MM': '>'}.get(bytes(data[tiff_start:tiff_start + 2]))
+    if not byte_order:
+        raise UnsupportedFormatException('Invalid TIFF header')
+
+    magic, ifd0 = struct.unpack_from(byte_order + 'HI', data, tiff_start + 2)
+    if magic != 42:
+        raise UnsupportedFormatException('Invalid TIFF header')
+
+    exif_ifd = _tiff_tag(data, tiff_start, byte_order, ifd0, 0x8769)
+    if not exif_ifd:
+        return None
+
+    date_time_original = _tiff_tag(data, tiff_start, byte_order, exif_ifd[2], 0x9003)
+    if not date_time_original:
+        return None
+
+    entry_type, count, value, value_position = date_time_original
+    if count > 4:
+        value_position = tiff_start + value
+
+    value = bytes(data[value_position:value_position + count])
+    return value.split(b'\0', 1)[0].decode('ascii', 'replace').strip()
+
+
+def _jpeg_date_time_original(data):
+    position = 2
+
+    while position + 4 <= len(data):
+        if data[position] != 0xff:
+            raise UnsupportedFormatException('Invalid JPEG marker')
+
+        marker = data[position + 1]
+        if marker == 0xff:
+            # Fill byte
+            position += 1
+        elif marker in (0x01, 0xd8) or 0xd0 <= marker <= 0xd7:
+            position += 2
+        elif marker in (0xd9, 0xda):
+            # Image data follows, no more metadata
+            return None
+        else:
+            (length,) = struct.unpack_from('>H', data, position + 2)
+            if marker == 0xe1 and data[position + 4:position + 10] == b'Exif\0\0':
+                return _tiff_date_time_original(data, position + 10)
+            position += 2 + length
+
+    return None
+
+
+def _boxes(data, start, end):
+    """Yield (type, payload start, end) of the ISO base media boxes between start and end"""
+    position = start
+
+    while position + 8 <= end:
+        size, box_type = struct.unpack_from('>I4s', data, position)
+        payload = position + 8
+
+        if size == 1:
+            (size,) = struct.unpack_from('>Q', data, payload)
+            payload += 8
+        elif size == 0:
+            size = end - position
+
+        if size < payload - position or position + size > end:
+            raise UnsupportedFormatException('Invalid box size')
+
+        yield box_type, payload, position + size
+        position += size
+
+
+def _find_box(data, start, end, box_type):
+    for child_type, payload, child_end in _boxes(data, start, end):
+        if child_type == box_type:
+            return payload, child_end
+
+    return None
+
+
+def _uint(data, position, size):
+    if size == 0:
+        return 0
+
+    return int.from_bytes(data[position:position + size], 'big')
+
+
+def _heif_date_time_original(data):
+    meta = _find_box(data, 0, len(data), b'meta')
+    if not meta:
+        raise UnsupportedFormatException('No meta box')
+
+    # meta is a full box, skip version and flags
+    iinf = _find_box(data, meta[0] + 4, meta[1], b'iinf')
+    iloc = _find_box(data, meta[0] + 4, meta[1], b'iloc')
+    if not iinf or not iloc:
+        raise UnsupportedFormatException('No item information')
+
+    version = data[iinf[0]]
+    entries = iinf[0] + (6 if version == 0 else 8)
+    exif_item = None
+
+    for box_type, payload, box_end in _boxes(data, entries, iinf[1]):
+        item_version = data[payload]
+        if box_type != b'infe' or item_version < 2:
+            continue
+
+        id_size = 2 if item_version == 2 else 4
+        item_id = _uint(data, payload + 4, id_size)
+        if data[payload + 6 + id_size:payload + 10 + id_size] == b'Exif':
+            exif_item = item_id
+            break
+
+    if exif_item is None:
+        return None
+
+    position = iloc[0]
+    version = data[position]
+    offset_size, length_size = data[position + 4] >> 4, data[position + 4] & 0xf
+    base_offset_size, index_size = data[position + 5] >> 4, data[position + 5] & 0xf
+    id_size = 4 if version == 2 else 2
+    item_count = _uint(data, position + 6, id_size)
+    position += 6 + id_size
+
+    for index in range(item_count):
+        item_id = _uint(data, position, id_size)
+        position += id_size
+        construction_method = 0
+
+        if version in (1, 2):
+            construction_method = _uint(data, position, 2) & 0xf
+            position += 2
+
+        base_offset = _uint(data, position + 2, base_offset_size)
+        position += 2 + base_offset_size
+        extent_count = _uint(data, position, 2)
+        position += 2
+        extents = []
+
+        for extent in range(extent_count):
+            if version in (1, 2):
+                position += index_size
+            extents.append(_uint(data, position, offset_size))
+            position += offset_size + length_size
+
+        if item_id == exif_item:
+            if construction_method != 0 or not extents:
+                raise UnsupportedFormatException('Exif item not stored in file')
+
+            exif_start = base_offset + extents[0]
+            (tiff_header_offset,) = struct.unpack_from('>I', data, exif_start)
+            return _tiff_date_time_original(data, exif_start + 4 + tiff_header_offset)
+
+    return None
+
+
+def _meta_children(data, meta):
+    """QuickTime meta atoms have no version and flags, ISO meta boxes do"""
+    if data[meta[0] + 4:meta[0] + 8] == b'hdlr':
+        return meta[0], meta[1]
+
+    return meta[0] + 4, meta[1]
+
+
+def _quicktime_creation_date(data, meta):
+    start, end = _meta_children(data, meta)
+    keys = _find_box(data, start, end, b'keys')
+    ilst = _find_box(data, start, end, b'ilst')
+    if not keys or not ilst:
+        return None
+
+    (entry_count,) = struct.unpack_from('>I', data, keys[0] + 4)
+    position = keys[0] + 8
+    key_index = None
+
+    for index in range(1, entry_count + 1):
+        (key_size,) = struct.unpack_from('>I', data, position)
+        if data[position + 8:position + key_size] == b'com.apple.quicktime.creationdate':
+            key_index = index
+            break
+        position += key_size
+
+    if key_index is None:
+        return None
+
+    item = _find_box(data, ilst[0], ilst[1], struct.pack('>I', key_index))
+    value = item and _find_box(data, item[0], item[1], b'data')
+    if not value:
+        return None
+
+    # Skip type indicator and locale, value is like 2014-08-01T12:30:00+0200
+    date_time = bytes(data[value[0] + 8:value[1]]).decode('utf-8', 'replace')
+    return date_time[:19].replace('-', ':').replace('T', ' ')
+
+
+def _quicktime_date_time_original(data):
+    moov = _find_box(data, 0, len(data), b'moov')
+    if not moov:
+        raise UnsupportedFormatException('No moov atom')
+
+    meta = _find_box(data, moov[0], moov[1], b'meta')
+    if meta:
+        # Local time the video was taken, like DateTimeOriginal in EXIF
+        creation_date = _quicktime_creation_date(data, meta)
+        if creation_date:
+            return creation_date
+
+    mvhd = _find_box(data, moov[0], moov[1], b'mvhd')
+    if not mvhd:
+        return None
+
+    if data[mvhd[0]] == 1:
+        (creation_time,) = struct.unpack_from('>Q', data, mvhd[0] + 4)
+    else:
+        (creation_time,) = struct.unpack_from('>I', data, mvhd[0] + 4)
+
+    if not creation_time:
+        return None
+
+    # Stored in UTC, use local time to match the other date tags
+    return time.strftime('%Y:%m:%d %H:%M:%S', time.localtime(creation_time - quicktime_epoch))
+
+
+def _quicktime_rotation(data):
+    moov = _find_box(data, 0, len(data), b'moov')
+    if not moov:
+        raise UnsupportedFormatException('No moov atom')
+
+    for box_type, payload, box_end in _boxes(data, moov[0], moov[1]):
+        if box_type != b'trak':
+            continue
+
+        mdia = _find_box(data, payload, box_end, b'mdia')
+        hdlr = mdia and _find_box(data, mdia[0], mdia[1], b'hdlr')
+        if not hdlr or data[hdlr[0] + 8:hdlr[0] + 12] != b'vide':
+            continue
+
+        tkhd = _find_box(data, payload, box_end, b'tkhd')
+        if not tkhd:
+            return None
+
+        matrix = tkhd[0] + (52 if data[tkhd[0]] == 1 else 40)
+        a, b = struct.unpack_from('>ii', data, matrix)
+        return int(round(math.degrees(math.atan2(b, a)))) % 360
+
+    return None
+
+
+def _file_type(data):
+    if data[:2] == b'\xff\xd8':
+        return 'jpeg'
+
+    if data[:4] in (b'II*\0', b'MM\0*'):
+        return 'tiff'
+
+    if data[4:8] == b'ftyp' and data[8:12] in heif_brands:
+        return 'heif'
+
+    if data[4:8] in quicktime_atoms:
+        return 'quicktime'
+
+    return None
+
+
+def read_date_time_original(file):
+    """Return date time taken as EXIF formatted string, or None if the file has no date.
+
+    This is EXIF DateTimeOriginal for photos, and the QuickTime creation
+    date for videos, converted to local time of this computer if the file
+    only has the time in UTC.
+    """
+    data = _map(file)
+
+    try:
+        file_type = _file_type(data)
+
+        if file_type == 'jpeg':
+            return _jpeg_date_time_original(data)
+        elif file_type == 'tiff':
+            return _tiff_date_time_original(data, 0)
+        elif file_type == 'heif':
+            return _heif_date_time_original(data)
+        elif file_type == 'quicktime':
+            return _quicktime_date_time_original(data)
+    except (struct.error, IndexError, ValueError):
+        raise UnsupportedFormatException(file)
+    finally:
+        data.close()
+
+    raise UnsupportedFormatException(file)
+
+
+def read_rotation(file):
+    """Return rotation in degrees of the video track in a QuickTime file"""
+    data = _map(file)
+
+    try:
+        if _file_type(data) == 'quicktime':
+            return _quicktime_rotation(data)
+    except (struct.error, IndexError, ValueError):
+        raise UnsupportedFormatException(file)
+    finally:
+        data.close()
+
+    raise UnsupportedFormatException(file)
+
+
+readers = {
+    'EXIF:DateTimeOriginal': read_date_time_original,
+    'Rotation': read_rotation,
+}
+
+
+def read_tag(tag, file):
+    """Return tag value read without exiftool, raise UnsupportedFormatException if not possible"""
+    if tag not in readers:
+        raise UnsupportedFormatException(tag)
+
+    return readers[tag](file)
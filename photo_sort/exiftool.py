@@ -64,6 +64,8 @@ import json
 import warnings
 import codecs
 
+import timing
+
 try:        # Py3k compatibility
     str
 except NameError:
@@ -82,8 +84,13 @@ sentinel = b"{ready}"
 
 # The block size when reading from exiftool.  The standard value
 # should be fine, though other values might give better performance in
-# some cases.
+# some cases.  The block size is doubled, up to max_block_size, every
+# time a read fills the whole block.
 block_size = 4096
+max_block_size = 1048576
+
+# Bytes treated as whitespace around the sentinel, as by bytes.strip()
+_whitespace = b" \t\n\r\x0b\x0c"
 
 
 # This code has been adapted from Lib/os.py in the Python source tree
@@ -158,6 +165,7 @@ class ExifTool(object):
         else:
             self.executable = executable_
         self.running = False
+        self._buffer = bytearray(block_size)
 
     def start(self):
         """Start an ``exiftool`` process in batch mode for this instance.
@@ -220,15 +228,37 @@ class ExifTool(object):
         .. note:: This is considered a low-level method, and should
            rarely be needed by application developers.
         """
-        if not self.running:
-            raise ValueError("ExifTool instance not running.")
-        self._process.stdin.write(b"\n".join(params + (b"-execute\n",)))
-        self._process.stdin.flush()
-        output = b""
-        fd = self._process.stdout.fileno()
-        while not output[-32:].strip().endswith(sentinel):
-            output += os.read(fd, block_size)
-        return output.strip()[:-len(sentinel)]
+        with timing.span('exiftool'):
+            if not self.running:
+                raise ValueError("ExifTool instance not running.")
+            self._process.stdin.write(b"\n".join(params + (b"-execute\n",)))
+            self._process.stdin.flush()
+            # Read straight into a buffer kept between calls, growing it
+            # geometrically, and only look at the end of the output for the
+            # sentinel instead of copying and rescanning it for every block.
+            buffer = self._buffer
+            stdout = self._process.stdout.raw
+            length = 0
+            read_size = block_size
+            while True:
+                if length + read_size > len(buffer):
+                    buffer.extend(bytes(max(len(buffer), length + read_size - len(buffer))))
+                with memoryview(buffer) as view:
+                    count = stdout.readinto(view[length:length + read_size])
+                if not count:
+                    raise IOError("exiftool process closed its output.")
+                length += count
+                if count == read_size:
+                    read_size = min(read_size * 2, max_block_size)
+                end = length
+                while end > 0 and buffer[end - 1] in _whitespace:
+                    end -= 1
+                if buffer[max(0, end - len(sentinel)):end] == sentinel:
+                    break
+            start = 0
+            while buffer[start] in _whitespace:
+                start += 1
+            return bytes(buffer[start:end - len(sentinel)])
 
     def execute_json(self, *params):
         """Execute the given batch of parameters and parse the JSON output.
@@ -0,0 +1,128 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import os
+import queue
+
+import exiftool
+
+__author__ = 'marcus'
+
+
+def default_workers():
+    return os.cpu_count() or 1
+
+
+class ExifToolPool(object):
+    """Run several ``exiftool`` processes and spread batch calls over them.
+
+    Can be used in place of :py:class:`exiftool.ExifTool`. Batch methods
+    split the file names in one contiguous shard per worker, run the shards
+    in parallel and return the results in the same order as the file names.
+    Other methods run on the first free worker.
+
+        with ExifToolPool(4) as et:
+            values = et.get_tag_batch('EXIF:DateTimeOriginal', files)
+    """
+
+    def __init__(self, workers=None, executable_=None):
+        self.workers = workers or default_workers()
+        self.executable = executable_
+        self.running = False
+
+    def start(self):
+        if self.running:
+            return
+
+        self._workers = [exiftool.ExifTool(self.executable) for _ in range(self.workers)]
+        self._idle = queue.Queue()
+        for worker in self._workers:
+            worker.start()
+            self._idle.put(worker)
+        self._executor = ThreadPoolExecutor(self.workers)
+        self.running = True
+
+    def terminate(self):
+        if not self.running:
+            return
+
+        self._executor.shutdown()
+        for worker in self._workers:
+            worker.terminate()
+        del self._workers, self._idle, self._executor
+        self.running = False
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.terminate()
+
+    def __del__(self):
+        self.terminate()
+
+    def _call(self, method, *args):
+        if not self.running:
+            raise ValueError("ExifToolPool not running.")
+
+        worker = self._idle.get()
+        try:
+            return getattr(worker, method)(*args)
+        finally:
+            self._idle.put(worker)
+
+    def _call_sharded(self, method, arg, filenames):
+        filenames = list(filenames)
+        shard_size = -(-len(filenames) // self.workers) or 1
+        shards = [filenames[start:start + shard_size] for start in range(0, len(filenames), shard_size)]
+
+        if len(shards) <= 1:
+            return self._call(method, arg, filenames)
+
+        result = []
+        for shard_result in self._executor.map(lambda shard: self._call(method, arg, shard), shards):
+            result.extend(shard_result)
+
+        return result
+
+    def execute(self, *params):
+        return self._call('execute', *params)
+
+    def execute_json(self, *params):
+        return self._call('execute_json', *params)
+
+    def get_metadata_batch(self, filenames):
+        return self._call_sharded('get_tags_batch', [], filenames)
+
+    def get_metadata(self, filename):
+        return self._call('get_metadata', filename)
+
+    def get_tags_batch(self, tags, filenames):
+        return self._call_sharded('get_tags_batch', tags, filenames)
+
+    def get_tags(self, tags, filename):
+        return self._call('get_tags', tags, filename)
+
+    def get_tag_batch(self, tag, filenames):
+        return self._call_sharded('get_tag_batch', tag, filenames)
+
+    def get_tag(self, tag, filename):
+        return self._call('get_tag', tag, filename)
+
+
+def open_exiftool(workers=1):
+    """Return a single ExifTool, or a pool if more than one worker is wanted"""
+    if workers > 1:
+        return ExifToolPool(workers)
+
+    return exiftool.ExifTool()
+
+
+@contextmanager
+def lazy_pool(workers=None):
+    """ExifToolPool started by the first call to start, so nothing runs when exiftool is not needed"""
+    et = ExifToolPool(workers)
+    try:
+        yield et
+    finally:
+        et.terminate()
@@ -0,0 +1,124 @@
+"""Journal of an import, so an interrupted import can be resumed.
+
+The journal is a file in the output folder with one JSON record per line,
+only ever appended to and synced to disk after each record. It starts with
+the planned renames, followed by a record for each copy, link, move or
+encode when it is done. It is removed when the import has finished.
+"""
+
+import json
+import os
+
+__author__ = 'marcus'
+
+journal_file_name = '.photo_sort_journal'
+
+
+def unchanged(record, stat):
+    return record['size'] == stat.st_size and record['mtime_ns'] == stat.st_mtime_ns
+
+
+class Journal(object):
+    def __init__(self, folder):
+        self.path = os.path.join(folder, journal_file_name)
+        self.rename_list = []
+        self.first_index = 0
+        self._done = {}
+        self._file = None
+
+    def exists(self):
+        return os.path.isfile(self.path)
+
+    def load(self):
+        with open(self.path) as journal:
+            for line in journal:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Last record was not completely written
+                    break
+
+                if record['op'] == 'start':
+                    self.first_index = record['first_index']
+                elif record['op'] == 'plan':
+                    self.rename_list.append({'from': record['from'], 'to': record['to']})
+                elif record['op'] == 'done':
+                    self._done[(record['step'], record['from'])] = record
+
+    def open(self):
+        self._file = open(self.path, 'a')
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def write(self, *records):
+        self._file.writelines(json.dumps(record) + '\n' for record in records)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def plan(self, rename_list, first_index=0):
+        self.write({'op': 'start', 'first_index': first_index},
+                   *({'op': 'plan', 'from': rename['from'], 'to': rename['to']} for rename in rename_list))
+
+        self.rename_list = rename_list
+        self.first_index = first_index
+
+    def completed(self, step, *renames):
+        """Record that step is done for renames, with size and modification time of the results"""
+        records = []
+
+        for rename in renames:
+            stat = os.stat(rename['to'])
+            record = {'op': 'done', 'step': step, 'from': rename['from'], 'to': rename['to'], 'size': stat.st_size,
+                      'mtime_ns': stat.st_mtime_ns}
+            records.append(record)
+            self._done[(step, rename['from'])] = record
+
+        self.write(*records)
+
+    def is_done(self, step, rename):
+        """Return True if step was recorded for rename and the result has not changed since
+
+        A video encoded after it was copied, linked or moved is done too.
+        """
+        if step != 'encode' and self.encoded(rename['to']):
+            return True
+
+        record = self._done.get((step, rename['from']))
+
+        try:
+            stat = os.stat(rename['to'])
+        except OSError:
+            return False
+
+        if record:
+            return unchanged(record, stat)
+
+        # Moved before the record was written
+        return step == 'move' and not os.path.exists(rename['from'])
+
+    def encoded(self, file):
+        """Return True if file was encoded and the encoded video has not changed since"""
+        # Videos are encoded from file + '_' when the encoded video takes the name of file
+        for name in (file, file + '_'):
+            record = self._done.get(('encode', name))
+            if record:
+                try:
+                    return unchanged(record, os.stat(record['to']))
+                except OSError:
+                    return False
+
+        return False
+
+    def remove(self):
+        self.close()
+        os.remove(self.path)
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,168 @@
+import json
+import os
+import sqlite3
+import sys
+import time
+
+from exceptions import UnsupportedFormatException
+import exif_reader
+
+__author__ = 'marcus'
+
+# Maximum number of tag values to keep, least recently used are removed first
+max_entries = 200000
+
+# Returned by MetadataCache.get when the value is not cached
+MISSING = object()
+
+
+def default_cache_path():
+    """Return path to the metadata cache in the user cache directory"""
+    if sys.platform == 'win32':
+        cache_dir = os.environ.get('LOCALAPPDATA', os.path.expanduser('~'))
+    elif sys.platform == 'darwin':
+        cache_dir = os.path.expanduser('~/Library/Caches')
+    else:
+        cache_dir = os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache'))
+
+    return os.path.join(cache_dir, 'photo_sort', 'metadata.sqlite')
+
+
+class MetadataCache(object):
+    """Persistent cache of tag values read with exiftool.
+
+    Values are stored per file and tag, together with size, modification
+    time and inode of the file. A cached value is only used if the file
+    has not changed since it was read.
+
+        with MetadataCache() as cache:
+            value = cache.get(file, 'EXIF:DateTimeOriginal')
+            if value is MISSING:
+                value = et.get_tag('EXIF:DateTimeOriginal', file)
+                cache.set(file, 'EXIF:DateTimeOriginal', value)
+    """
+
+    def __init__(self, path=None, max_entries_=None):
+        self.path = path or default_cache_path()
+        self.max_entries = max_entries if max_entries_ is None else max_entries_
+        self.hits = 0
+        self.misses = 0
+        self._connection = None
+
+    def open(self):
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        self._connection = sqlite3.connect(self.path)
+        self._connection.execute("""CREATE TABLE IF NOT EXISTS metadata (
+            path TEXT NOT NULL,
+            tag TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            inode INTEGER NOT NULL,
+            value TEXT,
+            accessed REAL NOT NULL,
+            PRIMARY KEY (path, tag))""")
+        self._connection.execute("CREATE INDEX IF NOT EXISTS metadata_accessed ON metadata (accessed)")
+
+    def close(self):
+        if self._connection is None:
+            return
+
+        self.evict()
+        self._connection.commit()
+        self._connection.close()
+        self._connection = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @staticmethod
+    def _key(file, stat=None):
+        stat = stat or os.stat(file)
+        return os.path.abspath(file), stat.st_size, stat.st_mtime_ns, stat.st_ino
+
+    def get(self, file, tag, stat=None):
+        """Return cached value of tag for file, or MISSING if not cached or file has changed
+
+        The stat result of the file is looked up if not given.
+        """
+        path, size, mtime_ns, inode = self._key(file, stat)
+        row = self._connection.execute(
+            "SELECT value FROM metadata WHERE path = ? AND tag = ? AND size = ? AND mtime_ns = ? AND inode = ?",
+            (path, tag, size, mtime_ns, inode)).fetchone()
+
+        if row is None:
+            self.misses += 1
+            return MISSING
+
+        self.hits += 1
+        self._connection.execute("UPDATE metadata SET accessed = ? WHERE path = ? AND tag = ?",
+                                 (time.time(), path, tag))
+        return json.loads(row[0])
+
+    def set(self, file, tag, value, stat=None):
+        path, size, mtime_ns, inode = self._key(file, stat)
+        self._connection.execute("INSERT OR REPLACE INTO metadata VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                 (path, tag, size, mtime_ns, inode, json.dumps(value), time.time()))
+
+    def evict(self):
+        """Remove least recently used values above max_entries"""
+        self._connection.execute(
+            "DELETE FROM metadata WHERE rowid IN "
+            "(SELECT rowid FROM metadata ORDER BY accessed DESC LIMIT -1 OFFSET ?)", (self.max_entries,))
+
+    def invalidate(self, directory=None):
+        """Remove cached values for files in directory and its sub folders, or everything if omitted.
+
+        Returns the number of removed values.
+        """
+        if directory is None:
+            cursor = self._connection.execute("DELETE FROM metadata")
+        else:
+            prefix = os.path.join(os.path.abspath(directory), '')
+            cursor = self._connection.execute("DELETE FROM metadata WHERE substr(path, 1, ?) = ?",
+                                              (len(prefix), prefix))
+        self._connection.commit()
+
+        return cursor.rowcount
+
+
+def read_tag(tag, file):
+    """Return tag value read without exiftool, or MISSING if the file format is not supported"""
+    try:
+        return exif_reader.read_tag(tag, file)
+    except UnsupportedFormatException:
+        return MISSING
+
+
+def read_exiftool_tag(et, tag, file):
+    """Return tag value read with exiftool, None if exiftool leaves the file out of its output"""
+    return (et.get_tag_batch(tag, [file]) or [None])[0]
+
+
+def get_tag(et, tag, file, cache=None):
+    """Return tag value for file from cache, or read it and store it in the cache
+
+    The value is read with exif_reader if possible, otherwise with exiftool.
+    """
+    value = cache.get(file, tag) if cache is not None else MISSING
+    if value is not MISSING:
+        return value
+
+    value = read_tag(tag, file)
+
+    if value is MISSING:
+        if not et.running:
+            et.start()
+        value = read_exiftool_tag(et, tag, file)
+
+    if cache is not None:
+        cache.set(file, tag, value)
+
+    return value
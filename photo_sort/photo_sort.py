@@ -1,15 +1,26 @@
+from array import array
 import calendar
 from datetime import datetime
 import errno
-from glob import glob
-import json
+from contextlib import nullcontext
+from fnmatch import fnmatchcase
 import os
 import re
-import shutil
+import threading
 from enums import Mode, Encode
 
-from exceptions import NoFileException, FolderNotEmptyException
-import exiftool
+from catalog import Catalog, catalog_file_name
+from dedup import find_duplicates
+from exceptions import NoFileException, FolderNotEmptyException, CancelledException, RenameConflictException
+from exiftool_pool import open_exiftool
+from journal import Journal, journal_file_name
+from metadata_cache import MetadataCache, MISSING, get_tag, read_exiftool_tag, read_tag
+import pipeline
+from progress import Progress
+import rename_history
+import rename_plan
+import timing
+import transfer
 from video import encode_videos, write_batch_list_windows
 
 __author__ = 'marcus'
@@ -17,6 +28,15 @@ __author__ = 'marcus'
 ignored_extensions = ['.thm', '.db', '.info']
 version = 'Photo Sort 1.1.0.b1'
 
+# Number of files to read EXIF data from in a single exiftool call
+metadata_chunk_size = 500
+
+# Number of files listed first and last in a summarised preview
+preview_summary_files = 10
+
+# Number of moved files recorded in the journal at a time, a move is found to be done without its record too
+journal_move_batch = 1000
+
 
 def folder_name(year=None, event=None, photographer=None, serial=None):
     if year and event:
@@ -40,7 +60,13 @@ def folder_name(year=None, event=None, photographer=None, serial=None):
     return output_folder_name
 
 
-def folder_path(output=None, year=None, event=None, sub_event=None, photographer=None):
+def folder_path(output=None, year=None, event=None, sub_event=None, photographer=None, incremental=False,
+                resume=False):
+    """Return a new output folder
+
+    With incremental the last folder with a catalog is returned instead, and
+    with resume the last folder with a journal, if there is one.
+    """
     if not year and not event and not sub_event and not photographer:
         output_folder_name = folder_name(serial=1)
     else:
@@ -48,13 +74,18 @@ def folder_path(output=None, year=None, event=None, sub_event=None, photographer
     output_folder = os.path.join(os.path.abspath(output), output_folder_name)
 
     serial = 1
+    catalog_folder = None
 
     while os.path.isdir(output_folder):
+        if incremental and os.path.isfile(os.path.join(output_folder, catalog_file_name)) or \
+                resume and os.path.isfile(os.path.join(output_folder, journal_file_name)):
+            catalog_folder = output_folder
+
         serial += 1
         output_folder_name = folder_name(year, event, photographer, serial)
         output_folder = os.path.join(os.path.abspath(output), output_folder_name)
 
-    return output_folder
+    return catalog_folder or output_folder
 
 
 def mkdir(output_folder):
@@ -73,6 +104,11 @@ def get_index_mask(file_count):
         return '%0' + str(len(str(file_count))) + 'd'
 
 
+def get_index_width(file_count):
+    """Return number of digits in the numbers of file_count files, as used by get_index_mask"""
+    return len(get_index_mask(file_count) % file_count)
+
+
 def get_output_file_name(year, event, sub_event, photographer, index_mask, index, input_file):
     output_file_name = index_mask % (index + 1)
 
@@ -111,12 +147,10 @@ def get_metadata_file(file):
     return file
 
 
-def get_time_taken(file, et):
-    """Return date time when photo or video was most likely taken"""
-    metadata_file = get_metadata_file(file)
-
+def parse_time_taken(file, date_time_original, stat=None):
+    """Return time taken from an EXIF value, falling back to file name and modification time"""
     try:
-        date_time = datetime.strptime(str(et.get_tag('EXIF:DateTimeOriginal', metadata_file)), '%Y:%m:%d %H:%M:%S')
+        date_time = datetime.strptime(str(date_time_original), '%Y:%m:%d %H:%M:%S')
         return calendar.timegm(date_time.utctimetuple())
     except:
         # Invalid format in EXIF tag, continue
@@ -128,45 +162,226 @@ def get_time_taken(file, et):
         date_time = datetime.strptime(match.group(1), '%Y%m%d_%H%M%S')
         return calendar.timegm(date_time.utctimetuple())
 
-    os_modify_time = os.path.getmtime(file)
+    os_modify_time = stat.st_mtime if stat else os.path.getmtime(file)
 
     return os_modify_time
 
 
-def get_input_files(directories):
-    """Get all files from multiple directories sorted by date"""
-    input_files = {}
+def get_time_taken(file, et, cache=None):
+    """Return date time when photo or video was most likely taken"""
+    metadata_file = get_metadata_file(file)
 
-    with exiftool.ExifTool() as et:
-        for directory in directories:
-            files = glob(os.path.join(directory, '*.*'))
+    return parse_time_taken(file, get_tag(et, 'EXIF:DateTimeOriginal', metadata_file, cache))
+
+
+def get_time_taken_batch(files, et, chunk_size=metadata_chunk_size, cache=None, stats=None):
+    """Return date time taken for each file
+
+    Files exif_reader can not read are read with exiftool, chunk_size files per call.
+    Stat results of the files can be given to save looking them up again.
+    """
+    with timing.span('get_time_taken'):
+        tag = 'EXIF:DateTimeOriginal'
+        stats = stats or [None] * len(files)
+        metadata_files = [get_metadata_file(file) for file in files]
+        # Stat results are only valid if the metadata is in the file itself
+        metadata_stats = [stat if metadata_file == file else None
+                          for file, metadata_file, stat in zip(files, metadata_files, stats)]
+        with timing.span('metadata_cache'):
+            values = [cache.get(metadata_file, tag, stat) if cache is not None else MISSING
+                      for metadata_file, stat in zip(metadata_files, metadata_stats)]
+
+        for index, value in enumerate(values):
+            if value is MISSING:
+                with timing.span('read_tag'):
+                    values[index] = read_tag(tag, metadata_files[index])
 
-            for file in files:
-                (base, extension)=os.path.splitext(file)
+                if values[index] is not MISSING and cache is not None:
+                    cache.set(metadata_files[index], tag, values[index], metadata_stats[index])
+
+        missing = [index for index, value in enumerate(values) if value is MISSING]
+
+        for start in range(0, len(missing), chunk_size):
+            chunk = missing[start:start + chunk_size]
+            chunk_files = [metadata_files[index] for index in chunk]
+
+            if not et.running:
+                et.start()
+            chunk_values = et.get_tag_batch(tag, chunk_files)
+
+            if len(chunk_values) != len(chunk_files):
+                # Files exiftool could not read are left out of the output, fall back to one call per file
+                chunk_values = [read_exiftool_tag(et, tag, metadata_file) for metadata_file in chunk_files]
+
+            for index, value in zip(chunk, chunk_values):
+                values[index] = value
+
+                if cache is not None:
+                    cache.set(metadata_files[index], tag, value, metadata_stats[index])
+
+        return [parse_time_taken(file, value, stat) for file, value, stat in zip(files, values, stats)]
+
+
+def scan_files(directory, recursive=False, include=None, exclude=None):
+    """Yield os.DirEntry for each file in directory, and its sub folders if recursive
+
+    Hidden files and files with ignored extensions are skipped. If include
+    patterns are given, file names must match one of them, and must not
+    match any of the exclude patterns. Patterns are not case sensitive.
+    """
+    include = [pattern.lower() for pattern in include or []]
+    exclude = [pattern.lower() for pattern in exclude or []]
+    folders = [directory]
+
+    while folders:
+        with os.scandir(folders.pop(0)) as entries:
+            for entry in entries:
+                if entry.name.startswith('.'):
+                    continue
+
+                if entry.is_dir():
+                    if recursive:
+                        folders.append(entry.path)
+                    continue
+
+                (base, extension)=os.path.splitext(entry.name)
                 if extension.lower() in ignored_extensions:
                     continue
 
-                time_taken = get_time_taken(file, et)
+                name = entry.name.lower()
+                if include and not any(fnmatchcase(name, pattern) for pattern in include):
+                    continue
 
-                while time_taken in input_files:
-                    time_taken += 1
+                if any(fnmatchcase(name, pattern) for pattern in exclude):
+                    continue
+
+                yield entry
+
+
+def remove_empty_folders(directory):
+    """Remove empty sub folders of directory, deepest first"""
+    for folder, folders, files in os.walk(directory, topdown=False):
+        if folder != directory and not os.listdir(folder):
+            os.rmdir(folder)
+
+
+def chunks(iterable, size):
+    """Yield lists of up to size items"""
+    chunk = []
+
+    for item in iterable:
+        chunk.append(item)
+
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+
+    if chunk:
+        yield chunk
+
+
+def file_sort_key(file):
+    """Order files taken at the same time by name, with numbers compared by value so IMG_9 comes before IMG_10"""
+    name = re.sub(r'\d+', lambda match: match.group().zfill(20), os.path.basename(file).lower())
+    return name, file
+
+
+class FileIndex(object):
+    """Input files, the time they were taken and their size, kept in parallel arrays"""
+
+    def __init__(self):
+        self.times_taken = array('d')
+        self.sizes = array('q')
+        self.files = []
+
+    def __len__(self):
+        return len(self.files)
+
+    def add(self, file, time_taken, size=0):
+        self.times_taken.append(time_taken)
+        self.sizes.append(size)
+        self.files.append(file)
 
-                input_files[time_taken] = file
+    def sorted_order(self):
+        """Return indexes of files sorted by time taken, then by file_sort_key"""
+        times_taken = self.times_taken
+        sort_keys = [file_sort_key(file) for file in self.files]
+
+        return sorted(range(len(self.files)), key=lambda index: (times_taken[index], sort_keys[index]))
+
+    def sorted_files(self):
+        return [self.files[index] for index in self.sorted_order()]
+
+    def same_time_count(self):
+        """Return number of files taken in the same second as an earlier file"""
+        times_taken = sorted(self.times_taken)
+
+        return sum(1 for index in range(1, len(times_taken)) if times_taken[index] == times_taken[index - 1])
+
+    def without(self, files):
+        """Return a new index without the given files"""
+        input_files = FileIndex()
+
+        for index, file in enumerate(self.files):
+            if file not in files:
+                input_files.add(file, self.times_taken[index], self.sizes[index])
+
+        return input_files
+
+
+def remove_duplicates(input_files, workers=None):
+    """Return input files without files having the same content as an earlier file, and the duplicates removed"""
+    order = input_files.sorted_order()
+    duplicates = find_duplicates([input_files.files[index] for index in order],
+                                 [input_files.sizes[index] for index in order], workers)
+
+    return input_files.without(duplicates), duplicates
+
+
+def get_input_files(directories, chunk_size=metadata_chunk_size, cache=None, workers=1, recursive=False,
+                    include=None, exclude=None, progress=None, cancelled=None):
+    """Get all files from multiple directories with the time they were taken
+
+    progress is updated with 'scan', file and size for each file. If the
+    cancelled event is set, CancelledException is raised between chunks.
+    """
+    input_files = FileIndex()
+
+    # Not started until a file is missing in the metadata cache
+    et = open_exiftool(workers)
+
+    try:
+        for directory in directories:
+            for entries in chunks(scan_files(directory, recursive, include, exclude), chunk_size):
+                if cancelled is not None and cancelled.is_set():
+                    raise CancelledException()
+
+                files = [entry.path for entry in entries]
+                with timing.span('stat'):
+                    stats = [entry.stat() for entry in entries]
+
+                times_taken = get_time_taken_batch(files, et, chunk_size, cache, stats)
+
+                for file, time_taken, stat in zip(files, times_taken, stats):
+                    input_files.add(file, time_taken, stat.st_size)
+
+                    if progress:
+                        progress.update('scan', file, stat.st_size)
+    finally:
+        et.terminate()
 
     return input_files
 
 
-def get_rename_list(year, event, sub_event, photographer, input_files, output_folder):
+def get_rename_list(year, event, sub_event, photographer, input_files, output_folder, first_index=0, index_width=None):
+    """Return list of renames, numbering files from first_index with index_width digits if given"""
     rename_list = []
-    file_count = len(input_files)
-    index_mask = get_index_mask(file_count)
+    file_count = first_index + len(input_files)
+    index_mask = '%0' + str(index_width) + 'd' if index_width else get_index_mask(file_count)
 
-    for index, key in enumerate(sorted(input_files)):
-        input_file = input_files[key]
+    for index, input_file in enumerate(input_files.sorted_files(), first_index):
         output_file_name = get_output_file_name(year, event, sub_event, photographer, index_mask, index, input_file)
-        if not output_folder:
-            output_folder = os.path.dirname(input_file)
-        output_file = os.path.join(output_folder, output_file_name)
+        output_file = os.path.join(output_folder or os.path.dirname(input_file), output_file_name)
 
         rename = {'from': input_file, 'to': output_file}
         rename_list.append(rename)
@@ -175,7 +390,10 @@ def get_rename_list(year, event, sub_event, photographer, input_files, output_fo
 
 
 class PhotoSort:
-    def __init__(self, input, output, year, event, sub_event, photographer, dry_run, encode=Encode.yes, move=False, rename_history=False, decomb=False):
+    def __init__(self, input, output, year, event, sub_event, photographer, dry_run, encode=Encode.yes, move=False, rename_history=False, link=False, decomb=False, metadata_cache=True, metadata_workers=1,
+                 copy_workers=None, device_workers=None, encode_jobs=1, encode_threads=None, recursive=False,
+                 include=None, exclude=None, pipeline=False, dedup=False, incremental=False, resume=False,
+                 verify=False, progress=None, cancelled=None):
         self.encode = Encode[encode]
         self.dry_run = dry_run
         self.rename_history = rename_history
@@ -186,15 +404,96 @@ class PhotoSort:
         self.sub_event = sub_event
         self.photographer = photographer
         self.decomb = decomb
-
-        self.output_folder = folder_path(self.output, self.year, self.event, self.sub_event, self.photographer) if self.output else None
-        self.mode = Mode.move if move else Mode.copy
-
-        input_files = get_input_files(input)
+        self.metadata_cache = metadata_cache
+        self.metadata_workers = metadata_workers
+        self.copy_workers = copy_workers
+        self.device_workers = device_workers
+        self.encode_jobs = encode_jobs
+        self.encode_threads = encode_threads
+        self.recursive = recursive
+        self.include = include
+        self.exclude = exclude
+        self.verify = verify
+        # Updated with phase, file and size for each file processed
+        self.progress = progress or Progress()
+        # Set to stop processing between files
+        self.cancelled = cancelled or threading.Event()
+        # New files are only known when all files are scanned
+        self.incremental = incremental and output
+        self.resume = resume and output
+        # Files are scanned while processing, so there is nothing to preview
+        self.pipeline = pipeline and output and not dry_run and not self.incremental and not self.resume
+
+        self.output_folder = folder_path(self.output, self.year, self.event, self.sub_event, self.photographer,
+                                         self.incremental, self.resume) if self.output else None
+        self.mode = Mode.move if move else Mode.link if link else Mode.copy
+        # Duplicates are left in the input folders
+        self.duplicates = {}
+        self.duplicate_bytes = 0
+        self.catalog = Catalog(self.output_folder) if self.incremental else None
+        self.first_index = 0
+        # Digits in the numbers of the files, kept from the files imported before
+        self.index_width = self.catalog.index_width() if self.catalog is not None else None
+        self.wider_index = False
+        self.known_files = 0
+        self.same_time = 0
+        self.journal = None
+
+        if not self.output and not dry_run:
+            for folder in input:
+                # Files being renamed have hidden temporary names until the rename is finished
+                if rename_plan.finish(folder):
+                    print('Finished renaming files in "%s", which was interrupted.' % folder)
+
+        if self.pipeline:
+            self.rename_list = None
+            return
+
+        if self.resume:
+            journal = Journal(self.output_folder)
+            if journal.exists():
+                journal.load()
+
+            if journal.rename_list:
+                # Continue with the files and names planned before
+                self.journal = journal
+                self.rename_list = journal.rename_list
+                self.first_index = journal.first_index
+                return
+
+        with self.open_metadata_cache() as cache:
+            input_files = get_input_files(input, cache=cache, workers=self.metadata_workers, recursive=recursive,
+                                          include=include, exclude=exclude, progress=self.progress,
+                                          cancelled=self.cancelled)
+            self.progress.end()
         if not len(input_files):
             raise NoFileException
 
-        self.rename_list = get_rename_list(self.year, self.event, self.sub_event, self.photographer, input_files, self.output_folder)
+        if dedup:
+            input_files, self.duplicates = remove_duplicates(input_files)
+            self.duplicate_bytes = sum(os.path.getsize(file) for file in self.duplicates)
+
+        if self.catalog is not None:
+            file_count = len(input_files)
+            input_files = self.catalog.new_files(input_files)
+            self.known_files = file_count - len(input_files)
+            self.first_index = self.catalog.next_index()
+
+            if not len(input_files):
+                raise NoFileException
+
+        file_count = self.first_index + len(input_files)
+        if self.index_width is None:
+            self.index_width = get_index_width(file_count)
+        # Numbers that do not fit are not padded, so they no longer sort by name
+        self.wider_index = get_index_width(file_count) > self.index_width
+
+        self.same_time = input_files.same_time_count()
+        self.rename_list = get_rename_list(self.year, self.event, self.sub_event, self.photographer, input_files,
+                                           self.output_folder, self.first_index, self.index_width)
+
+    def open_metadata_cache(self):
+        return MetadataCache() if self.metadata_cache else nullcontext()
 
     def set_mode(self, mode):
         self.mode = mode
@@ -202,40 +501,143 @@ class PhotoSort:
     def set_encode_videos(self, encode):
         self.encode = encode
 
-    def move_files(self, rename_list):
-        for rename in rename_list:
-            shutil.move(rename["from"], rename["to"])
+    def pending(self, step, rename_list):
+        """Return renames where step was not done by an interrupted import"""
+        if self.journal is None:
+            return rename_list
 
-            path, file_name = os.path.split(rename["to"])
-            print(file_name)
+        pending = [rename for rename in rename_list if not self.journal.is_done(step, rename)]
+        if len(pending) < len(rename_list):
+            print('Skipping %d files done before.' % (len(rename_list) - len(pending)))
 
-        if not self.dry_run:
-            print('Moved/renamed %d files.' % len(rename_list))
+        return pending
 
-            if self.rename_history:
-                with open(os.path.join(path, 'rename_history.json'), 'w') as rename_history:
-                    json.dump(rename_list, rename_history)
-        else:
-            print('Would have moved/renamed %d files, if not dry run' % len(rename_list))
+    def completed(self, step, rename, size=0, detail=None):
+        if self.journal is not None:
+            self.journal.completed(step, rename)
 
-    def copy_files(self, rename_list):
-        for rename in rename_list:
-            if not self.dry_run:
-                shutil.copy2(rename["from"], rename["to"])
+        self.progress.update(step, rename['to'], size, detail)
 
-            path, file_name = os.path.split(rename["to"])
-            print(file_name)
+    def cancel(self):
+        """Stop processing after the files being processed"""
+        self.cancelled.set()
 
-        if not self.dry_run:
-            print('Copied %d files.' % len(rename_list))
+    def check_cancelled(self):
+        if self.cancelled.is_set():
+            raise CancelledException()
+
+    def move_files(self, rename_list):
+        if self.dry_run:
+            print('Would have moved/renamed %d files, if not dry run' % len(rename_list))
+            return
+
+        if self.output:
+            self.move_to_output(rename_list)
         else:
-            print('Would have copied %d files, if not dry run' % len(rename_list))
+            self.rename_in_place(rename_list)
+
+        if self.rename_history:
+            rename_history.write(os.path.dirname(rename_list[-1]["to"]), rename_list)
+
+    def move_to_output(self, rename_list):
+        """Rename files on the same file system, copy, verify and remove the others"""
+        summary = transfer.TransferSummary()
+        move_function = transfer.VerifiedMove()
+        manifest = transfer.Manifest(self.output_folder)
+        pending = self.pending('move', rename_list)
+        self.progress.start('move', len(pending))
+        moved = []
+
+        try:
+            for rename, strategy, size in transfer.move_files(pending, self.copy_workers, self.device_workers,
+                                                              move_function):
+                summary.add(strategy, size)
+                self.progress.update('move', rename['to'], size, strategy)
+
+                # Renamed files are not copied, so they have no checksum
+                if self.verify and rename['to'] in move_function.digests:
+                    manifest.add(rename['to'], move_function.digests.pop(rename['to']))
+
+                if self.journal is not None:
+                    moved.append(rename)
+                    if len(moved) == journal_move_batch:
+                        self.journal.completed('move', *moved)
+                        moved = []
+
+                self.check_cancelled()
+        finally:
+            manifest.close()
+            if moved:
+                self.journal.completed('move', *moved)
+
+        self.progress.end()
+        print('Moved/renamed %d files, %s.' % (summary.files, summary))
+
+    def rename_in_place(self, rename_list):
+        """Rename files in their folders, in an order where no file is overwritten"""
+        renames = [(os.path.abspath(rename['from']), os.path.abspath(rename['to'])) for rename in rename_list]
+        steps = rename_plan.get_steps(renames)
+        problems, inodes = rename_plan.check(steps, rename_plan.list_folders(path for step in steps for path in step))
+        if problems:
+            raise RenameConflictException(problems)
+
+        plan = rename_plan.RenamePlan(self.input[0])
+        plan.write(steps, inodes)
+        self.progress.start('move', len(steps))
+        plan.run(lambda source, destination: self.progress.update('move', destination, detail='rename'))
+        plan.remove()
+        self.progress.end()
+
+        unchanged = sum(1 for source, destination in renames if source == destination)
+        print('Renamed %d files with %d temporary renames, %d files already had their names.'
+              % (len(renames) - unchanged, len(steps) - len(renames) + unchanged, unchanged))
+
+    def copy_files(self, rename_list, copy_function=transfer.copy, manifest=None):
+        """Copy or link files, adding the checksum of each verified copy to manifest if given"""
+        if not self.dry_run:
+            summary = transfer.TransferSummary()
+
+            step = 'link' if copy_function == transfer.link else 'copy'
+            pending = self.pending(step, rename_list)
+            self.progress.start(step, len(pending))
+
+            for rename, strategy, size in transfer.copy_files(pending, self.copy_workers, self.device_workers,
+                                                              copy_function):
+                summary.add(strategy, size)
+                if manifest is not None:
+                    manifest.add(rename['to'], copy_function.digests.pop(rename['to']))
+                self.completed(step, rename, size, strategy)
+                self.check_cancelled()
+
+            self.progress.end()
+            return summary
 
     def process_files(self, rename_list):
         if self.mode == Mode.move:
             self.move_files(rename_list)
+        elif self.mode == Mode.link:
+            summary = self.copy_files(rename_list, transfer.link)
+
+            if not self.dry_run:
+                copied = summary.files - summary.strategies.get('link', 0)
+                print('Linked %d files, %d copied instead, %s.' % (summary.files, copied, summary))
+            else:
+                print('Would have linked %d files, if not dry run' % len(rename_list))
+        elif self.verify:
+            with transfer.Manifest(self.output_folder) as manifest:
+                summary = self.copy_files(rename_list, transfer.VerifiedCopy(), manifest)
+
+            if not self.dry_run:
+                print('Copied and verified %d files, %s.' % (summary.files, summary))
+            else:
+                print('Would have copied and verified %d files, if not dry run' % len(rename_list))
         else:
-            self.copy_files(rename_list)
+            summary = self.copy_files(rename_list)
+
+            if not self.dry_run:
+                print('Copied %d files, %s.' % (summary.files, summary))
+            else:
+                print('Would have copied %d files, if not dry run' % len(rename_list))
 
     def get_summary(self):
         return """
@@ -247,61 +649,179 @@ output="{7}"
 """.format(self.event or "", self.year or "", self.sub_event or "", self.photographer or "", self.dry_run, self.encode,
            self.mode, self.output_folder or "Input directories", self.decomb)
 
-    def get_preview(self):
-        text = ""
-        extension_count = {}
-
-        len_before = len(os.path.split(self.rename_list[0]["from"])[1])
-        len_after = len(os.path.split(self.rename_list[0]["to"])[1])
+    def preview_header(self):
+        len_before = len(os.path.basename(self.rename_list[0]["from"]))
+        len_after = len(os.path.basename(self.rename_list[0]["to"]))
 
         header_format = "{0:^" + str(len_before) + "}{1:^" + str(len_after) + "}"
-        text += header_format.format("Before", "After") + "\n"
-        text += "-" * len_before + "\t" + "-" * len_after + "\n"
+        yield header_format.format("Before", "After")
+        yield "-" * len_before + "\t" + "-" * len_after
+
+    def preview_footer(self):
+        extension_count = {}
 
         for rename in self.rename_list:
-            path, old_name = os.path.split(rename['from'])
-            base, extension = os.path.splitext(old_name)
-            path, new_name = os.path.split(rename['to'])
+            extension = os.path.splitext(os.path.basename(rename['from']))[1]
+            extension_count[extension] = extension_count.get(extension, 0) + 1
+
+        extensions = ["%s=%d" % (extension, count) for extension, count in extension_count.items()]
+
+        yield ""
+        yield "Number of files:" + ", ".join(extensions)
+
+        if self.duplicates:
+            yield self.get_duplicate_summary()
+
+        if self.catalog is not None:
+            yield "Skipped %d files already imported, numbering continues from %d." % (self.known_files,
+                                                                                      self.first_index + 1)
+
+    def preview_collisions(self):
+        if self.same_time:
+            yield "%d files were taken in the same second as another file, they are ordered by name." % \
+                self.same_time
+
+        if self.wider_index:
+            yield "New files get more than the %d digits of the files imported before, names will not sort by " \
+                  "number." % self.index_width
+
+        # Names of files that are renamed themselves are free when they are needed
+        sources = set(os.path.abspath(rename['from']) for rename in self.rename_list)
+        taken = [rename['to'] for rename in self.rename_list
+                 if os.path.exists(rename['to']) and os.path.exists(rename['from']) and
+                 os.path.abspath(rename['to']) not in sources and
+                 (self.journal is None or not self.journal.is_done(str(self.mode), rename))]
+        if taken:
+            yield "%d new names are used by existing files, like %s." % (len(taken), os.path.basename(taken[0]))
+
+    def preview_lines(self, summary=False):
+        """Yield the preview one line at a time
+
+        The summary only lists the first and last files, and warns about files
+        taken at the same time and names already used.
+        """
+        if self.rename_list is None:
+            yield "Files are listed while they are processed."
+            return
 
-            if extension in extension_count:
-                extension_count[extension] += 1
+        yield from self.preview_header()
+
+        if summary and len(self.rename_list) > 2 * preview_summary_files:
+            renames = self.rename_list[:preview_summary_files] + [None] + self.rename_list[-preview_summary_files:]
+        else:
+            renames = self.rename_list
+
+        for rename in renames:
+            if rename is None:
+                yield "... %d more files ..." % (len(self.rename_list) - 2 * preview_summary_files)
             else:
-                extension_count[extension] = 1
+                yield os.path.basename(rename['from']) + "\t" + os.path.basename(rename['to'])
+
+        yield from self.preview_footer()
 
-            text += old_name + "\t" + new_name + "\n"
+        if summary:
+            yield from self.preview_collisions()
 
-        extensions = []
+    def get_preview(self, summary=False):
+        return "\n".join(self.preview_lines(summary))
 
-        for extension in extension_count:
-            extensions.append("%s=%d" % (extension, extension_count[extension]))
+    def get_duplicate_summary(self):
+        return "Skipped %d duplicate files, %.1f MB." % (len(self.duplicates), self.duplicate_bytes / 1e6)
 
-        text += "\nNumber of files:" + ", ".join(extensions)
+    def get_imported_files(self):
+        """Files to encode in the output folder, None for all files"""
+        if self.catalog is None and self.journal is None:
+            return None
 
-        return text
+        # Encoded videos are removed, or replaced when encoded to the same name
+        return [rename['to'] for rename in self.rename_list if os.path.exists(rename['to']) and
+                (self.journal is None or not self.journal.encoded(rename['to']))]
+
+    def open_journal(self):
+        """Start journal of this import, or continue the journal of the import being resumed"""
+        if self.journal is None:
+            self.journal = Journal(self.output_folder)
+            self.journal.open()
+            self.journal.plan(self.rename_list, self.first_index)
+        else:
+            self.journal.open()
+
+    def encoded(self, input_file, output_file, seconds):
+        self.completed('encode', {'from': input_file, 'to': output_file}, os.path.getsize(output_file),
+                       'encoded in %.1f s' % seconds)
 
     def process(self):
+        try:
+            self.process_steps()
+        except BaseException:
+            # Kept for --resume
+            if self.journal is not None:
+                self.journal.close()
+            raise
+        finally:
+            self.progress.end()
+
+    def process_steps(self):
         if not self.dry_run and self.output:
             mkdir(self.output_folder)
 
-        self.process_files(self.rename_list)
+        if self.pipeline:
+            try:
+                self.rename_list = pipeline.run(self)
+            except NoFileException:
+                os.rmdir(self.output_folder)
+                raise
+
+            print('Processed %d files.' % len(self.rename_list))
+
+            if self.mode == Mode.move and self.rename_history:
+                rename_history.write(self.output_folder, self.rename_list)
+        else:
+            if not self.dry_run and self.output:
+                self.open_journal()
+
+            self.process_files(self.rename_list)
+
+            if self.duplicates:
+                print(self.get_duplicate_summary())
+
+            if self.catalog is not None and not self.dry_run:
+                self.catalog.add(self.rename_list, self.first_index, self.index_width)
+                self.catalog.save()
 
         # TODO: Fix nesting
         if not self.dry_run:
-            if self.encode == Encode.yes:
-                if self.output:
-                    encode_videos(self.output_folder, self.decomb)
-                else:
-                    for input_folder in self.input:
-                        encode_videos(input_folder, self.decomb)
-            elif self.encode == Encode.later:
-                if self.output:
-                    write_batch_list_windows(self.output_folder, self.decomb)
-                else:
-                    for input_folder in self.input:
-                        write_batch_list_windows(input_folder, self.decomb)
+            with self.open_metadata_cache() as cache:
+                if self.encode == Encode.yes and self.pipeline:
+                    # Encoded by the pipeline
+                    pass
+                elif self.encode == Encode.yes:
+                    if self.output:
+                        encode_videos(self.output_folder, self.decomb, cache, self.metadata_workers,
+                                      self.encode_jobs, self.encode_threads, self.get_imported_files(), self.encoded,
+                                      self.cancelled)
+                        self.check_cancelled()
+                    else:
+                        for input_folder in self.input:
+                            encode_videos(input_folder, self.decomb, cache, self.metadata_workers,
+                                          self.encode_jobs, self.encode_threads, done=self.encoded,
+                                          cancelled=self.cancelled)
+                        self.check_cancelled()
+                elif self.encode == Encode.later:
+                    if self.output:
+                        write_batch_list_windows(self.output_folder, self.decomb, cache, self.get_imported_files())
+                    else:
+                        for input_folder in self.input:
+                            write_batch_list_windows(input_folder, self.decomb, cache)
+
+        if self.journal is not None:
+            self.journal.remove()
 
         if self.mode == Mode.move and self.output:
             for input_folder in self.input:
+                if self.recursive:
+                    remove_empty_folders(input_folder)
+
                 try:
                     os.rmdir(input_folder)
                 except OSError as ex:
@@ -4,7 +4,9 @@
 """Photo Sort
 
 Usage:
-    photo-sort.py -i <input> ... [-o <output>] [-y <year>] [-e <event>] [-s <sub-event>] [-p <photographer>] [options]
+    photo-sort.py -i <input> ... [-o <output>] [-y <year>] [-e <event>] [-s <sub-event>] [-p <photographer>] [--include <pattern>]... [--exclude <pattern>]... [options]
+    photo-sort.py --clear-metadata-cache [<folder>]
+    photo-sort.py --undo <folder> [--dry-run]
 
 Options:
     -i --input <input>...             Folder(s) with photos to process
@@ -14,11 +16,36 @@ Options:
     -e --event <event>                Optional: Name of the event
     -s --sub-event <sub-event>        Optional: Name of part of the event
     -p --photographer <photographer>  Optional: Name of person taking the photos
+    -r --recursive                    Include files in sub folders of the input folders
+    --include <pattern>               Only process files with names matching the pattern, like "*.jpg". Can be repeated
+    --exclude <pattern>               Skip files with names matching the pattern. Can be repeated
+    --incremental                     Add new files to the last output folder of the event instead of a new folder.
+                                        Files already imported there are skipped. Requires output
+    --resume                          Continue an interrupted import in the last output folder of the event
+    --dedup                           Skip files with the same content as another input file. Not with --pipeline
+    --pipeline                        Scan, copy and encode at the same time. Requires output, no preview is shown
+    --summary                         Preview counts and the first and last files instead of every file
     --dry-run                         Make no changes
-    --move                            Move files instead of copy
+    --move                            Move files instead of copy. Files on another disk are copied, checked
+                                        against the original and then removed
+    --link                            Hard link files instead of copy, copy if on another disk
+    --verify                          Check each copy against a checksum of the original, read while copying.
+                                        Checksums are written to b2sums.txt in the output folder
     --rename-history                  Write names before and after move to a file in output directory
+    --copy-workers <workers>          Number of files to copy at the same time [default: 1]
+    --device-workers <workers>        Number of files to copy from or to the same disk at the same time [default: 2]
     --encode (no|yes|later)           Video: If and when videos should be encoded [default: yes]
     --decomb                          Video: Enable decombing during encode to remove interlacing
+    --encode-jobs <jobs>              Video: Number of videos to encode at the same time [default: 1]
+    --encode-threads <threads>        Video: Number of CPU threads to divide between the encodes
+    --metadata-workers <workers>      Number of ExifTool processes reading metadata in parallel [default: 1]
+    --no-metadata-cache               Always read EXIF data from files instead of using cached values
+    -v --verbose                      Print the name of each file processed, instead of a progress bar
+    --progress-json <file>            Write progress of each file to a file, one JSON object per line
+    --profile                         Print time spent in each phase when done
+    --profile-json <file>             Write time spent in each phase to a JSON file when done
+    --clear-metadata-cache            Remove cached EXIF data for files in <folder>, or all if omitted
+    --undo                            Rename files back using the rename history in <folder>
     
 
 Example:
@@ -28,8 +55,16 @@ More info:
     Encoding of videos requires HandBrakeCLI and ExifTool to be on the system path.
 """
 
+from itertools import islice
+import shutil
+import sys
+
 from docopt import docopt
-from exceptions import NoFileException, FolderNotEmptyException
+from exceptions import NoFileException, FolderNotEmptyException, ChecksumMismatchException, RenameConflictException
+from metadata_cache import MetadataCache
+from progress import Progress, ProgressBar, VerboseSink, JsonLinesSink
+import rename_history
+import timing
 
 from photo_sort import version, PhotoSort
 
@@ -49,31 +84,116 @@ def yes_no_dialog(prompt):
         return False
 
 
+def page(lines, page_size=None):
+    """Print lines a screen at a time, waiting for the reader in between when writing to a terminal"""
+    page_size = page_size or shutil.get_terminal_size().lines - 1
+    lines = iter(lines)
+
+    while True:
+        screen = list(islice(lines, page_size))
+        if screen:
+            print("\n".join(screen))
+        if len(screen) < page_size:
+            return
+        if sys.stdout.isatty() and input("-- Enter for more, q to stop listing -- ").lower().startswith('q'):
+            return
+
+
+def get_progress(arguments):
+    sinks = []
+
+    if arguments['--verbose']:
+        sinks.append(VerboseSink())
+    elif sys.stdout.isatty():
+        sinks.append(ProgressBar())
+
+    if arguments['--progress-json']:
+        sinks.append(JsonLinesSink(arguments['--progress-json']))
+
+    return Progress(sinks)
+
+
+def print_problems(problems):
+    print("\n".join(problems[:20]))
+    if len(problems) > 20:
+        print('... %d more problems ...' % (len(problems) - 20))
+    print('Nothing was renamed.')
+
+
+def undo(folder, dry_run):
+    try:
+        file_count = rename_history.undo(folder, dry_run)
+    except NoFileException:
+        print('No rename history in "%s".' % folder)
+        return
+    except RenameConflictException as e:
+        print_problems(e.problems)
+        return
+
+    if dry_run:
+        print('Would have renamed %d files back, if not dry run' % file_count)
+    else:
+        print('Renamed %d files back.' % file_count)
+
+
 def main():
     arguments = docopt(__doc__, version=version)
 
+    if arguments['--clear-metadata-cache']:
+        with MetadataCache() as cache:
+            print('Removed %d cached values.' % cache.invalidate(arguments['<folder>']))
+        return
+
+    if arguments['--undo']:
+        undo(arguments['<folder>'], arguments['--dry-run'])
+        return
+
+    timing.enabled = arguments['--profile'] or bool(arguments['--profile-json'])
+
     if not arguments['--output']:
         if len(arguments['--input']) > 1:
             print("Can not replace in place with more than one input directory")
             return
         arguments['--move'] = True
 
+    progress = get_progress(arguments)
+    try:
+        run(arguments, progress)
+    finally:
+        progress.close()
+
+
+def run(arguments, progress):
     try:
         sorter = PhotoSort(input=arguments['--input'], output=arguments['--output'],
                            year=arguments['--year'], event=arguments['--event'],
                            sub_event=arguments['--sub-event'], photographer=arguments['--photographer'],
                            encode=arguments['--encode'], dry_run=arguments['--dry-run'],
-                           move=arguments['--move'], rename_history=arguments['--rename-history'],
-                           decomb=arguments['--decomb'])
+                           move=arguments['--move'], link=arguments['--link'], rename_history=arguments['--rename-history'],
+                           decomb=arguments['--decomb'], metadata_cache=not arguments['--no-metadata-cache'],
+                           metadata_workers=int(arguments['--metadata-workers']),
+                           copy_workers=int(arguments['--copy-workers']),
+                           device_workers=int(arguments['--device-workers']),
+                           encode_jobs=int(arguments['--encode-jobs']),
+                           encode_threads=int(arguments['--encode-threads'] or 0),
+                           recursive=arguments['--recursive'], include=arguments['--include'],
+                           exclude=arguments['--exclude'], pipeline=arguments['--pipeline'],
+                           dedup=arguments['--dedup'], incremental=arguments['--incremental'],
+                           resume=arguments['--resume'], verify=arguments['--verify'],
+                           progress=progress)
     except NoFileException:
         print('No files to process.')
         return
+    except RenameConflictException as e:
+        # Left by an interrupted move
+        print_problems(e.problems)
+        return
 
     print(sorter.get_summary())
 
     #print("Building file list..\n")
 
-    print(sorter.get_preview())
+    page(sorter.preview_lines(arguments['--summary']))
 
     if not yes_no_dialog("\nContinue? [yes] "):
         print('Photo sort aborted.')
@@ -81,10 +201,24 @@ def main():
 
     try:
         sorter.process()
+    except NoFileException:
+        print('No files to process.')
+        return
     except FolderNotEmptyException as e:
         print(e.message)
+    except ChecksumMismatchException as e:
+        print(e)
+        return
+    except RenameConflictException as e:
+        print_problems(e.problems)
+        return
 
     print("\nAll done!")
 
+    if arguments['--profile']:
+        print('\n' + timing.report())
+    if arguments['--profile-json']:
+        timing.write_json(arguments['--profile-json'])
+
 if __name__ == '__main__':
     main()
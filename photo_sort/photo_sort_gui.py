@@ -7,20 +7,62 @@ Usage:
     photo_sort_gui.py <input> ...
 """
 
+from itertools import islice
 import os
+import queue
+import threading
+import time
 from tkinter import *
 import tkinter as tk
 import tkinter.filedialog
-from tkinter.messagebox import askyesno
 
 from docopt import docopt
 import photo_sort
 from enums import Mode, Encode
+from exceptions import CancelledException, NoFileException
+from progress import Progress, CallbackSink, phase_names
 
 __author__ = "Marcus Götling"
 __license__ = "MIT"
 __email__ = "marcus@gotling.se"
 
+# Number of files added to the preview each time more are shown
+preview_page_size = 500
+
+# Milliseconds between checks for events from the worker thread
+poll_interval = 100
+
+
+class ProgressStats:
+    """Files and bytes per second, and time left if the number of files is known, of one phase"""
+
+    def __init__(self, phase, total=None):
+        self.phase = phase
+        self.total = total
+        self.start = time.time()
+        self.files = 0
+        self.bytes = 0
+
+    def add(self, size):
+        self.files += 1
+        self.bytes += size
+
+    def __str__(self):
+        elapsed = max(time.time() - self.start, 1e-6)
+        files_per_second = self.files / elapsed
+
+        text = '%s: %d' % (phase_names.get(self.phase, self.phase), self.files)
+        if self.total:
+            text += ' of %d' % self.total
+        text += ' files, %.1f files/s, %.1f MB/s' % (files_per_second, self.bytes / 1e6 / elapsed)
+
+        if self.total and files_per_second:
+            minutes, seconds = divmod(int((self.total - self.files) / files_per_second), 60)
+            text += ', %d:%02d left' % (minutes, seconds)
+
+        return text
+
+
 
 class PhotoSortApp:
     def __init__(self, parent, input_folders):
@@ -55,7 +97,8 @@ class PhotoSortApp:
         self.mode.set(Mode.replace.value)
         Radiobutton(self.container, text='Rename', variable=self.mode, value=Mode.replace.value).grid(row=3, sticky=W)
         Radiobutton(self.container, text='Copy', variable=self.mode, value=Mode.copy.value).grid(row=3, column=1, sticky=W)
-        Radiobutton(self.container, text='Move', variable=self.mode, value=Mode.move.value).grid(row=3, column=2, columnspan=3, sticky=W)
+        Radiobutton(self.container, text='Move', variable=self.mode, value=Mode.move.value).grid(row=3, column=2, sticky=W)
+        Radiobutton(self.container, text='Link', variable=self.mode, value=Mode.link.value).grid(row=3, column=3, sticky=W)
 
         self.encode = BooleanVar()
         self.encode.set(True)
@@ -86,6 +129,19 @@ class PhotoSortApp:
         self.process_button.grid(row=5, column=3, sticky="ew")
         self.process_button.bind("<Button-1>", self.process_button_click)
 
+        self.cancel_button = Button(self.container, text="Cancel", height="2", state=DISABLED,
+                                    command=self.cancel)
+        self.cancel_button.grid(row=5, column=2, sticky="ew")
+
+        self.status_label = Label(self.container, text="", anchor=W)
+        self.status_label.grid(row=6, columnspan=4, sticky=W)
+
+        # Events from the worker thread, handled on the main loop
+        self.events = queue.Queue()
+        self.worker = None
+        self.cancelled = None
+        self.stats = None
+
         bottom_panel = Frame(self.container, borderwidth=1, relief="sunken")
         bottom_panel.grid(row=8, columnspan=5)
         self.console_string = "Fill in fields and press Process to start\n"
@@ -108,14 +164,85 @@ class PhotoSortApp:
 
     def process_button_click(self, event):
         report_event(event)
+        if self.worker and self.worker.is_alive():
+            return
         self.prepare()
 
+    def cancel(self):
+        if self.cancelled:
+            self.cancelled.set()
+            self.log("Canceling after the files being processed...")
+
+    def progress(self, event):
+        """Called from the worker thread for each file"""
+        self.events.put(('progress', event.phase, event.bytes))
+
+    def run_in_background(self, name, function):
+        """Run function on a worker thread, put its result as event name when done"""
+        def work():
+            try:
+                self.events.put((name, function()))
+            except CancelledException:
+                self.events.put(('cancelled', None))
+            except NoFileException:
+                self.events.put(('error', 'No files to process.'))
+            except Exception as ex:
+                self.events.put(('error', str(ex)))
+
+        self.process_button["state"] = DISABLED
+        self.cancel_button["state"] = NORMAL
+        self.worker = threading.Thread(target=work, daemon=True)
+        self.worker.start()
+        self.app_parent.after(poll_interval, self.poll)
+
+    def poll(self):
+        """Handle events from the worker thread"""
+        while True:
+            try:
+                event = self.events.get_nowait()
+            except queue.Empty:
+                break
+
+            if event[0] == 'progress':
+                phase, size = event[1:]
+                if not self.stats or self.stats.phase != phase:
+                    total = len(self.photoSort.rename_list) if phase in ('copy', 'link', 'move') else None
+                    self.stats = ProgressStats(phase, total)
+                self.stats.add(size)
+            else:
+                self.finished(*event)
+                return
+
+        if self.stats:
+            self.status_label["text"] = str(self.stats)
+
+        self.app_parent.after(poll_interval, self.poll)
+
+    def finished(self, name, result):
+        if self.stats:
+            self.status_label["text"] = str(self.stats)
+        self.stats = None
+        self.process_button["state"] = NORMAL
+        self.cancel_button["state"] = DISABLED
+
+        if name == 'prepared':
+            self.photoSort = result
+            self.log("Found %d files." % len(self.photoSort.rename_list))
+            self.confirm_rename_dialog()
+        elif name == 'processed':
+            self.log("Done!")
+        elif name == 'cancelled':
+            self.log("Canceled")
+        else:
+            self.log("Failed: %s" % result)
+
     def prepare(self):
         year = self.year_entry.get().strip()
         event = self.event_entry.get().strip()
         sub_event = self.sub_event_entry.get().strip()
         photographer = self.photographer_entry.get().strip()
         encode = self.choices[self.var.get()].name
+        decomb = self.decomb.get()
 
         if Mode(self.mode.get()) == Mode.replace:
             mode = Mode.move
@@ -126,32 +253,84 @@ class PhotoSortApp:
             output = tkinter.filedialog.askdirectory(title="Choose output folder", initialdir=dialog_dir, mustexist=True)
             if output == "":
                 return
-            mode = self.mode.get()
+            mode = Mode(self.mode.get())
 
         self.log("Processing folders. Please wait...")
-        self.photoSort = photo_sort.PhotoSort(self.input_folders, output, year, event, sub_event, photographer,
-                                              encode=encode, dry_run=False, decomb=self.decomb.get())
-        self.photoSort.set_mode(mode)
-        #self.photoSort.set_encode_videos(self.encode.get())
+        self.cancelled = threading.Event()
 
-        self.confirm_rename_dialog()
+        def scan():
+            sorter = photo_sort.PhotoSort(self.input_folders, output, year, event, sub_event, photographer,
+                                          encode=encode, dry_run=False, decomb=decomb,
+                                          progress=Progress([CallbackSink(self.progress)]),
+                                          cancelled=self.cancelled)
+            sorter.set_mode(mode)
+            #sorter.set_encode_videos(self.encode.get())
+            return sorter
+
+        self.run_in_background('prepared', scan)
 
     def confirm_rename_dialog(self):
-        if askyesno('Verify changes below', self.photoSort.get_summary() + "\n" + self.photoSort.get_preview() + "\n\nContinue?"):
+        if PreviewDialog(self.app_parent, self.photoSort).ask():
             self.rename()
         else:
             self.log("Canceled")
             return
 
     def rename(self):
-        self.photoSort.process()
-        self.log("Done!")
+        self.run_in_background('processed', self.photoSort.process)
 
     def log(self, string):
         self.console_text.insert(END, string + "\n")
         self.console_text.see(END)
 
 
+class PreviewDialog:
+    """Summary of the changes, where all files can be listed a page at a time"""
+
+    def __init__(self, parent, photo_sort):
+        self.confirmed = False
+        self.lines = photo_sort.preview_lines()
+        self.listing = False
+
+        self.window = Toplevel(parent)
+        self.window.title('Verify changes below')
+        self.window.transient(parent)
+
+        scrollbar = tk.Scrollbar(self.window, orient="vertical")
+        self.text = tk.Text(self.window, background="white", width=80, height=24, yscrollcommand=scrollbar.set)
+        scrollbar.config(command=self.text.yview)
+        self.text.grid(row=0, column=0, columnspan=3, sticky="nsew")
+        scrollbar.grid(row=0, column=3, sticky="ns")
+        self.text.insert(END, photo_sort.get_summary() + "\n" + photo_sort.get_preview(summary=True))
+
+        self.more_button = Button(self.window, text="List all files", command=self.show_more)
+        self.more_button.grid(row=1, column=0, sticky="ew")
+        Button(self.window, text="Cancel", command=self.window.destroy).grid(row=1, column=1, sticky="ew")
+        Button(self.window, text="Continue", default="active", command=self.confirm).grid(row=1, column=2, sticky="ew")
+
+    def show_more(self):
+        if not self.listing:
+            self.listing = True
+            self.text.delete("1.0", END)
+            self.more_button["text"] = "Show more"
+
+        lines = list(islice(self.lines, preview_page_size))
+        self.text.insert(END, "".join(line + "\n" for line in lines))
+
+        if len(lines) < preview_page_size:
+            self.more_button["state"] = DISABLED
+
+    def confirm(self):
+        self.confirmed = True
+        self.window.destroy()
+
+    def ask(self):
+        """Wait until the dialog is closed, return True if the user chose to continue"""
+        self.window.grab_set()
+        self.window.wait_window()
+        return self.confirmed
+
+
 def report_event(event):
     """Print a description of an event, based on its attributes.
     """
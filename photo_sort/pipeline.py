@@ -0,0 +1,292 @@
+"""Import files with scanning, copying, encoding and renaming running at the same time.
+
+Each stage runs in its own threads and passes files to the next stage
+through a bounded queue:
+
+    scan -> copy to staging folder -> encode videos -> rename to final name
+
+Final names depend on the order of all files, so files wait in the staging
+folder, inside the output folder, until the scan is done. They are then
+moved to their final names with os.replace. If the import fails, moved
+files are moved back from the staging folder and copies are removed.
+"""
+
+from contextlib import nullcontext
+import os
+import queue
+import shutil
+import threading
+
+from enums import Mode, Encode
+from exceptions import NoFileException
+from exiftool_pool import lazy_pool
+import photo_sort
+import timing
+import transfer
+import video
+
+__author__ = 'marcus'
+
+# Number of files waiting between two stages
+queue_size = 64
+
+staging_folder_name = '.photo_sort_staging'
+
+# Put in a queue when a stage has no more files
+DONE = object()
+
+
+class PipelineFailed(Exception):
+    pass
+
+
+class Pipeline(object):
+    def __init__(self, sorter):
+        self.sorter = sorter
+        self.staging_folder = os.path.join(sorter.output_folder, staging_folder_name)
+        self.final_names = None
+        self.rename_list = None
+        self.failed = threading.Event()
+        self.errors = []
+        self.threads = []
+        self.verified_copy = transfer.VerifiedCopy() if sorter.verify else None
+        self.verified_move = transfer.VerifiedMove()
+        self.manifest = transfer.Manifest(sorter.output_folder)
+        # Staged name -> item, of the files in the staging folder
+        self.staged = {}
+        self.staged_lock = threading.Lock()
+
+    def put(self, outbox, item):
+        while True:
+            if self.failed.is_set():
+                raise PipelineFailed()
+            try:
+                outbox.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def get(self, inbox):
+        while True:
+            if self.failed.is_set():
+                raise PipelineFailed()
+            try:
+                return inbox.get(timeout=0.1)
+            except queue.Empty:
+                pass
+
+    def stage(self, function, inbox, outbox, workers=1, context=nullcontext):
+        """Start workers threads calling function for each item in inbox and putting the result in outbox
+
+        Each thread opens its own context, which is passed to function with the item.
+        """
+        remaining = [workers]
+        lock = threading.Lock()
+
+        def work():
+            try:
+                with context() as value:
+                    while True:
+                        item = self.get(inbox)
+                        if item is DONE:
+                            # Let the other workers of this stage see it too
+                            inbox.put(DONE)
+                            break
+                        self.put(outbox, function(value, item))
+
+                with lock:
+                    remaining[0] -= 1
+                    if not remaining[0]:
+                        self.put(outbox, DONE)
+            except PipelineFailed:
+                pass
+            except BaseException as ex:
+                self.errors.append(ex)
+                self.failed.set()
+
+        for worker in range(workers):
+            self.start_thread(work)
+
+    def start_thread(self, target, *args):
+        thread = threading.Thread(target=target, args=args, daemon=True)
+        thread.start()
+        self.threads.append(thread)
+
+    def scan(self, outbox):
+        """Read date taken of all input files, then decide final names"""
+        sorter = self.sorter
+        input_files = photo_sort.FileIndex()
+        index = 0
+
+        try:
+            et = photo_sort.open_exiftool(sorter.metadata_workers)
+            try:
+                with sorter.open_metadata_cache() as cache:
+                    for directory in sorter.input:
+                        files = photo_sort.scan_files(directory, sorter.recursive, sorter.include, sorter.exclude)
+
+                        for entries in photo_sort.chunks(files, photo_sort.metadata_chunk_size):
+                            files = [entry.path for entry in entries]
+                            with timing.span('stat'):
+                                stats = [entry.stat() for entry in entries]
+                            times_taken = photo_sort.get_time_taken_batch(files, et, cache=cache, stats=stats)
+
+                            for file, time_taken, stat in zip(files, times_taken, stats):
+                                input_files.add(file, time_taken, stat.st_size)
+                                self.put(outbox, {'index': index, 'from': file})
+                                index += 1
+            finally:
+                et.terminate()
+
+            self.rename_list = photo_sort.get_rename_list(sorter.year, sorter.event, sorter.sub_event,
+                                                          sorter.photographer, input_files, sorter.output_folder)
+            self.final_names = dict((rename['from'], rename['to']) for rename in self.rename_list)
+            self.put(outbox, DONE)
+        except PipelineFailed:
+            pass
+        except BaseException as ex:
+            self.errors.append(ex)
+            self.failed.set()
+
+    def copy(self, context, item):
+        """Copy, link or move the file to a temporary name in the staging folder"""
+        (base, extension) = os.path.splitext(item['from'])
+        item['staged'] = os.path.join(self.staging_folder, '%06d%s' % (item['index'], extension.lower()))
+
+        with timing.span(str(self.sorter.mode)) as span:
+            if self.sorter.mode == Mode.move:
+                transfer.move(item['from'], item['staged'], self.verified_move)
+                # Only files moved to another file system are copied and have a checksum
+                digest = self.verified_move.digests.pop(item['staged'], None)
+                if digest and self.sorter.verify:
+                    item['digest'] = digest
+            elif self.sorter.mode == Mode.link:
+                transfer.link(item['from'], item['staged'])
+            elif self.verified_copy:
+                self.verified_copy(item['from'], item['staged'])
+                item['digest'] = self.verified_copy.digests.pop(item['staged'])
+            else:
+                transfer.copy(item['from'], item['staged'])
+
+            if timing.enabled:
+                span.size = os.path.getsize(item['staged'])
+
+        with self.staged_lock:
+            self.staged[item['staged']] = item
+
+        return item
+
+    def encode(self, et, item):
+        (base, extension) = os.path.splitext(item['staged'])
+
+        if self.sorter.encode == Encode.yes and extension in video.video_extensions:
+            et.start()
+            output_file = base + '.encoded.mp4'
+            rotation = video.get_rotation(et, item['staged'])
+            threads = video.get_threads_per_job(self.sorter.encode_jobs, self.sorter.encode_threads)
+            seconds = video.encode_video(et, item['staged'], output_file, rotation, self.sorter.decomb, threads)
+            with self.staged_lock:
+                del self.staged[item['staged']]
+                self.staged[output_file] = item
+            item['staged'] = output_file
+            item['encoded'] = True
+            item['encode_seconds'] = seconds
+
+        return item
+
+    def rename(self, item):
+        final_name = self.final_names[item['from']]
+        if item.get('encoded'):
+            final_name = os.path.splitext(final_name)[0] + '.mp4'
+
+        os.replace(item['staged'], final_name)
+        with self.staged_lock:
+            del self.staged[item['staged']]
+
+        if 'digest' in item and not item.get('encoded'):
+            self.manifest.add(final_name, item['digest'])
+
+        progress = self.sorter.progress
+        progress.update('import', final_name, os.path.getsize(final_name) if progress.sinks else 0,
+                        'encoded in %.1f s' % item['encode_seconds'] if item.get('encoded') else None)
+
+    def restore(self):
+        """Move files in the staging folder back to where they came from, or remove the copies
+
+        The originals of encoded videos are gone, so those videos are left in
+        the staging folder.
+        """
+        left = []
+        back = []
+
+        for staged, item in self.staged.items():
+            if self.sorter.mode != Mode.move:
+                os.remove(staged)
+            elif item.get('encoded'):
+                left.append(staged)
+            else:
+                back.append({'from': staged, 'to': item['from']})
+
+        for rename, strategy, size in transfer.move_files(back):
+            pass
+
+        if left:
+            print('Encoded videos are left in "%s".' % self.staging_folder)
+        else:
+            # Only files of stages that were interrupted are left
+            shutil.rmtree(self.staging_folder)
+
+    def run(self):
+        """Run all stages, return rename list"""
+        photo_sort.mkdir(self.staging_folder)
+
+        scanned = queue.Queue(queue_size)
+        staged = queue.Queue(queue_size)
+        encoded = queue.Queue(queue_size)
+
+        self.start_thread(self.scan, scanned)
+        self.stage(self.copy, scanned, staged, self.sorter.copy_workers or 1)
+        self.stage(self.encode, staged, encoded, self.sorter.encode_jobs, lambda: lazy_pool(1))
+
+        waiting = []
+        try:
+            while True:
+                item = self.get(encoded)
+                if item is DONE:
+                    break
+
+                # Names are known when the scan is done
+                if self.final_names is None:
+                    waiting.append(item)
+                    continue
+
+                for waiting_item in waiting:
+                    self.rename(waiting_item)
+                waiting = []
+                self.rename(item)
+
+            for item in waiting:
+                self.rename(item)
+        except PipelineFailed:
+            raise self.errors[0]
+        except BaseException:
+            self.failed.set()
+            raise
+        finally:
+            for thread in self.threads:
+                thread.join()
+            self.manifest.close()
+
+            if self.failed.is_set():
+                self.restore()
+
+        os.rmdir(self.staging_folder)
+
+        if not self.rename_list:
+            raise NoFileException
+
+        return self.rename_list
+
+
+def run(sorter):
+    return Pipeline(sorter).run()
@@ -0,0 +1,201 @@
+"""Progress of an import, sent as events to pluggable sinks.
+
+An import goes through phases, like scan, copy and encode. For each file
+processed an event with phase, file, bytes and seconds since the phase
+started is sent to every sink:
+
+    ProgressBar     throttled progress line on the terminal
+    JsonLinesSink   one JSON object per line in a file
+    CallbackSink    calls a function with each event
+    VerboseSink     prints the name of each file, like photo sort used to
+
+Events are sent from the thread running the import.
+"""
+
+from collections import namedtuple
+import json
+import os
+import sys
+import time
+
+__author__ = 'marcus'
+
+ProgressEvent = namedtuple('ProgressEvent', ['phase', 'file', 'bytes', 'elapsed', 'detail'])
+
+phase_names = {
+    'scan': 'Reading dates',
+    'copy': 'Copying',
+    'link': 'Linking',
+    'move': 'Moving',
+    'encode': 'Encoding',
+    'import': 'Importing',
+}
+
+
+class Progress(object):
+    """Counts files and bytes of the current phase and passes events on to the sinks"""
+
+    def __init__(self, sinks=None):
+        self.sinks = list(sinks or [])
+        self.phase = None
+        self.total = None
+        self.started = 0
+        self.files = 0
+        self.bytes = 0
+
+    def start(self, phase, total=None):
+        """Start a phase, total is the number of files if known"""
+        if self.phase:
+            self.end()
+
+        self.phase = phase
+        self.total = total
+        self.started = time.time()
+        self.files = 0
+        self.bytes = 0
+
+        for sink in self.sinks:
+            sink.start(self)
+
+    def update(self, phase, file, size=0, detail=None):
+        """Count a processed file, starting phase if it is not the current one"""
+        if phase != self.phase:
+            self.start(phase)
+
+        self.files += 1
+        self.bytes += size
+
+        if self.sinks:
+            event = ProgressEvent(phase, file, size, self.elapsed(), detail)
+            for sink in self.sinks:
+                sink.update(self, event)
+
+    def end(self):
+        if not self.phase:
+            return
+
+        for sink in self.sinks:
+            sink.end(self)
+
+        self.phase = None
+
+    def elapsed(self):
+        return time.time() - self.started
+
+    def close(self):
+        self.end()
+
+        for sink in self.sinks:
+            sink.close()
+
+
+class Sink(object):
+    """Base of the sinks, ignoring everything"""
+
+    def start(self, progress):
+        pass
+
+    def update(self, progress, event):
+        pass
+
+    def end(self, progress):
+        pass
+
+    def close(self):
+        pass
+
+
+class ProgressBar(Sink):
+    """Progress line rewritten at most every interval seconds"""
+
+    def __init__(self, stream=None, interval=0.2, width=30):
+        self.stream = stream or sys.stdout
+        self.interval = interval
+        self.width = width
+        self.shown = 0
+
+    def text(self, progress):
+        elapsed = max(progress.elapsed(), 1e-6)
+        files_per_second = progress.files / elapsed
+        text = '%-14s %d' % (phase_names.get(progress.phase, progress.phase), progress.files)
+
+        if progress.total:
+            done = min(progress.files / float(progress.total), 1.0)
+            filled = int(done * self.width)
+            text += '/%d [%s%s] %3d%%' % (progress.total, '#' * filled, ' ' * (self.width - filled), done * 100)
+        else:
+            text += ' files'
+
+        text += ' %.1f files/s %.1f MB/s' % (files_per_second, progress.bytes / 1e6 / elapsed)
+
+        if progress.total and files_per_second:
+            minutes, seconds = divmod(int((progress.total - progress.files) / files_per_second), 60)
+            text += ' %d:%02d left' % (minutes, seconds)
+
+        return text
+
+    def show(self, progress):
+        self.stream.write('\r' + self.text(progress).ljust(79))
+        self.stream.flush()
+        self.shown = time.time()
+
+    def start(self, progress):
+        self.shown = 0
+
+    def update(self, progress, event):
+        if time.time() - self.shown >= self.interval:
+            self.show(progress)
+
+    def end(self, progress):
+        if progress.files:
+            self.show(progress)
+            self.stream.write('\n')
+
+
+class VerboseSink(Sink):
+    """Prints the name of every file, with details like the copy strategy"""
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+
+    def update(self, progress, event):
+        if event.phase == 'scan':
+            return
+
+        name = os.path.basename(event.file)
+        self.stream.write((name + ' (%s)' % event.detail if event.detail else name) + '\n')
+
+
+class JsonLinesSink(Sink):
+    """Writes phase starts, files and phase ends as JSON, one object per line"""
+
+    def __init__(self, file):
+        self.file = open(file, 'w', buffering=1)
+
+    def write(self, record):
+        self.file.write(json.dumps(record) + '\n')
+
+    def start(self, progress):
+        self.write({'event': 'start', 'phase': progress.phase, 'total': progress.total})
+
+    def update(self, progress, event):
+        record = event._asdict()
+        record['event'] = 'file'
+        self.write(record)
+
+    def end(self, progress):
+        self.write({'event': 'end', 'phase': progress.phase, 'files': progress.files, 'bytes': progress.bytes,
+                    'elapsed': progress.elapsed()})
+
+    def close(self):
+        self.file.close()
+
+
+class CallbackSink(Sink):
+    """Calls function with each ProgressEvent"""
+
+    def __init__(self, function):
+        self.function = function
+
+    def update(self, progress, event):
+        self.function(event)
@@ -0,0 +1,92 @@
+"""Names of files before and after a move, written with --rename-history, and undoing the move.
+
+The history is a list of renames, with 'from' and 'to' as absolute paths.
+Undo checks that every renamed file is still there and that no file would
+be overwritten before renaming anything, and renames with a RenamePlan so
+an interrupted undo is finished by running it again. Files that were not
+renamed are left as they are. Videos encoded after the move are renamed
+back with the .mp4 extension of the encoded video.
+"""
+
+import json
+import os
+
+from exceptions import NoFileException, RenameConflictException
+from rename_plan import RenamePlan, check, get_steps, list_folders
+
+__author__ = 'marcus'
+
+rename_history_file_name = 'rename_history.json'
+
+undo_plan_file_name = '.photo_sort_undo'
+
+
+def write(folder, rename_list):
+    with open(os.path.join(folder, rename_history_file_name), 'w') as rename_history:
+        json.dump([{'from': os.path.abspath(rename['from']), 'to': os.path.abspath(rename['to'])}
+                   for rename in rename_list], rename_history)
+
+
+def load(folder):
+    with open(os.path.join(folder, rename_history_file_name)) as rename_history:
+        return json.load(rename_history)
+
+
+def get_renames(history):
+    """Return (source, destination) renaming each file in history back"""
+    renames = []
+
+    for rename in history:
+        source = os.path.abspath(rename['to'])
+        destination = os.path.abspath(rename['from'])
+
+        encoded = os.path.splitext(source)[0] + '.mp4'
+        if not os.path.exists(source) and os.path.exists(encoded):
+            source = encoded
+            destination = os.path.splitext(destination)[0] + '.mp4'
+
+        renames.append((source, destination))
+
+    return renames
+
+
+def undo(folder, dry_run=False):
+    """Rename the files in the rename history of folder back, return number of files
+
+    Raises RenameConflictException without renaming anything if a file is
+    missing or would be overwritten.
+    """
+    plan = RenamePlan(folder, undo_plan_file_name)
+    history_file = os.path.join(folder, rename_history_file_name)
+
+    if not plan.exists() and not os.path.isfile(history_file):
+        raise NoFileException()
+
+    renames = get_renames(load(folder) if os.path.isfile(history_file) else [])
+
+    if plan.exists():
+        # Finish an interrupted undo
+        plan.load()
+    else:
+        steps = get_steps(renames)
+        problems, inodes = check(steps, list_folders(path for step in steps for path in step))
+        if problems:
+            raise RenameConflictException(problems)
+
+        if dry_run:
+            return len(renames)
+
+        # Input folders are removed when moving to an output folder
+        for folder_name in set(os.path.dirname(destination) for source, destination in renames):
+            os.makedirs(folder_name, exist_ok=True)
+
+        plan.write(steps, inodes)
+
+    if not dry_run:
+        plan.run()
+        # Removed before the plan, so a finished undo is not done again
+        if os.path.isfile(history_file):
+            os.remove(history_file)
+        plan.remove()
+
+    return len(renames)
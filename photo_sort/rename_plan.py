@@ -0,0 +1,254 @@
+"""Rename many files without overwriting any, in a way that can be continued if interrupted.
+
+Files keeping their names are not renamed. A file taking the name of
+another file is renamed after that file, following chains of renames.
+Cycles, like two files swapping names, are broken by first renaming one
+file of the cycle to a temporary name in its folder. The steps are written
+to a plan file, with the inode of the file each step renames, before the
+first rename. A file is only at the source of a step until that step is
+done, so an interrupted plan continues from the first step whose source
+still is the file it renames. Inodes change when some file systems, like
+FAT on memory cards, are mounted again; when no file is where the plan has
+it, the step is found from which names exist instead. A plan is only
+removed when no file is left under a temporary name.
+"""
+
+import json
+import os
+
+from exceptions import RenameConflictException
+import transfer
+
+__author__ = 'marcus'
+
+plan_file_name = '.photo_sort_renames'
+
+temporary_prefix = '.photo_sort_tmp_'
+
+
+def list_folders(paths):
+    """Return name -> inode of the files in the folder of each path, reading each folder once"""
+    folders = {}
+
+    for path in paths:
+        folder = os.path.dirname(path)
+        if folder in folders:
+            continue
+
+        try:
+            with os.scandir(folder) as entries:
+                folders[folder] = dict((entry.name, entry.inode()) for entry in entries)
+        except FileNotFoundError:
+            folders[folder] = {}
+
+    return folders
+
+
+def get_inode(folders, path):
+    return folders[os.path.dirname(path)].get(os.path.basename(path))
+
+
+def get_temporary_name(source, index):
+    return os.path.join(os.path.dirname(source), '%s%d' % (temporary_prefix, index))
+
+
+def get_steps(renames):
+    """Return steps doing renames of source to destination in an order where no file is overwritten
+
+    Only one temporary name is used for each cycle of renames.
+    """
+    renames = [(source, destination) for source, destination in renames if source != destination]
+    # Destination -> source
+    sources = dict((destination, source) for source, destination in renames)
+
+    if len(sources) < len(renames) or len(set(source for source, destination in renames)) < len(renames):
+        # Not a permutation, rename every file to a temporary name first so check finds the problems
+        temporary = [get_temporary_name(source, index) for index, (source, destination) in enumerate(renames)]
+        return ([(source, temporary_name) for (source, destination), temporary_name in zip(renames, temporary)] +
+                [(temporary_name, destination)
+                 for (source, destination), temporary_name in zip(renames, temporary)])
+
+    steps = []
+    destinations = dict(renames)
+    left = dict(renames)
+
+    # Chains end with a file renamed to a name no file is renamed from, done from the end
+    for source, destination in renames:
+        if destination in destinations:
+            continue
+
+        while destination in sources:
+            source = sources[destination]
+            steps.append((source, destination))
+            del left[source]
+            destination = source
+
+    # Only cycles are left
+    for index, first in enumerate(list(left)):
+        if first not in left:
+            continue
+
+        temporary_name = get_temporary_name(first, index)
+        steps.append((first, temporary_name))
+        del left[first]
+
+        destination = first
+        while sources[destination] != first:
+            source = sources[destination]
+            steps.append((source, destination))
+            del left[source]
+            destination = source
+
+        steps.append((temporary_name, destination))
+
+    return steps
+
+
+def check(steps, folders):
+    """Return problems with doing steps in order, and the inode of the file each step renames
+
+    Problems are files missing when they are renamed, and names taken when a
+    file is renamed to them.
+    """
+    # Path -> inode of the files renamed by the steps, as they will be when each step is done
+    files = {}
+    for source, destination in steps:
+        for path in (source, destination):
+            inode = get_inode(folders, path)
+            if inode is not None:
+                files[path] = inode
+
+    problems = []
+    inodes = []
+    # Names missing files would have had, reported once
+    missing = set()
+
+    for source, destination in steps:
+        if destination in files:
+            problems.append('"%s" would be overwritten' % destination)
+
+        inode = files.pop(source, None)
+        if inode is None:
+            if source not in missing:
+                problems.append('"%s" does not exist' % source)
+            missing.add(destination)
+        else:
+            files[destination] = inode
+        inodes.append(inode)
+
+    return problems, inodes
+
+
+def get_step_by_name(steps, folders):
+    """Return number of steps done, judging from which names exist, None if no number of steps leaves them
+
+    The names left by a whole cycle are the names before it, so the most steps are taken.
+    """
+    names = set(path for step in steps for path in step)
+    exists = set(path for path in names if get_inode(folders, path) is not None)
+
+    # Names after each step, starting with the sources not made by an earlier step
+    after = set()
+    made = set()
+    for source, destination in steps:
+        if source not in made:
+            after.add(source)
+        made.add(destination)
+
+    step_names = [frozenset(after)]
+    for source, destination in steps:
+        after.discard(source)
+        after.add(destination)
+        step_names.append(frozenset(after))
+
+    for index in range(len(steps), -1, -1):
+        if step_names[index] == exists:
+            return index
+
+    return None
+
+
+class RenamePlan(object):
+    def __init__(self, folder, file_name=plan_file_name):
+        self.path = os.path.join(folder, file_name)
+        self.steps = []
+        self.inodes = []
+
+    def exists(self):
+        return os.path.isfile(self.path)
+
+    def load(self):
+        with open(self.path) as plan:
+            for source, destination, inode in json.load(plan):
+                self.steps.append((source, destination))
+                self.inodes.append(inode)
+
+    def write(self, steps, inodes):
+        """Write the plan, replacing the file only when all is on disk"""
+        temporary_path = self.path + '.tmp'
+
+        with open(temporary_path, 'w') as plan:
+            json.dump([(source, destination, inode) for (source, destination), inode in zip(steps, inodes)], plan)
+            plan.flush()
+            os.fsync(plan.fileno())
+
+        os.replace(temporary_path, self.path)
+
+        self.steps = steps
+        self.inodes = inodes
+
+    def next_step(self):
+        """Return index of the first step not done
+
+        Raises RenameConflictException if the files are not as any number of steps leaves them.
+        """
+        folders = list_folders(path for step in self.steps for path in step)
+
+        for index, ((source, destination), inode) in enumerate(zip(self.steps, self.inodes)):
+            if get_inode(folders, source) == inode:
+                return index
+
+        index = get_step_by_name(self.steps, folders)
+        if index is None:
+            raise RenameConflictException(['Files renamed by "%s" have changed, rename them by hand' % self.path] +
+                                          self.temporary_files())
+
+        return index
+
+    def run(self, done=None):
+        """Do the steps not done, return number of steps done. done is called with source and destination of each"""
+        start = self.next_step()
+
+        for source, destination in self.steps[start:]:
+            transfer.move(source, destination)
+
+            if done:
+                done(source, destination)
+
+        return len(self.steps) - start
+
+    def temporary_files(self):
+        """Return problems for files left under temporary names"""
+        return ['"%s" is left under a temporary name' % destination for source, destination in self.steps
+                if os.path.basename(destination).startswith(temporary_prefix) and os.path.exists(destination)]
+
+    def remove(self):
+        """Remove the plan, raises RenameConflictException while files are left under temporary names"""
+        problems = self.temporary_files()
+        if problems:
+            raise RenameConflictException(problems)
+
+        os.remove(self.path)
+
+
+def finish(folder, file_name=plan_file_name):
+    """Finish an interrupted plan in folder, return number of steps done"""
+    plan = RenamePlan(folder, file_name)
+    if not plan.exists():
+        return 0
+
+    plan.load()
+    step_count = plan.run()
+    plan.remove()
+
+    return step_count
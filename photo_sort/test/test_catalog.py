@@ -0,0 +1,105 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from benchmark import corpus
+import catalog
+import dedup
+import photo_sort
+
+class CatalogTests(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = os.path.join(tempfile.gettempdir(), 'photo_sort_catalog')
+        self.input_dir = os.path.join(self.temp_dir, 'input')
+        self.other_input_dir = os.path.join(self.temp_dir, 'other_input')
+        self.output_dir = os.path.join(self.temp_dir, 'output')
+
+        os.makedirs(self.input_dir)
+        os.makedirs(self.other_input_dir)
+        os.makedirs(self.output_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def write_photo(self, folder, name, date_time):
+        with open(os.path.join(folder, name), 'wb') as f:
+            f.write(corpus.jpeg_bytes(date_time))
+
+    def import_files(self, *input_dirs):
+        sorter = photo_sort.PhotoSort(list(input_dirs), self.output_dir, '2014', 'Boom', None, None, dry_run=False,
+                                      encode='no', metadata_cache=False, incremental=True)
+        sorter.process()
+        return sorter
+
+    def test_incremental_import(self):
+        for index in range(3):
+            self.write_photo(self.input_dir, 'IMG%d.jpg' % index, '2014:08:01 12:0%d:00' % index)
+        self.import_files(self.input_dir)
+
+        output_folder = os.path.join(self.output_dir, '2014 - Boom')
+        self.assertEqual(3, len(catalog.Catalog(output_folder)))
+
+        # Taken before the first files, still numbered after them
+        self.write_photo(self.input_dir, 'IMG3.jpg', '2014:08:01 11:00:00')
+        # The same photo on another card
+        shutil.copy2(os.path.join(self.input_dir, 'IMG1.jpg'), os.path.join(self.other_input_dir, 'DSC1.jpg'))
+
+        sorter = self.import_files(self.input_dir, self.other_input_dir)
+        self.assertEqual(4, sorter.known_files)
+        self.assertEqual([('IMG3.jpg', '4 - Boom 2014.jpg')],
+                         [(os.path.basename(rename['from']), os.path.basename(rename['to']))
+                          for rename in sorter.rename_list])
+
+        self.assertEqual(['1 - Boom 2014.jpg', '2 - Boom 2014.jpg', '3 - Boom 2014.jpg', '4 - Boom 2014.jpg'],
+                         sorted(name for name in os.listdir(output_folder) if not name.startswith('.')))
+        self.assertEqual(['2014 - Boom'], os.listdir(self.output_dir))
+        self.assertEqual(4, len(catalog.Catalog(output_folder)))
+
+    def test_index_width_kept(self):
+        for index in range(5):
+            self.write_photo(self.input_dir, 'IMG%d.jpg' % index, '2014:08:01 12:0%d:00' % index)
+        self.import_files(self.input_dir)
+
+        for index in range(5, 11):
+            self.write_photo(self.input_dir, 'IMG%d.jpg' % index, '2014:08:01 12:%02d:00' % index)
+        sorter = photo_sort.PhotoSort([self.input_dir], self.output_dir, '2014', 'Boom', None, None, dry_run=False,
+                                      encode='no', metadata_cache=False, incremental=True)
+        self.assertEqual(['6 - Boom 2014.jpg', '10 - Boom 2014.jpg', '11 - Boom 2014.jpg'],
+                         [os.path.basename(sorter.rename_list[index]['to']) for index in (0, 4, 5)])
+        self.assertIn('more than the 1 digits', sorter.get_preview(summary=True))
+        sorter.process()
+
+        output_folder = os.path.join(self.output_dir, '2014 - Boom')
+        self.assertEqual(1, catalog.Catalog(output_folder).index_width())
+
+    def test_nothing_new(self):
+        self.write_photo(self.input_dir, 'IMG0.jpg', '2014:08:01 12:00:00')
+        self.import_files(self.input_dir)
+
+        self.assertRaises(photo_sort.NoFileException, self.import_files, self.input_dir)
+
+    def test_same_ends_other_content(self):
+        block = b'x' * dedup.partial_size
+        imported = os.path.join(self.input_dir, 'MVI1.mov')
+        with open(imported, 'wb') as f:
+            f.write(block + b'first' + block)
+
+        output_catalog = catalog.Catalog(self.output_dir)
+        output_catalog.add([{'from': imported, 'to': os.path.join(self.output_dir, '1 - Boom 2014.mov')}], 0)
+        output_catalog.save()
+        output_catalog = catalog.Catalog(self.output_dir)
+
+        # Same first and last blocks, but another video
+        other = os.path.join(self.other_input_dir, 'MVI2.mov')
+        with open(other, 'wb') as f:
+            f.write(block + b'other' + block)
+        self.assertFalse(output_catalog.contains(other, os.stat(other)))
+
+        same = os.path.join(self.other_input_dir, 'MVI3.mov')
+        shutil.copy(imported, same)
+        self.assertTrue(output_catalog.contains(same, os.stat(same)))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import dedup
+
+class DedupTests(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = os.path.join(tempfile.gettempdir(), 'photo_sort_dedup')
+        os.makedirs(self.temp_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def write(self, name, content):
+        file = os.path.join(self.temp_dir, name)
+        with open(file, 'wb') as f:
+            f.write(content)
+        return file
+
+    def find_duplicates(self, files):
+        return dedup.find_duplicates(files, [os.path.getsize(file) for file in files], workers=2)
+
+    def test_find_duplicates(self):
+        large = os.urandom(3 * dedup.partial_size)
+        # Same size, head and tail as large, only the middle differs
+        middle = large[:dedup.partial_size] + os.urandom(dedup.partial_size) + large[2 * dedup.partial_size:]
+
+        files = [
+            self.write('a.jpg', b'photo'),
+            self.write('b.jpg', b'photo'),
+            self.write('c.jpg', b'other'),
+            self.write('d.mov', large),
+            self.write('e.mov', middle),
+            self.write('f.mov', large),
+            self.write('g.jpg', b''),
+            self.write('h.jpg', b''),
+        ]
+        files_by_name = dict((os.path.basename(file), file) for file in files)
+
+        duplicates = self.find_duplicates(files)
+
+        self.assertEqual({files_by_name['b.jpg']: files_by_name['a.jpg'],
+                          files_by_name['f.mov']: files_by_name['d.mov']}, duplicates)
+
+    def test_first_file_kept(self):
+        files = [self.write('b.jpg', b'photo'), self.write('a.jpg', b'photo')]
+
+        self.assertEqual({files[1]: files[0]}, self.find_duplicates(files))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from benchmark import corpus
+from exceptions import UnsupportedFormatException
+import exif_reader
+
+class ExifReaderTests(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = os.path.join(tempfile.gettempdir(), 'photo_sort_exif')
+
+        if not os.path.exists(self.temp_dir):
+            os.makedirs(self.temp_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def write(self, name, content):
+        file = os.path.join(self.temp_dir, name)
+        with open(file, 'wb') as f:
+            f.write(content)
+        return file
+
+    def test_jpeg(self):
+        file = self.write('IMG4101.jpg', corpus.jpeg_bytes('2014:08:01 12:30:00'))
+        self.assertEqual('2014:08:01 12:30:00', exif_reader.read_date_time_original(file))
+
+        file = self.write('IMG4102.jpg', corpus.jpeg_bytes('2014:08:01 12:30:00', byte_order='>'))
+        self.assertEqual('2014:08:01 12:30:00', exif_reader.read_date_time_original(file))
+
+        file = self.write('IMG4103.jpg', corpus.jpeg_bytes())
+        self.assertIsNone(exif_reader.read_date_time_original(file))
+
+        file = self.write('IMG4104.jpg', corpus.jpeg_bytes(exif=False))
+        self.assertIsNone(exif_reader.read_date_time_original(file))
+
+    def test_tiff(self):
+        file = self.write('IMG4101.cr2', corpus.tiff_bytes('2014:08:01 12:30:00', byte_order='>'))
+        self.assertEqual('2014:08:01 12:30:00', exif_reader.read_date_time_original(file))
+
+    def test_heic(self):
+        file = self.write('IMG4101.heic', corpus.heic_bytes('2014:08:01 12:30:00'))
+        self.assertEqual('2014:08:01 12:30:00', exif_reader.read_date_time_original(file))
+
+        file = self.write('IMG4102.heic', corpus.heic_bytes())
+        self.assertIsNone(exif_reader.read_date_time_original(file))
+
+    def test_quicktime(self):
+        file = self.write('MVI4101.mov', corpus.mp4_bytes(1406896200, 90, '2014-08-01T12:30:00+0200'))
+        self.assertEqual('2014:08:01 12:30:00', exif_reader.read_date_time_original(file))
+        self.assertEqual(90, exif_reader.read_rotation(file))
+
+        file = self.write('MVI4102.mp4', corpus.mp4_bytes(1406896200, 270, version=1))
+        expected = time.strftime('%Y:%m:%d %H:%M:%S', time.localtime(1406896200))
+        self.assertEqual(expected, exif_reader.read_date_time_original(file))
+        self.assertEqual(270, exif_reader.read_rotation(file))
+
+        file = self.write('MVI4103.mp4', corpus.mp4_bytes())
+        self.assertIsNone(exif_reader.read_date_time_original(file))
+        self.assertEqual(0, exif_reader.read_rotation(file))
+
+    def test_unsupported(self):
+        file = self.write('MVI4101.avi', b'RIFF\0\0\0\0AVI LIST')
+        self.assertRaises(UnsupportedFormatException, exif_reader.read_date_time_original, file)
+        self.assertRaises(UnsupportedFormatException, exif_reader.read_rotation, file)
+
+        file = self.write('IMG4101.jpg', b'')
+        self.assertRaises(UnsupportedFormatException, exif_reader.read_date_time_original, file)
+
+        file = self.write('IMG4102.jpg', corpus.jpeg_bytes('2014:08:01 12:30:00')[:30])
+        self.assertRaises(UnsupportedFormatException, exif_reader.read_date_time_original, file)
+
+def main():
+    unittest.main()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from benchmark import fake_exiftool
+import exiftool
+
+class ExifToolTests(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp(prefix='photo_sort_')
+        self.file = os.path.join(self.temp_dir, 'IMG1.jpg')
+        open(self.file, 'w').close()
+
+        self.sizes = exiftool.block_size, exiftool.max_block_size
+        self.environ = dict(os.environ)
+
+    def tearDown(self):
+        exiftool.block_size, exiftool.max_block_size = self.sizes
+        os.environ.clear()
+        os.environ.update(self.environ)
+        shutil.rmtree(self.temp_dir)
+
+    def execute(self, response_size):
+        """Run two commands on one fake exiftool, a large output followed by a short one"""
+        os.environ['FAKE_EXIFTOOL_RESPONSE_SIZE'] = str(response_size)
+
+        response = [fake_exiftool.tags(self.file)]
+        response.append({'SourceFile': '', 'Padding': 'x' * (response_size - len(json.dumps(response)))})
+        expected = json.dumps(response).encode() + b'\n'
+        self.assertGreater(len(expected), exiftool.max_block_size)
+
+        file = exiftool.fsencode(self.file)
+        with exiftool.ExifTool(fake_exiftool.__file__) as et:
+            self.assertEqual(expected, et.execute(b'-j', file))
+            # The grown buffer is reused without leftovers of the first output
+            self.assertEqual(b'1 image files updated\n', et.execute(b'-TagsFromFile', file, file))
+            self.assertEqual(expected, et.execute(b'-j', file))
+
+    def test_execute_large_output(self):
+        self.execute(3 * exiftool.max_block_size)
+
+    def test_execute_split_sentinel(self):
+        # Blocks smaller than the sentinel, so it always arrives split across reads
+        exiftool.block_size = 2
+        exiftool.max_block_size = 5
+        self.execute(1000)
+
+def main():
+    unittest.main()
+
+if __name__ == '__main__':
+    main()
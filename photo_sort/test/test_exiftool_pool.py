@@ -0,0 +1,40 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from exiftool_pool import ExifToolPool
+
+fake_exiftool = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmark', 'fake_exiftool.py')
+
+class ExifToolPoolTests(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = os.path.join(tempfile.gettempdir(), 'photo_sort_pool')
+
+        if not os.path.exists(self.temp_dir):
+            os.makedirs(self.temp_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_get_tag_batch(self):
+        files = []
+        for index in range(10):
+            input_file = os.path.join(self.temp_dir, 'IMG%d.jpg' % index)
+            open(input_file, 'w').close()
+            os.utime(input_file, (index * 3600, index * 3600))
+            files.append(input_file)
+
+        with ExifToolPool(3, fake_exiftool) as et:
+            result = et.get_tag_batch('EXIF:DateTimeOriginal', files)
+            self.assertEqual(['1970:01:01 %02d:00:00' % index for index in range(10)], result)
+
+            result = et.get_tag('EXIF:DateTimeOriginal', files[1])
+            self.assertEqual('1970:01:01 01:00:00', result)
+
+def main():
+    unittest.main()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from benchmark import corpus
+import journal
+import photo_sort
+import transfer
+
+class JournalTests(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = os.path.join(tempfile.gettempdir(), 'photo_sort_journal')
+        self.input_dir = os.path.join(self.temp_dir, 'input')
+        self.output_dir = os.path.join(self.temp_dir, 'output')
+
+        os.makedirs(self.input_dir)
+        os.makedirs(self.output_dir)
+
+        for index in range(5):
+            with open(os.path.join(self.input_dir, 'IMG%d.jpg' % index), 'wb') as f:
+                f.write(corpus.jpeg_bytes('2014:08:01 12:3%d:00' % index))
+
+        self.copy_file = transfer.copy_file
+
+    def tearDown(self):
+        transfer.copy_file = self.copy_file
+        shutil.rmtree(self.temp_dir)
+
+    def sorter(self, resume, verify=False):
+        return photo_sort.PhotoSort([self.input_dir], self.output_dir, '2014', 'Boom', None, None, dry_run=False,
+                                    encode='no', metadata_cache=False, resume=resume, verify=verify)
+
+    def interrupt_copy(self, count):
+        """Make copies raise KeyboardInterrupt after count files"""
+        copied = []
+
+        def interrupted_copy_file(rename, limits, copy_function, step):
+            if len(copied) == count:
+                raise KeyboardInterrupt()
+            copied.append(rename['to'])
+            return self.copy_file(rename, limits, copy_function, step)
+
+        transfer.copy_file = interrupted_copy_file
+        return copied
+
+    def test_resume(self):
+        copied = self.interrupt_copy(2)
+        self.assertRaises(KeyboardInterrupt, self.sorter(False).process)
+
+        output_folder = os.path.join(self.output_dir, '2014 - Boom')
+        self.assertTrue(os.path.isfile(os.path.join(output_folder, journal.journal_file_name)))
+
+        transfer.copy_file = self.copy_file
+        sorter = self.sorter(True)
+        self.assertEqual(output_folder, sorter.output_folder)
+
+        mtimes = [os.stat(file).st_mtime_ns for file in copied]
+        sorter.process()
+
+        # Copied before the interruption and not copied again
+        self.assertEqual(mtimes, [os.stat(file).st_mtime_ns for file in copied])
+        self.assertEqual(['1 - Boom 2014.jpg', '2 - Boom 2014.jpg', '3 - Boom 2014.jpg', '4 - Boom 2014.jpg',
+                          '5 - Boom 2014.jpg'], sorted(os.listdir(output_folder)))
+        self.assertEqual(['2014 - Boom'], os.listdir(self.output_dir))
+
+    def test_resume_verified(self):
+        self.interrupt_copy(2)
+        self.assertRaises(KeyboardInterrupt, self.sorter(False, verify=True).process)
+
+        output_folder = os.path.join(self.output_dir, '2014 - Boom')
+        manifest_file = os.path.join(output_folder, transfer.manifest_file_name)
+        with open(manifest_file) as f:
+            self.assertEqual(2, len(f.read().splitlines()))
+
+        transfer.copy_file = self.copy_file
+        self.sorter(True, verify=True).process()
+
+        with open(manifest_file) as f:
+            self.assertEqual(['%d - Boom 2014.jpg' % index for index in range(1, 6)],
+                             sorted(line.split('  ')[1] for line in f.read().splitlines()))
+
+    def test_changed_file_not_done(self):
+        output_file = os.path.join(self.temp_dir, 'output.jpg')
+        rename = {'from': os.path.join(self.input_dir, 'IMG0.jpg'), 'to': output_file}
+        shutil.copy2(rename['from'], output_file)
+
+        with journal.Journal(self.temp_dir) as log:
+            log.plan([rename])
+            log.completed('copy', rename)
+
+        log = journal.Journal(self.temp_dir)
+        log.load()
+        self.assertEqual([rename], log.rename_list)
+        self.assertTrue(log.is_done('copy', rename))
+        self.assertFalse(log.is_done('encode', rename))
+
+        with open(output_file, 'ab') as f:
+            f.write(b'more data')
+        self.assertFalse(log.is_done('copy', rename))
+
+    def test_encoded_video_done(self):
+        copied_file = os.path.join(self.temp_dir, 'video.mov')
+        encoded_file = os.path.join(self.temp_dir, 'video.mp4')
+        rename = {'from': os.path.join(self.input_dir, 'MVI0.mov'), 'to': copied_file}
+        for file in (rename['from'], copied_file):
+            with open(file, 'wb') as f:
+                f.write(corpus.mp4_bytes())
+
+        with journal.Journal(self.temp_dir) as log:
+            log.plan([rename])
+            log.completed('copy', rename)
+
+            # Encoding replaces the copy
+            os.rename(copied_file, encoded_file)
+            log.completed('encode', {'from': copied_file, 'to': encoded_file})
+
+        log = journal.Journal(self.temp_dir)
+        log.load()
+        self.assertTrue(log.encoded(copied_file))
+        self.assertTrue(log.is_done('copy', rename))
+
+        with open(encoded_file, 'ab') as f:
+            f.write(b'more data')
+        self.assertFalse(log.encoded(copied_file))
+        self.assertFalse(log.is_done('copy', rename))
+
+if __name__ == '__main__':
+    unittest.main()
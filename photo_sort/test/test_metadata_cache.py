@@ -0,0 +1,72 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from metadata_cache import MetadataCache, MISSING, get_tag
+
+class MetadataCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = os.path.join(tempfile.gettempdir(), 'photo_sort_cache')
+
+        if not os.path.exists(self.temp_dir):
+            os.makedirs(self.temp_dir)
+
+        self.cache_path = os.path.join(self.temp_dir, 'metadata.sqlite')
+        self.input_file = os.path.join(self.temp_dir, 'IMG4101.jpg')
+        with open(self.input_file, 'w') as f:
+            f.write('photo')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_get_set(self):
+        tag = 'EXIF:DateTimeOriginal'
+
+        with MetadataCache(self.cache_path) as cache:
+            self.assertIs(MISSING, cache.get(self.input_file, tag))
+            cache.set(self.input_file, tag, '2014:08:01 12:30:00')
+
+        with MetadataCache(self.cache_path) as cache:
+            self.assertEqual('2014:08:01 12:30:00', cache.get(self.input_file, tag))
+            cache.set(self.input_file, 'Rotation', None)
+            self.assertIsNone(cache.get(self.input_file, 'Rotation'))
+
+            with open(self.input_file, 'a') as f:
+                f.write('changed')
+            self.assertIs(MISSING, cache.get(self.input_file, tag))
+
+    def test_get_tag_cached(self):
+        with MetadataCache(self.cache_path) as cache:
+            cache.set(self.input_file, 'Rotation', 90)
+
+            def set(file, tag, value, stat=None):
+                self.fail('Cached value written again')
+            cache.set = set
+
+            # Not read with exiftool either
+            self.assertEqual(90, get_tag(None, 'Rotation', self.input_file, cache))
+
+    def test_invalidate(self):
+        with MetadataCache(self.cache_path) as cache:
+            cache.set(self.input_file, 'Rotation', 90)
+
+            self.assertEqual(0, cache.invalidate(os.path.join(self.temp_dir, 'other')))
+            self.assertEqual(1, cache.invalidate(self.temp_dir))
+            self.assertIs(MISSING, cache.get(self.input_file, 'Rotation'))
+
+    def test_evict(self):
+        with MetadataCache(self.cache_path, 1) as cache:
+            cache.set(self.input_file, 'Rotation', 90)
+            cache.set(self.input_file, 'EXIF:DateTimeOriginal', None)
+
+        with MetadataCache(self.cache_path) as cache:
+            self.assertIs(MISSING, cache.get(self.input_file, 'Rotation'))
+            self.assertIsNone(cache.get(self.input_file, 'EXIF:DateTimeOriginal'))
+
+def main():
+    unittest.main()
+
+if __name__ == '__main__':
+    main()
@@ -3,7 +3,9 @@ import shutil
 import tempfile
 import unittest
 
+from benchmark import corpus
 import photo_sort
+from progress import Progress, CallbackSink
 
 class PhotoSortTests(unittest.TestCase):
 
@@ -85,6 +87,201 @@ class PhotoSortTests(unittest.TestCase):
         result = photo_sort.get_output_file_name(year, event, sub_event, photographer, index_mask, index, input_file)
         self.assertEqual('1 - Beach - Boom 2014 - Marcus.jpg', result)
 
+    def test_parse_time_taken(self):
+        input_file = os.path.join(self.temp_dir, 'IMG4101.jpg')
+        open(input_file, 'w').close()
+        os.utime(input_file, (1000, 1000))
+
+        result = photo_sort.parse_time_taken(input_file, '2014:08:01 12:30:00')
+        self.assertEqual(1406896200, result)
+
+        result = photo_sort.parse_time_taken(input_file, None)
+        self.assertEqual(1000, result)
+
+        input_file = os.path.join(self.temp_dir, 'VID_20140801_123000.mp4')
+        result = photo_sort.parse_time_taken(input_file, '0000:00:00 00:00:00')
+        self.assertEqual(1406896200, result)
+
+    def test_time_taken_file_left_out(self):
+        class ExifTool(object):
+            """Leaves README out of its output, like exiftool does with files it can not read"""
+            running = True
+
+            def get_tag_batch(self, tag, files):
+                return ['2014:08:01 12:30:00' for file in files if not file.endswith('README')]
+
+        files = [os.path.join(self.temp_dir, file) for file in ['README', 'notes.txt']]
+        for file in files:
+            open(file, 'w').close()
+            os.utime(file, (1000, 1000))
+
+        self.assertEqual([1000, 1406896200], photo_sort.get_time_taken_batch(files, ExifTool()))
+        self.assertEqual(1000, photo_sort.get_time_taken(files[0], ExifTool()))
+
+    def test_scan_files(self):
+        sub_dir = os.path.join(self.temp_dir, '100CANON')
+        os.makedirs(sub_dir)
+        for file in ['IMG4101.jpg', 'MVI4102.mpg', 'MVI4102.thm', 'README', '.hidden']:
+            open(os.path.join(self.temp_dir, file), 'w').close()
+        open(os.path.join(sub_dir, 'IMG4103.JPG'), 'w').close()
+
+        result = sorted(entry.name for entry in photo_sort.scan_files(self.temp_dir))
+        self.assertEqual(['IMG4101.jpg', 'MVI4102.mpg', 'README'], result)
+
+        result = sorted(entry.name for entry in photo_sort.scan_files(self.temp_dir, recursive=True))
+        self.assertEqual(['IMG4101.jpg', 'IMG4103.JPG', 'MVI4102.mpg', 'README'], result)
+
+        result = sorted(entry.name for entry in photo_sort.scan_files(self.temp_dir, True, ['*.jpg', '*.mpg'], ['MVI*']))
+        self.assertEqual(['IMG4101.jpg', 'IMG4103.JPG'], result)
+
+    def test_rename_list(self):
+        input_files = photo_sort.FileIndex()
+        for file, time_taken in [('IMG_10.jpg', 5), ('IMG_9.jpg', 5), ('VID_1.mp4', 1), ('IMG_8.jpg', 6)]:
+            input_files.add(os.path.join(self.temp_dir, file), time_taken)
+
+        result = photo_sort.get_rename_list('2014', 'Boom', None, None, input_files, None)
+        result = [(os.path.basename(rename['from']), os.path.basename(rename['to'])) for rename in result]
+        self.assertEqual([('VID_1.mp4', '1 - Boom 2014.mp4'), ('IMG_9.jpg', '2 - Boom 2014.jpg'),
+                          ('IMG_10.jpg', '3 - Boom 2014.jpg'), ('IMG_8.jpg', '4 - Boom 2014.jpg')], result)
+
+    def test_remove_duplicates(self):
+        input_files = photo_sort.FileIndex()
+        for file, time_taken, content in [('IMG_2.jpg', 2, b'photo'), ('IMG_1.jpg', 1, b'photo'), ('IMG_3.jpg', 3, b'other')]:
+            file = os.path.join(self.temp_dir, file)
+            with open(file, 'wb') as f:
+                f.write(content)
+            input_files.add(file, time_taken, len(content))
+
+        input_files, duplicates = photo_sort.remove_duplicates(input_files)
+        self.assertEqual(['IMG_1.jpg', 'IMG_3.jpg'], [os.path.basename(file) for file in input_files.sorted_files()])
+        self.assertEqual({os.path.join(self.temp_dir, 'IMG_2.jpg'): os.path.join(self.temp_dir, 'IMG_1.jpg')}, duplicates)
+
+    def test_preview(self):
+        input_dir = os.path.join(self.temp_dir, 'input')
+        os.makedirs(input_dir)
+        # Phone photos with the time in the name, the last two taken in the same second
+        for second in list(range(25)) + [24]:
+            name = 'IMG_20140801_1230%02d_%d.jpg' % (second, len(os.listdir(input_dir)))
+            with open(os.path.join(input_dir, name), 'wb') as f:
+                f.write(corpus.jpeg_bytes(exif=False))
+
+        sorter = photo_sort.PhotoSort([input_dir], self.temp_dir, '2014', 'Boom', None, None, dry_run=True, encode='no',
+                                      metadata_cache=False)
+
+        preview = sorter.get_preview().splitlines()
+        self.assertEqual(2 + 26 + 2, len(preview))
+        self.assertEqual('IMG_20140801_123000_0.jpg\t01 - Boom 2014.jpg', preview[2])
+        self.assertEqual('Number of files:.jpg=26', preview[-1])
+
+        summary = sorter.get_preview(summary=True).splitlines()
+        self.assertEqual(preview[:12], summary[:12])
+        self.assertEqual('... 6 more files ...', summary[12])
+        self.assertEqual(preview[-12:], summary[13:25])
+        self.assertEqual('1 files were taken in the same second as another file, they are ordered by name.', summary[-1])
+
+    def test_progress_and_cancel(self):
+        input_dir = os.path.join(self.temp_dir, 'input')
+        os.makedirs(input_dir)
+        for minute in range(5):
+            with open(os.path.join(input_dir, 'IMG%d.jpg' % minute), 'wb') as f:
+                f.write(corpus.jpeg_bytes('2014:08:01 12:%02d:00' % minute))
+
+        events = []
+
+        def progress(event):
+            events.append((event.phase, os.path.basename(event.file), event.bytes))
+            if event.phase == 'copy' and len(events) == 7:
+                sorter.cancel()
+
+        sorter = photo_sort.PhotoSort([input_dir], self.temp_dir, '2014', 'Boom', None, None, dry_run=False,
+                                      encode='no', metadata_cache=False,
+                                      progress=Progress([CallbackSink(progress)]))
+        self.assertEqual(['scan'] * 5, [phase for phase, file, size in events])
+        self.assertEqual(len(corpus.jpeg_bytes('2014:08:01 12:00:00')), events[0][2])
+
+        self.assertRaises(photo_sort.CancelledException, sorter.process)
+        self.assertEqual([('copy', '1 - Boom 2014.jpg'), ('copy', '2 - Boom 2014.jpg')],
+                         [(phase, file) for phase, file, size in events[5:]])
+        # The journal is kept to resume the import
+        self.assertEqual(['.photo_sort_journal', '1 - Boom 2014.jpg', '2 - Boom 2014.jpg'],
+                         sorted(os.listdir(sorter.output_folder)))
+
+    def test_resume_preview(self):
+        for move in (False, True):
+            input_dir = os.path.join(self.temp_dir, 'input')
+            os.makedirs(input_dir)
+            for minute in range(5):
+                with open(os.path.join(input_dir, 'IMG%d.jpg' % minute), 'wb') as f:
+                    f.write(corpus.jpeg_bytes('2014:08:01 12:%02d:00' % minute))
+
+            def progress(event):
+                if event.phase != 'scan' and sorter.progress.files == 2:
+                    sorter.cancel()
+
+            sorter = photo_sort.PhotoSort([input_dir], self.temp_dir, '2014', 'Boom', None, None, dry_run=False,
+                                          encode='no', move=move, metadata_cache=False,
+                                          progress=Progress([CallbackSink(progress)]))
+            self.assertRaises(photo_sort.CancelledException, sorter.process)
+
+            sorter = photo_sort.PhotoSort([input_dir], self.temp_dir, '2014', 'Boom', None, None, dry_run=False,
+                                          encode='no', move=move, metadata_cache=False, resume=True)
+            # Files done before are not reported as names used by existing files
+            self.assertNotIn('new names', sorter.get_preview(summary=True))
+
+            shutil.rmtree(input_dir)
+            shutil.rmtree(sorter.output_folder)
+
+    def test_move(self):
+        input_dir = os.path.join(self.temp_dir, 'input')
+        os.makedirs(input_dir)
+        for minute in range(3):
+            with open(os.path.join(input_dir, 'IMG%d.jpg' % minute), 'wb') as f:
+                f.write(corpus.jpeg_bytes('2014:08:01 12:%02d:00' % minute))
+
+        sorter = photo_sort.PhotoSort([input_dir], None, '2014', 'Boom', None, None, dry_run=True, encode='no',
+                                      move=True, metadata_cache=False)
+        sorter.process()
+        self.assertEqual(['IMG0.jpg', 'IMG1.jpg', 'IMG2.jpg'], sorted(os.listdir(input_dir)))
+
+        sorter.dry_run = False
+        sorter.process()
+        self.assertEqual(['1 - Boom 2014.jpg', '2 - Boom 2014.jpg', '3 - Boom 2014.jpg'], sorted(os.listdir(input_dir)))
+
+    def test_move_recursive(self):
+        input_dir = os.path.join(self.temp_dir, 'input')
+        sub_dir = os.path.join(input_dir, 'DCIM', '100CANON')
+        os.makedirs(sub_dir)
+        for minute in range(3):
+            with open(os.path.join(sub_dir, 'IMG%d.jpg' % minute), 'wb') as f:
+                f.write(corpus.jpeg_bytes('2014:08:01 12:%02d:00' % minute))
+
+        sorter = photo_sort.PhotoSort([input_dir], self.temp_dir, '2014', 'Boom', None, None, dry_run=False,
+                                      encode='no', move=True, recursive=True, metadata_cache=False)
+        sorter.process()
+
+        self.assertFalse(os.path.exists(input_dir))
+        self.assertEqual(['1 - Boom 2014.jpg', '2 - Boom 2014.jpg', '3 - Boom 2014.jpg'],
+                         sorted(os.listdir(sorter.output_folder)))
+
+    def test_rename_in_place_swapped(self):
+        input_dir = os.path.join(self.temp_dir, 'input')
+        os.makedirs(input_dir)
+        # Already sorted, except the first two were taken in the other order
+        for name, minute in [('1', 1), ('2', 0), ('3', 2)]:
+            with open(os.path.join(input_dir, '%s - Boom 2014.jpg' % name), 'wb') as f:
+                f.write(corpus.jpeg_bytes('2014:08:01 12:%02d:00' % minute))
+
+        sorter = photo_sort.PhotoSort([input_dir], None, '2014', 'Boom', None, None, dry_run=False, encode='no',
+                                      move=True, metadata_cache=False)
+        # The names are free when they are needed
+        self.assertNotIn('new names', sorter.get_preview(summary=True))
+        sorter.process()
+
+        self.assertEqual(['1 - Boom 2014.jpg', '2 - Boom 2014.jpg', '3 - Boom 2014.jpg'], sorted(os.listdir(input_dir)))
+        for name, minute in [('1', 0), ('2', 1), ('3', 2)]:
+            with open(os.path.join(input_dir, '%s - Boom 2014.jpg' % name), 'rb') as f:
+                self.assertEqual(corpus.jpeg_bytes('2014:08:01 12:%02d:00' % minute), f.read())
+
 def main():
     unittest.main()
 
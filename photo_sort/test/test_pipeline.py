@@ -0,0 +1,109 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from benchmark import corpus
+import exiftool
+import photo_sort
+import pipeline
+from progress import Progress, CallbackSink
+import video
+
+benchmark_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmark')
+
+class PipelineTests(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = os.path.join(tempfile.gettempdir(), 'photo_sort_pipeline')
+        self.input_dir = os.path.join(self.temp_dir, 'input')
+        self.output_dir = os.path.join(self.temp_dir, 'output')
+
+        os.makedirs(self.input_dir)
+        os.makedirs(self.output_dir)
+
+        self.executables = exiftool.executable, video.handbrake_executable
+        exiftool.executable = os.path.join(benchmark_dir, 'fake_exiftool.py')
+        video.handbrake_executable = os.path.join(benchmark_dir, 'fake_handbrake.py')
+
+    def tearDown(self):
+        exiftool.executable, video.handbrake_executable = self.executables
+        shutil.rmtree(self.temp_dir)
+
+    def test_pipeline(self):
+        for index in range(3):
+            with open(os.path.join(self.input_dir, 'IMG%d.jpg' % index), 'wb') as f:
+                f.write(corpus.jpeg_bytes('2014:08:01 12:3%d:00' % (3 - index)))
+        with open(os.path.join(self.input_dir, 'MVI4.mov'), 'wb') as f:
+            f.write(corpus.mp4_bytes(creation_date='2014-08-01T12:34:00+0200'))
+
+        events = []
+        sorter = photo_sort.PhotoSort([self.input_dir], self.output_dir, '2014', 'Boom', None, None, dry_run=False, encode='yes',
+                                      metadata_cache=False, copy_workers=2, pipeline=True,
+                                      progress=Progress([CallbackSink(events.append)]))
+        self.assertIsNone(sorter.rename_list)
+        sorter.process()
+
+        output_folder = os.path.join(self.output_dir, '2014 - Boom')
+        self.assertEqual(['1 - Boom 2014.jpg', '2 - Boom 2014.jpg', '3 - Boom 2014.jpg', '4 - Boom 2014.mp4'],
+                         sorted(os.listdir(output_folder)))
+        with open(os.path.join(output_folder, '1 - Boom 2014.jpg'), 'rb') as f:
+            self.assertEqual(corpus.jpeg_bytes('2014:08:01 12:31:00'), f.read())
+        self.assertEqual(4, len(os.listdir(self.input_dir)))
+
+        imported = dict((os.path.basename(event.file), event.detail) for event in events if event.phase == 'import')
+        self.assertIsNone(imported['1 - Boom 2014.jpg'])
+        self.assertRegex(imported['4 - Boom 2014.mp4'], r'^encoded in \d+\.\d s$')
+
+    def test_encode_progress(self):
+        with open(os.path.join(self.input_dir, 'MVI4.mov'), 'wb') as f:
+            f.write(corpus.mp4_bytes(creation_date='2014-08-01T12:34:00+0200'))
+
+        events = []
+        sorter = photo_sort.PhotoSort([self.input_dir], self.output_dir, '2014', 'Boom', None, None, dry_run=False,
+                                      encode='yes', metadata_cache=False,
+                                      progress=Progress([CallbackSink(events.append)]))
+        sorter.process()
+
+        encoded = [event for event in events if event.phase == 'encode']
+        self.assertEqual(['1 - Boom 2014.mp4'], [os.path.basename(event.file) for event in encoded])
+        self.assertRegex(encoded[0].detail, r'^encoded in \d+\.\d s$')
+
+    def create_files(self):
+        for index in range(3):
+            with open(os.path.join(self.input_dir, 'IMG%d.jpg' % index), 'wb') as f:
+                f.write(corpus.jpeg_bytes('2014:08:01 12:3%d:00' % index))
+        with open(os.path.join(self.input_dir, 'MVI4.mov'), 'wb') as f:
+            f.write(corpus.mp4_bytes(creation_date='2014-08-01T12:34:00+0200'))
+
+        return sorted(os.listdir(self.input_dir))
+
+    def test_no_encode_without_exiftool(self):
+        self.create_files()
+        exiftool.executable = os.path.join(self.temp_dir, 'missing')
+
+        sorter = photo_sort.PhotoSort([self.input_dir], self.output_dir, '2014', 'Boom', None, None, dry_run=False,
+                                      encode='no', metadata_cache=False, pipeline=True)
+        sorter.process()
+
+        self.assertEqual(['1 - Boom 2014.jpg', '2 - Boom 2014.jpg', '3 - Boom 2014.jpg', '4 - Boom 2014.mov'],
+                         sorted(os.listdir(sorter.output_folder)))
+
+    def test_failed_move_restored(self):
+        names = self.create_files()
+        video.handbrake_executable = os.path.join(self.temp_dir, 'missing')
+
+        sorter = photo_sort.PhotoSort([self.input_dir], self.output_dir, '2014', 'Boom', None, None, dry_run=False,
+                                      encode='yes', move=True, metadata_cache=False, pipeline=True)
+        self.assertRaises(FileNotFoundError, sorter.process)
+
+        # Moved back, apart from files given their final names before the failure
+        self.assertIn('MVI4.mov', os.listdir(self.input_dir))
+        self.assertEqual(len(names), len(os.listdir(self.input_dir)) + len(os.listdir(sorter.output_folder)))
+        self.assertNotIn(pipeline.staging_folder_name, os.listdir(sorter.output_folder))
+
+def main():
+    unittest.main()
+
+if __name__ == '__main__':
+    main()
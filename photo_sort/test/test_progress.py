@@ -0,0 +1,85 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from progress import Progress, ProgressBar, VerboseSink, JsonLinesSink, CallbackSink
+
+class ProgressTests(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp(prefix='photo_sort_')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_events(self):
+        events = []
+        progress = Progress([CallbackSink(events.append)])
+
+        progress.start('copy', 2)
+        progress.update('copy', '/out/1 - Boom.jpg', 100, 'reflink')
+        progress.update('copy', '/out/2 - Boom.jpg', 50)
+
+        self.assertEqual(2, progress.files)
+        self.assertEqual(150, progress.bytes)
+        self.assertEqual([('copy', '/out/1 - Boom.jpg', 100, 'reflink'), ('copy', '/out/2 - Boom.jpg', 50, None)],
+                         [(event.phase, event.file, event.bytes, event.detail) for event in events])
+
+        # A new phase is started by its first file
+        progress.update('encode', '/out/3 - Boom.mp4', 10)
+        self.assertEqual(('encode', None, 1, 10), (progress.phase, progress.total, progress.files, progress.bytes))
+
+    def test_verbose(self):
+        stream = io.StringIO()
+        progress = Progress([VerboseSink(stream)])
+
+        progress.update('scan', '/in/IMG1.jpg', 100)
+        progress.start('copy', 1)
+        progress.update('copy', '/out/1 - Boom.jpg', 100, 'reflink')
+        progress.update('move', '/out/2 - Boom.jpg', 100)
+
+        self.assertEqual('1 - Boom.jpg (reflink)\n2 - Boom.jpg\n', stream.getvalue())
+
+    def test_progress_bar_throttled(self):
+        stream = io.StringIO()
+        progress = Progress([ProgressBar(stream, interval=60)])
+
+        progress.start('copy', 1000)
+        for index in range(1000):
+            progress.update('copy', '%d.jpg' % index, 1000)
+        progress.end()
+
+        # Shown for the first file and when done
+        lines = stream.getvalue().split('\r')[1:]
+        self.assertEqual(2, len(lines))
+        self.assertIn('1/1000', lines[0])
+        self.assertIn('1000/1000', lines[1])
+        self.assertIn('100%', lines[1])
+        self.assertTrue(lines[1].endswith('\n'))
+
+    def test_json_lines(self):
+        file = os.path.join(self.temp_dir, 'progress.jsonl')
+        progress = Progress([JsonLinesSink(file)])
+
+        progress.start('copy', 1)
+        progress.update('copy', '/out/1 - Boom.jpg', 100, 'copy')
+        progress.close()
+
+        with open(file) as records:
+            records = [json.loads(line) for line in records]
+
+        self.assertEqual(['start', 'file', 'end'], [record['event'] for record in records])
+        self.assertEqual(1, records[0]['total'])
+        self.assertEqual(('copy', '/out/1 - Boom.jpg', 100, 'copy'),
+                         (records[1]['phase'], records[1]['file'], records[1]['bytes'], records[1]['detail']))
+        self.assertIn('elapsed', records[1])
+        self.assertEqual((1, 100), (records[2]['files'], records[2]['bytes']))
+
+def main():
+    unittest.main()
+
+if __name__ == '__main__':
+    main()
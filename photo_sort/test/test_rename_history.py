@@ -0,0 +1,91 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from benchmark import corpus
+import photo_sort
+from exceptions import RenameConflictException
+import rename_history
+import exiftool
+import video
+
+benchmark_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmark')
+
+class RenameHistoryTests(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp(prefix='photo_sort_')
+        self.input_dir = os.path.join(self.temp_dir, 'input')
+        os.makedirs(self.input_dir)
+
+        for minute in range(5):
+            with open(os.path.join(self.input_dir, 'IMG%d.jpg' % (4 - minute)), 'wb') as f:
+                f.write(corpus.jpeg_bytes('2014:08:01 12:%02d:00' % minute))
+        self.names = sorted(os.listdir(self.input_dir))
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def move(self, output, encode='no'):
+        sorter = photo_sort.PhotoSort([self.input_dir], output, '2014', 'Boom', None, None, dry_run=False,
+                                      encode=encode, move=True, rename_history=True, metadata_cache=False)
+        sorter.process()
+        return sorter
+
+    def test_undo_in_place(self):
+        self.move(None)
+        self.assertIn('1 - Boom 2014.jpg', os.listdir(self.input_dir))
+
+        self.assertEqual(5, rename_history.undo(self.input_dir, dry_run=True))
+        self.assertIn('1 - Boom 2014.jpg', os.listdir(self.input_dir))
+
+        self.assertEqual(5, rename_history.undo(self.input_dir))
+        self.assertEqual(self.names, sorted(os.listdir(self.input_dir)))
+        with open(os.path.join(self.input_dir, 'IMG4.jpg'), 'rb') as f:
+            self.assertEqual(corpus.jpeg_bytes('2014:08:01 12:00:00'), f.read())
+
+        self.assertRaises(photo_sort.NoFileException, rename_history.undo, self.input_dir)
+
+    def test_undo_output(self):
+        sorter = self.move(self.temp_dir)
+        self.assertFalse(os.path.exists(self.input_dir))
+
+        rename_history.undo(sorter.output_folder)
+        self.assertEqual(self.names, sorted(os.listdir(self.input_dir)))
+        self.assertEqual([], os.listdir(sorter.output_folder))
+
+    def test_undo_encoded(self):
+        with open(os.path.join(self.input_dir, 'MVI5.mov'), 'wb') as f:
+            f.write(corpus.mp4_bytes(creation_date='2014-08-01T12:05:00+0200'))
+
+        executables = exiftool.executable, video.handbrake_executable
+        exiftool.executable = os.path.join(benchmark_dir, 'fake_exiftool.py')
+        video.handbrake_executable = os.path.join(benchmark_dir, 'fake_handbrake.py')
+        try:
+            sorter = self.move(self.temp_dir, 'yes')
+        finally:
+            exiftool.executable, video.handbrake_executable = executables
+        self.assertIn('6 - Boom 2014.mp4', os.listdir(sorter.output_folder))
+
+        self.assertEqual(6, rename_history.undo(sorter.output_folder))
+        self.assertEqual(self.names + ['MVI5.mp4'], sorted(os.listdir(self.input_dir)))
+
+    def test_undo_conflict(self):
+        self.move(None)
+        os.remove(os.path.join(self.input_dir, '2 - Boom 2014.jpg'))
+        open(os.path.join(self.input_dir, 'IMG0.jpg'), 'w').close()
+
+        with self.assertRaises(RenameConflictException) as context:
+            rename_history.undo(self.input_dir)
+        self.assertEqual(2, len(context.exception.problems))
+
+        # Nothing renamed
+        self.assertEqual(['1 - Boom 2014.jpg', '3 - Boom 2014.jpg', '4 - Boom 2014.jpg', '5 - Boom 2014.jpg',
+                          'IMG0.jpg', rename_history.rename_history_file_name], sorted(os.listdir(self.input_dir)))
+
+def main():
+    unittest.main()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import rename_plan
+
+class RenamePlanTests(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp(prefix='photo_sort_')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def path(self, name):
+        return os.path.join(self.temp_dir, name)
+
+    def create(self, *names):
+        for name in names:
+            with open(self.path(name), 'w') as f:
+                f.write(name)
+
+    def read(self, name):
+        with open(self.path(name)) as f:
+            return f.read()
+
+    def get_plan(self, renames):
+        renames = [(self.path(source), self.path(destination)) for source, destination in renames]
+        steps = rename_plan.get_steps(renames)
+        problems, inodes = rename_plan.check(steps, rename_plan.list_folders(path for step in steps for path in step))
+
+        plan = rename_plan.RenamePlan(self.temp_dir)
+        if not problems:
+            plan.write(steps, inodes)
+        return plan, problems
+
+    def test_cycle(self):
+        self.create('a', 'b', 'c')
+
+        plan, problems = self.get_plan([('a', 'b'), ('b', 'c'), ('c', 'a')])
+        self.assertEqual([], problems)
+        plan.run()
+        plan.remove()
+
+        self.assertEqual(['a', 'b', 'c'], sorted(os.listdir(self.temp_dir)))
+        self.assertEqual(('c', 'a', 'b'), (self.read('a'), self.read('b'), self.read('c')))
+
+    def test_problems(self):
+        self.create('a', 'b', 'c')
+
+        plan, problems = self.get_plan([('a', 'x'), ('b', 'x'), ('missing', 'y'), ('c', 'd')])
+        self.assertEqual(['"%s" does not exist' % self.path('missing'),
+                          '"%s" would be overwritten' % self.path('x')], problems)
+
+        plan, problems = self.get_plan([('a', 'c')])
+        self.assertEqual(['"%s" would be overwritten' % self.path('c')], problems)
+        self.assertFalse(plan.exists())
+
+    def test_steps(self):
+        steps = rename_plan.get_steps([('a', 'a'), ('b', 'c'), ('c', 'd'), ('e', 'f'), ('f', 'e'), ('a2', 'b')])
+        self.assertEqual([('c', 'd'), ('b', 'c'), ('a2', 'b'),
+                          ('e', '.photo_sort_tmp_0'), ('f', 'e'), ('.photo_sort_tmp_0', 'f')], steps)
+
+        # The same name twice
+        steps = rename_plan.get_steps([('a', 'c'), ('b', 'c')])
+        self.assertEqual([('a', '.photo_sort_tmp_0'), ('b', '.photo_sort_tmp_1'),
+                          ('.photo_sort_tmp_0', 'c'), ('.photo_sort_tmp_1', 'c')], steps)
+
+    def test_continue(self):
+        self.create('a', 'b', 'c', 'd')
+
+        plan, problems = self.get_plan([('a', 'b'), ('b', 'a'), ('c', 'd'), ('d', 'e')])
+        steps = plan.steps
+        self.assertEqual(5, len(steps))
+        # Interrupted after the first 3 steps
+        for source, destination in steps[:3]:
+            os.rename(source, destination)
+
+        plan = rename_plan.RenamePlan(self.temp_dir)
+        self.assertTrue(plan.exists())
+        plan.load()
+        self.assertEqual(steps, plan.steps)
+        self.assertEqual(3, plan.next_step())
+        self.assertEqual(2, plan.run())
+        self.assertEqual(5, plan.next_step())
+
+        self.assertEqual(('b', 'a', 'c', 'd'), (self.read('a'), self.read('b'), self.read('d'), self.read('e')))
+
+    def test_continue_changed_inodes(self):
+        self.create('a', 'b', 'c', 'd')
+
+        plan, problems = self.get_plan([('a', 'b'), ('b', 'a'), ('c', 'd'), ('d', 'e')])
+        steps = plan.steps
+        # Inodes change when a memory card is mounted again
+        plan.write(steps, [-inode for inode in plan.inodes])
+        for source, destination in steps[:3]:
+            os.rename(source, destination)
+
+        plan = rename_plan.RenamePlan(self.temp_dir)
+        plan.load()
+        self.assertEqual(3, plan.next_step())
+        # Not removed while a file has a temporary name
+        self.assertRaises(rename_plan.RenameConflictException, plan.remove)
+        self.assertTrue(plan.exists())
+
+        self.assertEqual(2, plan.run())
+        self.assertEqual(5, plan.next_step())
+        plan.remove()
+        self.assertEqual(('b', 'a', 'c', 'd'), (self.read('a'), self.read('b'), self.read('d'), self.read('e')))
+
+    def test_continue_changed_files(self):
+        self.create('a', 'b')
+
+        plan, problems = self.get_plan([('a', 'b'), ('b', 'a')])
+        plan.write(plan.steps, [-inode for inode in plan.inodes])
+        os.rename(self.path('a'), plan.steps[0][1])
+        os.remove(self.path('b'))
+
+        self.assertRaises(rename_plan.RenameConflictException, plan.run)
+        self.assertEqual(['.photo_sort_renames', '.photo_sort_tmp_0'], sorted(os.listdir(self.temp_dir)))
+
+def main():
+    unittest.main()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import timing
+
+class TimingTests(unittest.TestCase):
+
+    def setUp(self):
+        timing.reset()
+        self.enabled = timing.enabled
+
+    def tearDown(self):
+        timing.enabled = self.enabled
+        timing.reset()
+
+    def test_disabled(self):
+        timing.enabled = False
+
+        with timing.span('copy') as span:
+            span.size = 100
+
+        self.assertEqual({}, timing.summary())
+
+    def test_summary(self):
+        timing.enabled = True
+
+        with timing.span('copy') as span:
+            span.size = 1000
+        for index in range(1, 101):
+            timing.add('encode', index / 100.0, 1000)
+
+        summary = timing.summary()
+        self.assertEqual(1, summary['copy']['count'])
+        self.assertEqual(1000, summary['copy']['bytes'])
+
+        encode = summary['encode']
+        self.assertEqual(100, encode['count'])
+        self.assertAlmostEqual(50.5, encode['total'])
+        self.assertAlmostEqual(0.51, encode['p50'])
+        self.assertAlmostEqual(0.95, encode['p95'])
+        self.assertAlmostEqual(1.0, encode['max'])
+        self.assertAlmostEqual(100000 / 50.5, encode['bytes_per_second'])
+
+        lines = timing.report().splitlines()
+        self.assertEqual(['Phase', 'encode', 'copy'], [line.split()[0] for line in lines])
+
+        # Columns stay aligned with long names
+        timing.add('move (copy-verify-unlink)', 0.001)
+        lines = timing.report().splitlines()
+        self.assertEqual(1, len(set(len(line) for line in lines)))
+
+    def test_write_json(self):
+        timing.add('exiftool', 0.5)
+        temp_dir = tempfile.mkdtemp()
+        try:
+            file = os.path.join(temp_dir, 'profile.json')
+            timing.write_json(file)
+
+            with open(file) as f:
+                self.assertEqual(1, json.load(f)['exiftool']['count'])
+        finally:
+            shutil.rmtree(temp_dir)
+
+if __name__ == '__main__':
+    unittest.main()
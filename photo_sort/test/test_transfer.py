@@ -0,0 +1,144 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import unittest
+
+from exceptions import ChecksumMismatchException
+import transfer
+
+class TransferTests(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = os.path.join(tempfile.gettempdir(), 'photo_sort_transfer')
+        self.input_dir = os.path.join(self.temp_dir, 'input')
+        self.output_dir = os.path.join(self.temp_dir, 'output')
+
+        os.makedirs(self.input_dir)
+        os.makedirs(self.output_dir)
+
+        self.rename_list = []
+        for index in range(20):
+            input_file = os.path.join(self.input_dir, 'IMG%d.jpg' % index)
+            with open(input_file, 'w') as f:
+                f.write('photo %d' % index)
+            os.utime(input_file, (1000, 1000))
+            self.rename_list.append({'from': input_file, 'to': os.path.join(self.output_dir, '%d.jpg' % index)})
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_copy_files(self):
+        result = list(transfer.copy_files(self.rename_list, workers=4, device_limit=2))
+        self.assertEqual(self.rename_list, [rename for rename, strategy, size in result])
+
+        for index, rename in enumerate(self.rename_list):
+            with open(rename['to']) as f:
+                self.assertEqual('photo %d' % index, f.read())
+            self.assertEqual(1000, os.path.getmtime(rename['to']))
+
+    def test_copy_strategies(self):
+        rename = self.rename_list[0]
+
+        for name, strategy in transfer.strategies:
+            strategies = transfer.strategies
+            transfer.strategies = [(name, strategy), ('buffered', transfer._buffered)]
+            try:
+                used = transfer.copy(rename['from'], rename['to'])
+            finally:
+                transfer.strategies = strategies
+
+            self.assertIn(used, [name, 'buffered'])
+            with open(rename['to']) as f:
+                self.assertEqual('photo 0', f.read())
+            self.assertEqual(1000, os.path.getmtime(rename['to']))
+
+    def test_copy_not_linux(self):
+        rename = self.rename_list[0]
+
+        transfer.linux = False
+        try:
+            for name in ['reflink', 'sendfile']:
+                self.assertEqual(0, dict(transfer.strategies)[name](0, 0, 0, 10))
+            self.assertNotIn(transfer.copy(rename['from'], rename['to']), ['reflink', 'sendfile'])
+        finally:
+            transfer.linux = True
+
+        with open(rename['to']) as f:
+            self.assertEqual('photo 0', f.read())
+
+    def test_link(self):
+        rename = self.rename_list[0]
+
+        self.assertEqual('link', transfer.link(rename['from'], rename['to']))
+        self.assertTrue(os.path.samefile(rename['from'], rename['to']))
+
+    def test_verified_copy(self):
+        for direct in [True, False]:
+            copy_function = transfer.VerifiedCopy(direct)
+            result = list(transfer.copy_files(self.rename_list, workers=4, copy_function=copy_function))
+            self.assertEqual(['verified'] * 20, [strategy for rename, strategy, size in result])
+
+            with transfer.Manifest(self.output_dir) as manifest:
+                for file in sorted(copy_function.digests):
+                    manifest.add(file, copy_function.digests[file])
+            with open(os.path.join(self.output_dir, transfer.manifest_file_name)) as f:
+                manifest = f.read().splitlines()
+            self.assertEqual(20, len(manifest))
+            self.assertEqual(hashlib.blake2b(b'photo 0').hexdigest() + '  0.jpg', manifest[0])
+            self.assertEqual(1000, os.path.getmtime(self.rename_list[0]['to']))
+
+            os.remove(os.path.join(self.output_dir, transfer.manifest_file_name))
+
+    def test_verified_copy_mismatch(self):
+        rename = self.rename_list[0]
+        hash_file = transfer._hash_file
+
+        def corrupted_hash_file(file, direct):
+            digest = hash_file(file, direct)
+            digest.update(b'flipped bit')
+            return digest
+
+        transfer._hash_file = corrupted_hash_file
+        try:
+            self.assertRaises(ChecksumMismatchException, transfer.VerifiedCopy(), rename['from'], rename['to'])
+        finally:
+            transfer._hash_file = hash_file
+
+    def test_move_files(self):
+        result = list(transfer.move_files(self.rename_list))
+        self.assertEqual(self.rename_list, [rename for rename, strategy, size in result])
+        self.assertEqual(['rename'] * 20, [strategy for rename, strategy, size in result])
+        self.assertEqual([], os.listdir(self.input_dir))
+
+        with open(self.rename_list[3]['to']) as f:
+            self.assertEqual('photo 3', f.read())
+
+    def test_move_files_across_devices(self):
+        device = transfer._device
+        # Pretend the input folder is on another disk, and move odd files out of it
+        transfer._device = lambda folder: folder == self.input_dir
+        for rename in self.rename_list[1::2]:
+            rename['from'] = shutil.move(rename['from'], os.path.join(self.temp_dir, os.path.basename(rename['from'])))
+        try:
+            move_function = transfer.VerifiedMove()
+            result = list(transfer.move_files(self.rename_list, workers=4, move_function=move_function))
+        finally:
+            transfer._device = device
+
+        # Renamed first
+        self.assertEqual(self.rename_list[1::2] + self.rename_list[::2], [rename for rename, strategy, size in result])
+        self.assertEqual(['rename'] * 10 + ['copy-verify-unlink'] * 10, [strategy for rename, strategy, size in result])
+        self.assertEqual(10, len(move_function.digests))
+
+        for index, rename in enumerate(self.rename_list):
+            self.assertFalse(os.path.exists(rename['from']))
+            with open(rename['to']) as f:
+                self.assertEqual('photo %d' % index, f.read())
+            self.assertEqual(1000, os.path.getmtime(rename['to']))
+
+def main():
+    unittest.main()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from benchmark import corpus
+import exiftool
+import photo_sort
+import video
+
+benchmark_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmark')
+
+class VideoTests(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = os.path.join(tempfile.gettempdir(), 'photo_sort_video')
+
+        if not os.path.exists(self.temp_dir):
+            os.makedirs(self.temp_dir)
+
+        self.executables = exiftool.executable, video.handbrake_executable
+        exiftool.executable = os.path.join(benchmark_dir, 'fake_exiftool.py')
+        video.handbrake_executable = os.path.join(benchmark_dir, 'fake_handbrake.py')
+        self.log = os.path.join(self.temp_dir, 'handbrake.log')
+        os.environ['FAKE_HANDBRAKE_LOG'] = self.log
+
+    def tearDown(self):
+        exiftool.executable, video.handbrake_executable = self.executables
+        del os.environ['FAKE_HANDBRAKE_LOG']
+        shutil.rmtree(self.temp_dir)
+
+    def test_threads_per_job(self):
+        self.assertIsNone(video.get_threads_per_job(4))
+        self.assertEqual(4, video.get_threads_per_job(4, 16))
+        self.assertEqual(1, video.get_threads_per_job(4, 2))
+
+    def test_encode_videos(self):
+        for index, size in enumerate([1000, 30000, 20000]):
+            with open(os.path.join(self.temp_dir, '%d.mov' % (index + 1)), 'wb') as f:
+                f.write(corpus.mp4_bytes(rotation=90 if index == 1 else 0, mdat_size=size))
+
+        video.encode_videos(self.temp_dir, encode_jobs=2, cpu_budget=8)
+
+        self.assertEqual(['1.mp4', '2.mp4', '3.mp4', 'handbrake.log'], sorted(os.listdir(self.temp_dir)))
+
+        with open(self.log) as log:
+            commands = log.read().splitlines()
+        self.assertEqual(3, len(commands))
+        # Largest videos are started first
+        self.assertIn('1.mov', commands[2])
+
+        command = [command for command in commands if '2.mov' in command][0]
+        self.assertIn('--rotate=4', command)
+        self.assertIn('--encopts=threads=4', command)
+
+    def test_no_videos_without_exiftool(self):
+        with open(os.path.join(self.temp_dir, '1.jpg'), 'wb') as f:
+            f.write(corpus.jpeg_bytes())
+        exiftool.executable = os.path.join(self.temp_dir, 'missing')
+
+        video.encode_videos(self.temp_dir, metadata_workers=4)
+        self.assertFalse(os.path.exists(self.log))
+
+    def test_copy_tags(self):
+        input_file = os.path.join(self.temp_dir, '1.mov')
+        output_file = os.path.join(self.temp_dir, '1.mp4')
+        open(input_file, 'w').close()
+
+        with exiftool.ExifTool() as et:
+            self.assertFalse(video.copy_tags(et, input_file, output_file))
+
+            open(output_file, 'w').close()
+            self.assertTrue(video.copy_tags(et, input_file, output_file))
+
+def main():
+    unittest.main()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""Measure where time goes during an import.
+
+Code to measure is wrapped in a span:
+
+    with timing.span('copy') as span:
+        ...
+        span.size = size
+
+Spans are only recorded when enabled is set. Otherwise span returns a
+shared object doing nothing, so spans can stay in hot code.
+"""
+
+import json
+import threading
+import time
+
+__author__ = 'marcus'
+
+enabled = False
+
+_lock = threading.Lock()
+# Name -> list of durations in seconds
+_durations = {}
+# Name -> bytes processed
+_sizes = {}
+
+
+class Span(object):
+    def __init__(self, name, size=0):
+        self.name = name
+        self.size = size
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        add(self.name, time.perf_counter() - self.start, self.size)
+
+
+class _NoSpan(object):
+    size = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+
+_no_span = _NoSpan()
+
+
+def span(name, size=0):
+    """Return context measuring the time until it exits, set size on it to record bytes processed"""
+    if not enabled:
+        return _no_span
+
+    return Span(name, size)
+
+
+def add(name, seconds, size=0):
+    with _lock:
+        _durations.setdefault(name, []).append(seconds)
+        _sizes[name] = _sizes.get(name, 0) + size
+
+
+def reset():
+    with _lock:
+        _durations.clear()
+        _sizes.clear()
+
+
+def _percentile(durations, fraction):
+    return durations[int(round(fraction * (len(durations) - 1)))]
+
+
+def summary():
+    """Return count, total, p50, p95, max in seconds, bytes and bytes per second of each span name"""
+    result = {}
+
+    with _lock:
+        for name, durations in _durations.items():
+            durations = sorted(durations)
+            total = sum(durations)
+            result[name] = {
+                'count': len(durations),
+                'total': total,
+                'p50': _percentile(durations, 0.5),
+                'p95': _percentile(durations, 0.95),
+                'max': durations[-1],
+                'bytes': _sizes[name],
+                'bytes_per_second': _sizes[name] / total if total else 0,
+            }
+
+    return result
+
+
+def report():
+    """Return summary as a table, slowest total first"""
+    phases = summary()
+    width = max([len(name) for name in phases] + [16])
+    lines = ['%-*s %8s %10s %10s %10s %10s %10s' % (width, 'Phase', 'Count', 'Total s', 'p50 ms', 'p95 ms', 'Max ms',
+                                                   'MB/s')]
+
+    for name, phase in sorted(phases.items(), key=lambda item: item[1]['total'], reverse=True):
+        throughput = '%10.1f' % (phase['bytes_per_second'] / 1e6) if phase['bytes'] else '%10s' % '-'
+        lines.append('%-*s %8d %10.2f %10.2f %10.2f %10.2f %s' % (width, name, phase['count'], phase['total'],
+                                                                  phase['p50'] * 1000, phase['p95'] * 1000,
+                                                                  phase['max'] * 1000, throughput))
+
+    return '\n'.join(lines)
+
+
+def write_json(file):
+    with open(file, 'w') as report_file:
+        json.dump(summary(), report_file, indent=2, sort_keys=True)
@@ -0,0 +1,418 @@
+from concurrent.futures import ThreadPoolExecutor
+import errno
+import hashlib
+import mmap
+import os
+import shutil
+import sys
+import threading
+import time
+
+from exceptions import ChecksumMismatchException
+import timing
+
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows
+    fcntl = None
+
+__author__ = 'marcus'
+
+# Number of files copied at the same time
+copy_workers = 1
+
+# Number of files read from or written to the same device at the same time
+device_workers = 2
+
+# ioctl cloning a whole file on btrfs, XFS and other copy on write file systems (Linux)
+FICLONE = 0x40049409
+
+# FICLONE and sendfile to a file only work on Linux, like in shutil
+linux = sys.platform.startswith('linux')
+
+# Errors meaning a copy strategy is not supported for this pair of files
+unsupported_errors = (errno.EXDEV, errno.EINVAL, errno.ENOSYS, errno.ENOTTY, errno.EOPNOTSUPP, errno.EBADF,
+                      errno.ETXTBSY)
+
+# Size of each read and write when copying in user space
+buffer_size = 1024 * 1024
+
+# Read copies back bypassing the page cache when verifying, if the file system supports it
+verify_direct = True
+
+# Checksums of verified copies, in the format of b2sum
+manifest_file_name = 'b2sums.txt'
+
+
+class DeviceLimits(object):
+    """One semaphore per device, limiting how many copies use it at the same time"""
+
+    def __init__(self, limit=None):
+        self.limit = limit or device_workers
+        self._lock = threading.Lock()
+        self._semaphores = {}
+        self._devices = {}
+
+    def device(self, folder):
+        with self._lock:
+            if folder not in self._devices:
+                self._devices[folder] = os.stat(folder).st_dev
+            return self._devices[folder]
+
+    def semaphores(self, *folders):
+        """Return semaphores of the devices of the folders, in the order they must be acquired"""
+        devices = sorted(set(self.device(folder) for folder in folders))
+
+        with self._lock:
+            for device in devices:
+                if device not in self._semaphores:
+                    self._semaphores[device] = threading.Semaphore(self.limit)
+            return [self._semaphores[device] for device in devices]
+
+
+class TransferSummary(object):
+    """Number of files and bytes transferred, in total and per strategy"""
+
+    def __init__(self):
+        self.start = time.time()
+        self.files = 0
+        self.bytes = 0
+        self.strategies = {}
+
+    def add(self, strategy, size):
+        self.files += 1
+        self.bytes += size
+        self.strategies[strategy] = self.strategies.get(strategy, 0) + 1
+
+    def __str__(self):
+        elapsed = max(time.time() - self.start, 1e-6)
+        strategies = ", ".join("%s=%d" % (strategy, count) for strategy, count in sorted(self.strategies.items()))
+
+        return "%.1f MB in %.1f s, %.1f MB/s (%s)" % (self.bytes / 1e6, elapsed, self.bytes / 1e6 / elapsed,
+                                                      strategies)
+
+
+def _reflink(source, destination, offset, size):
+    if not linux or fcntl is None or offset:
+        return offset
+
+    try:
+        fcntl.ioctl(destination, FICLONE, source)
+    except OSError as ex:
+        if ex.errno in unsupported_errors:
+            return offset
+        raise
+
+    return size
+
+
+def _copy_file_range(source, destination, offset, size):
+    if not hasattr(os, 'copy_file_range'):
+        return offset
+
+    try:
+        while offset < size:
+            count = os.copy_file_range(source, destination, size - offset, offset, offset)
+            if not count:
+                break
+            offset += count
+    except OSError as ex:
+        if ex.errno not in unsupported_errors:
+            raise
+
+    return offset
+
+
+def _sendfile(source, destination, offset, size):
+    if not linux or not hasattr(os, 'sendfile'):
+        return offset
+
+    try:
+        os.lseek(destination, offset, os.SEEK_SET)
+        while offset < size:
+            count = os.sendfile(destination, source, offset, size - offset)
+            if not count:
+                break
+            offset += count
+    except OSError as ex:
+        if ex.errno not in unsupported_errors:
+            raise
+
+    return offset
+
+
+def _buffered(source, destination, offset, size):
+    os.lseek(source, offset, os.SEEK_SET)
+    os.lseek(destination, offset, os.SEEK_SET)
+
+    with open(source, 'rb', closefd=False) as reader, open(destination, 'wb', closefd=False) as writer:
+        shutil.copyfileobj(reader, writer, buffer_size)
+
+    return size
+
+
+# Tried in order until one has copied the whole file, each continuing where the previous stopped
+strategies = [
+    ('reflink', _reflink),
+    ('copy_file_range', _copy_file_range),
+    ('sendfile', _sendfile),
+    ('buffered', _buffered),
+]
+
+
+def copy(source_file, destination_file):
+    """Copy file content and metadata like shutil.copy2, using the fastest way the file systems support.
+
+    Returns the name of the strategy that finished the copy.
+    """
+    with open(source_file, 'rb') as source, open(destination_file, 'wb') as destination:
+        size = os.fstat(source.fileno()).st_size
+        offset = 0
+        used = 'empty'
+
+        for name, strategy in strategies:
+            if offset >= size:
+                break
+            offset = strategy(source.fileno(), destination.fileno(), offset, size)
+            used = name
+
+    shutil.copystat(source_file, destination_file)
+
+    return used
+
+
+def link(source_file, destination_file):
+    """Hard link destination to source, copy if they are on different file systems or links are not supported.
+
+    Returns 'link' or the name of the copy strategy used.
+    """
+    try:
+        os.link(source_file, destination_file)
+    except OSError as ex:
+        if ex.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK, errno.EOPNOTSUPP):
+            raise
+        return copy(source_file, destination_file)
+
+    return 'link'
+
+
+def _hash_file(file, direct):
+    """Return BLAKE2b of the file content as on disk"""
+    digest = hashlib.blake2b()
+    fd = None
+
+    if direct and hasattr(os, 'O_DIRECT'):
+        try:
+            fd = os.open(file, os.O_RDONLY | os.O_DIRECT)
+            # O_DIRECT needs a page aligned buffer, which mmap gives
+            with mmap.mmap(-1, buffer_size) as buffer:
+                view = memoryview(buffer)
+                while True:
+                    count = os.readv(fd, [buffer])
+                    if not count:
+                        break
+                    digest.update(view[:count])
+                view.release()
+            return digest
+        except OSError as ex:
+            if ex.errno != errno.EINVAL:
+                raise
+            # Not supported by the file system, start over reading through the page cache
+            digest = hashlib.blake2b()
+        finally:
+            if fd is not None:
+                os.close(fd)
+
+    with open(file, 'rb') as f:
+        if hasattr(os, 'posix_fadvise'):
+            # Written pages were synced, dropping them makes the read come from disk
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+
+        buffer = bytearray(buffer_size)
+        view = memoryview(buffer)
+        while True:
+            count = f.readinto(buffer)
+            if not count:
+                break
+            digest.update(view[:count])
+
+    return digest
+
+
+class VerifiedCopy(object):
+    """Copy function hashing the source while copying, then reading the copy back to compare
+
+    The source is read once. The checksum of each copy is kept in digests.
+    """
+
+    def __init__(self, direct=None):
+        self.direct = verify_direct if direct is None else direct
+        self.digests = {}
+
+    def __call__(self, source_file, destination_file):
+        digest = hashlib.blake2b()
+
+        with open(source_file, 'rb') as source, open(destination_file, 'wb') as destination:
+            buffer = bytearray(buffer_size)
+            view = memoryview(buffer)
+            while True:
+                count = source.readinto(buffer)
+                if not count:
+                    break
+                digest.update(view[:count])
+                destination.write(view[:count])
+
+            destination.flush()
+            os.fsync(destination.fileno())
+
+        shutil.copystat(source_file, destination_file)
+
+        if _hash_file(destination_file, self.direct).digest() != digest.digest():
+            raise ChecksumMismatchException('Copy of "{0}" differs from the original'.format(source_file))
+
+        self.digests[destination_file] = digest.hexdigest()
+
+        return 'verified'
+
+
+class VerifiedMove(VerifiedCopy):
+    """Move to another file system: copy, check the copy against the original, then remove the original"""
+
+    def __call__(self, source_file, destination_file):
+        VerifiedCopy.__call__(self, source_file, destination_file)
+        os.remove(source_file)
+
+        return 'copy-verify-unlink'
+
+
+class Manifest(object):
+    """Checksums of files in folder, which can be checked with b2sum -c
+
+    Each checksum is written to the manifest when it is added, so an
+    interrupted import has the checksums of the copies it verified. The
+    manifest is only created when the first checksum is added.
+    """
+
+    def __init__(self, folder):
+        self.folder = folder
+        self._file = None
+
+    def add(self, file, digest):
+        if self._file is None:
+            self._file = open(os.path.join(self.folder, manifest_file_name), 'a')
+
+        self._file.write('%s  %s\n' % (digest, os.path.relpath(file, self.folder)))
+        self._file.flush()
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def move(source_file, destination_file, move_function=None):
+    """Rename a file, moving it with move_function, by default a VerifiedMove, to another file system
+
+    Returns the strategy used.
+    """
+    try:
+        os.rename(source_file, destination_file)
+        return 'rename'
+    except OSError as ex:
+        if ex.errno != errno.EXDEV:
+            raise
+
+    return (move_function or VerifiedMove())(source_file, destination_file)
+
+
+def copy_file(rename, limits, copy_function=copy, step='copy'):
+    """Copy one file, return rename, strategy used and size. Timed as step and strategy"""
+    semaphores = limits.semaphores(os.path.dirname(os.path.abspath(rename['from'])),
+                                   os.path.dirname(os.path.abspath(rename['to'])))
+
+    for semaphore in semaphores:
+        semaphore.acquire()
+    try:
+        with timing.span(step) as span:
+            strategy = copy_function(rename['from'], rename['to'])
+            size = os.path.getsize(rename['to'])
+
+            span.name = '%s (%s)' % (step, strategy)
+            span.size = size
+    finally:
+        for semaphore in reversed(semaphores):
+            semaphore.release()
+
+    return rename, strategy, size
+
+
+def copy_files(rename_list, workers=None, device_limit=None, copy_function=copy, step='copy'):
+    """Copy files with several threads
+
+    Yields rename, strategy used and size for each file, in rename_list
+    order, when the file has been copied.
+    """
+    workers = workers or copy_workers
+    limits = DeviceLimits(device_limit if workers > 1 else None)
+
+    if workers == 1:
+        for rename in rename_list:
+            yield copy_file(rename, limits, copy_function, step)
+        return
+
+    executor = ThreadPoolExecutor(workers)
+    try:
+        futures = [executor.submit(copy_file, rename, limits, copy_function, step) for rename in rename_list]
+        for future in futures:
+            yield future.result()
+    finally:
+        executor.shutdown(cancel_futures=True)
+
+
+def _device(folder):
+    return os.stat(folder or os.curdir).st_dev
+
+
+def move_files(rename_list, workers=None, device_limit=None, move_function=None):
+    """Move files, renaming those already on the file system of their destination
+
+    The others are moved with move_function, by default a VerifiedMove, using
+    several threads like copy_files. Yields rename, strategy used and size
+    for each file, the renamed files first. Size is 0 for renamed files, as
+    no data is moved.
+    """
+    # Folder -> device
+    devices = {}
+    across = []
+
+    for rename in rename_list:
+        source_folder = os.path.dirname(rename['from'])
+        destination_folder = os.path.dirname(rename['to'])
+        for folder in (source_folder, destination_folder):
+            if folder not in devices:
+                devices[folder] = _device(folder)
+
+        if devices[source_folder] != devices[destination_folder]:
+            across.append(rename)
+            continue
+
+        try:
+            with timing.span('move (rename)'):
+                os.rename(rename['from'], rename['to'])
+        except OSError as ex:
+            if ex.errno != errno.EXDEV:
+                raise
+            # Another mount of the same file system
+            across.append(rename)
+            continue
+
+        yield rename, 'rename', 0
+
+    yield from copy_files(across, workers, device_limit, move_function or VerifiedMove(), 'move')
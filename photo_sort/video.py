@@ -1,16 +1,23 @@
+from concurrent.futures import ThreadPoolExecutor
 import os
+import re
 import shutil
 import subprocess
+import time
 from glob import glob
 
 import exiftool
+from exiftool_pool import lazy_pool
+from metadata_cache import get_tag
 import photo_sort
+import timing
 
 __author__ = 'marcus'
 
 
 video_extensions = ['.avi', '.dv', '.mpg', '.mpeg', '.ogm', '.m4v', '.mp4', '.mkv', '.mov', '.qt', '.wmv', '.3gp', '.mod']
 handbrake_preset = 'Normal'
+handbrake_executable = 'HandBrakeCLI'
 
 
 def degrees_to_handbrake_rotation(degrees):
@@ -26,13 +33,13 @@ def degrees_to_handbrake_rotation(degrees):
         return None
 
 
-def get_rotation(et, input_file):
-    degrees = et.get_tag('Rotation', input_file)
+def get_rotation(et, input_file, cache=None):
+    degrees = get_tag(et, 'Rotation', input_file, cache)
     return degrees_to_handbrake_rotation(degrees)
 
 
-def get_encode_command(input_file, output_file, rotation, decomb):
-    command = ["HandBrakeCLI", "--preset", handbrake_preset, "-i", input_file, "-o", output_file]
+def get_encode_command(input_file, output_file, rotation, decomb, threads=None):
+    command = [handbrake_executable, "--preset", handbrake_preset, "-i", input_file, "-o", output_file]
 
     if rotation:
         command.append("--rotate=" + str(rotation))
@@ -40,6 +47,9 @@ def get_encode_command(input_file, output_file, rotation, decomb):
     if decomb:
         command.append("--decomb")
 
+    if threads:
+        command.append("--encopts=threads=" + str(threads))
+
     return command
 
 
@@ -47,35 +57,118 @@ def get_exif_command(input_file, output_file):
     return ["exiftool", "-quiet", "-preserve", "-overwrite_original", "-TagsFromFile", input_file, output_file]
 
 
-def encode_videos(output_folder, decomb=False):
-    """Encode videos using HandBrakeCLI"""
-    files = glob(os.path.join(output_folder, '*.*'))
+def get_encode_jobs(files, et, cache=None):
+    """Return (input file, output file, rotation) for each video, largest first
+
+    Videos are renamed if the output file name is taken. Encoding the
+    largest videos first keeps all encoders busy until the end.
+    """
+    jobs = []
+
+    for input_file in files:
+        (base, extension)=os.path.splitext(input_file)
+
+        if extension in video_extensions:
+            output_file = base + '.mp4'
+
+            if os.path.exists(output_file):
+                shutil.move(input_file, input_file + '_')
+                input_file += '_'
+
+            rotation = get_rotation(et, input_file, cache)
+            jobs.append((input_file, output_file, rotation))
+
+    jobs.sort(key=lambda job: os.path.getsize(job[0]), reverse=True)
+
+    return jobs
+
+
+def get_threads_per_job(encode_jobs, cpu_budget=None):
+    """Divide cpu_budget threads between the concurrent encodes, None lets HandBrake decide"""
+    if not cpu_budget:
+        return None
+
+    return max(1, cpu_budget // encode_jobs)
+
+
+def copy_tags(et, input_file, output_file):
+    """Copy EXIF data and date from input_file to output_file, return True if successful"""
+    output = et.execute(b"-preserve", b"-overwrite_original", b"-TagsFromFile", exiftool.fsencode(input_file),
+                        exiftool.fsencode(output_file))
+    match = re.search(br"(\d+) image files updated", output)
 
-    with exiftool.ExifTool() as et:
-        for input_file in files:
-            (base, extension)=os.path.splitext(input_file)
+    return bool(match) and int(match.group(1)) > 0
 
-            if extension in video_extensions:
-                output_file = base + '.mp4'
 
-                if os.path.exists(output_file):
-                    shutil.move(input_file, input_file + '_')
-                    input_file += '_'
+def encode_video(et, input_file, output_file, rotation, decomb, threads=None):
+    """Encode one video and copy its EXIF data, return wall time in seconds"""
+    start = time.time()
 
-                rotation = get_rotation(et, input_file)
-                command = get_encode_command(input_file, output_file, rotation, decomb)
-                subprocess.call(command)
+    command = get_encode_command(input_file, output_file, rotation, decomb, threads)
+    with timing.span('encode') as span:
+        span.size = os.path.getsize(input_file)
+        subprocess.call(command)
 
-                # Copy EXIF data and date from old to new file
-                command = get_exif_command(input_file, output_file)
-                ret = subprocess.call(command)
-                if ret != 0:
-                    print("Error copying EXIF information to new video!")
+    with timing.span('copy_tags'):
+        copied = copy_tags(et, input_file, output_file)
+    if not copied:
+        print("Error copying EXIF information to new video!")
 
-                os.remove(input_file)
+    os.remove(input_file)
 
+    return time.time() - start
 
-def write_batch_list_windows(output_folder, decomb=False):
+
+def encode_videos(output_folder, decomb=False, cache=None, metadata_workers=1, encode_jobs=1, cpu_budget=None,
+                  files=None, done=None, cancelled=None):
+    """Encode videos using HandBrakeCLI, running encode_jobs encodes at the same time
+
+    All videos in output_folder are encoded unless files is given. done is
+    called with input file, output file and seconds after each encode,
+    otherwise each encode is printed. Videos not started when the cancelled
+    event is set are left as they are.
+    """
+    if files is None:
+        files = glob(os.path.join(output_folder, '*.*'))
+
+    # Started by the first rotation not cached or read natively, or to copy tags
+    with lazy_pool(metadata_workers) as et:
+        jobs = get_encode_jobs(files, et, cache)
+        if jobs:
+            # Each encode copies tags with the first free exiftool process when done
+            et.start()
+
+        threads = get_threads_per_job(encode_jobs, cpu_budget)
+        start = time.time()
+
+        def encode_job(input_file, output_file, rotation):
+            if cancelled is not None and cancelled.is_set():
+                return None
+            return encode_video(et, input_file, output_file, rotation, decomb, threads)
+
+        encoded = 0
+
+        with ThreadPoolExecutor(encode_jobs) as executor:
+            futures = [executor.submit(encode_job, input_file, output_file, rotation)
+                       for input_file, output_file, rotation in jobs]
+
+            for (input_file, output_file, rotation), future in zip(jobs, futures):
+                seconds = future.result()
+                if seconds is None:
+                    continue
+
+                encoded += 1
+
+                if done:
+                    done(input_file, output_file, seconds)
+                else:
+                    print('Encoded %s in %.1f s' % (os.path.basename(output_file), seconds))
+
+    if jobs:
+        print('Encoded %d videos in %.1f s.' % (encoded, time.time() - start))
+
+
+def write_batch_list_windows(output_folder, decomb=False, cache=None, files=None):
     """Write batch file which will encode videos when runt
     Find videos
     Build output name
@@ -83,11 +176,14 @@ def write_batch_list_windows(output_folder, decomb=False):
     Encode video
     Copy Exif data from old video to new
     Remove old video
+
+    All videos in output_folder are listed unless files is given.
     """
     error = " || goto :error"
     content = []
 
-    files = glob(os.path.join(output_folder, '*.*'))
+    if files is None:
+        files = glob(os.path.join(output_folder, '*.*'))
 
     with open(os.path.join(output_folder, 'batch-encode.bat'), 'w') as batch:
         content.append("@echo off\n")
@@ -100,7 +196,7 @@ def write_batch_list_windows(output_folder, decomb=False):
                 if extension in video_extensions:
                     output_file = base + '.mp4'
 
-                    rotation = get_rotation(et, input_file)
+                    rotation = get_rotation(et, input_file, cache)
 
                     input_file = os.path.basename(input_file)
 